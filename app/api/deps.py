@@ -0,0 +1,54 @@
+"""Shared FastAPI dependencies for the API endpoints."""
+
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Query
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def sparse_fields(model: type[BaseModel]) -> Callable[..., Optional[list[str]]]:
+    """
+    Build a dependency parsing the `fields` query parameter of a list endpoint.
+    Returns None when no projection was requested, otherwise the requested
+    columns (always including `id`), validated against the summary model.
+    """
+    allowed = set(model.model_fields)
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None,
+            description=(
+                "Comma-separated columns to return. "
+                f"Allowed: {', '.join(sorted(allowed))}."
+            ),
+        ),
+    ) -> Optional[list[str]]:
+        if not fields:
+            return None
+        columns = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = sorted(set(columns) - allowed)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown)}",
+            )
+        if "id" not in columns:
+            columns.insert(0, "id")
+        return list(dict.fromkeys(columns))
+
+    return dependency
+
+
+def sparse_response(model: type[BaseModel], rows: list[dict]) -> JSONResponse:
+    """
+    Serialize rows read with a `fields` projection through the summary model,
+    leaving out the columns that were not selected. Full rows are returned
+    through the endpoint's response_model instead.
+    """
+    return JSONResponse(
+        [
+            model.model_validate(row).model_dump(mode="json", exclude_unset=True)
+            for row in rows
+        ]
+    )
@@ -1,14 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Annotated, Optional
 
+from fastapi import APIRouter, Body, Depends, HTTPException, status
+
+from app.api.deps import sparse_fields, sparse_response
 from app.core.security import get_current_user_id as _get_current_user_id
 from app.db.crud.crud_agent import (
     archive_agent,
+    archive_agents_bulk,
     create_agent,
+    create_agents_bulk,
     get_agent_by_id,
     get_agents_by_user,
     update_agent,
+    update_agents_bulk,
+)
+from app.models.agent import (
+    AgentBulkUpdate,
+    AgentCreate,
+    AgentOut,
+    AgentSummary,
+    AgentUpdate,
 )
-from app.models.agent import AgentCreate, AgentOut, AgentUpdate
+from app.models.bulk import BULK_MAX_ITEMS, BulkResponse
+from app.services.semantic_cache import semantic_cache
 
 router = APIRouter(prefix="/agents", tags=["agents"])
 
@@ -22,10 +36,56 @@ async def create_agent_endpoint(agent: AgentCreate, user_id: str = get_current_u
     return db_agent
 
 
+@router.post("/bulk", response_model=BulkResponse)
+async def create_agents_bulk_endpoint(
+    agents: Annotated[
+        list[AgentCreate], Body(min_length=1, max_length=BULK_MAX_ITEMS)
+    ],
+    user_id: str = get_current_user_id,
+):
+    """Create many agents for the current user in one request."""
+    return await create_agents_bulk(user_id, agents)
+
+
+@router.put("/bulk", response_model=BulkResponse)
+async def update_agents_bulk_endpoint(
+    agents: Annotated[
+        list[AgentBulkUpdate], Body(min_length=1, max_length=BULK_MAX_ITEMS)
+    ],
+    user_id: str = get_current_user_id,
+):
+    """Update many agents of the current user; each item carries its id."""
+    try:
+        return await update_agents_bulk(user_id, agents)
+    finally:
+        # Invalidate after the write (applied or partly applied) so a
+        # concurrent turn cannot re-cache old config
+        for agent in agents:
+            semantic_cache.invalidate(agent.id)
+
+
+@router.post("/bulk/archive", response_model=BulkResponse)
+async def archive_agents_bulk_endpoint(
+    agent_ids: Annotated[list[str], Body(min_length=1, max_length=BULK_MAX_ITEMS)],
+    user_id: str = get_current_user_id,
+):
+    """Archive many agents of the current user by id."""
+    try:
+        return await archive_agents_bulk(user_id, agent_ids)
+    finally:
+        for agent_id in agent_ids:
+            semantic_cache.invalidate(agent_id)
+
+
 @router.get("/", response_model=list[AgentOut])
-async def list_agents_endpoint(user_id: str = get_current_user_id):
-    """List all agents for the current user."""
-    agents = await get_agents_by_user(user_id)
+async def list_agents_endpoint(
+    columns: Optional[list[str]] = Depends(sparse_fields(AgentSummary)),
+    user_id: str = get_current_user_id,
+):
+    """List all agents for the current user, optionally only the given `fields`."""
+    agents = await get_agents_by_user(user_id, columns=columns)
+    if columns:
+        return sparse_response(AgentSummary, agents)
     return agents
 
 
@@ -46,7 +106,11 @@ async def update_agent_endpoint(
     agent_id: str, agent_update: AgentUpdate, user_id: str = get_current_user_id
 ):
     """Update an agent by ID for the current user."""
-    updated = await update_agent(agent_id, user_id, agent_update)
+    try:
+        updated = await update_agent(agent_id, user_id, agent_update)
+    finally:
+        # Cached replies may no longer match the agent's new prompt or model
+        semantic_cache.invalidate(agent_id)
     if not updated:
         raise HTTPException(
             status_code=404,
@@ -58,7 +122,10 @@ async def update_agent_endpoint(
 @router.delete("/{agent_id}", response_model=AgentOut)
 async def archive_agent_endpoint(agent_id: str, user_id: str = get_current_user_id):
     """Archive (delete) an agent by ID for the current user."""
-    archived = await archive_agent(agent_id, user_id)
+    try:
+        archived = await archive_agent(agent_id, user_id)
+    finally:
+        semantic_cache.invalidate(agent_id)
     if not archived:
         raise HTTPException(
             status_code=404,
@@ -1,15 +1,45 @@
-from fastapi import APIRouter, Depends, Query, status
+from typing import Literal, Optional
 
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import sparse_fields, sparse_response
+from app.core.config import get_settings
 from app.core.security import get_current_user_id
 from app.db.crud.crud_chat import (
     create_session,
+    encode_message_cursor,
     get_messages,
+    get_session,
     list_sessions,
 )
-from app.models.chat import ChatMessageOut, ChatSessionCreate, ChatSessionOut
+from app.models.chat import (
+    ChatMessageOut,
+    ChatSessionCreate,
+    ChatSessionOut,
+    ChatSessionSummary,
+    ChatTurnRequest,
+)
+from app.services.agent_runner import (
+    AgentNotFoundError,
+    prepare_turn,
+    stream_agent_reply,
+)
+from app.services.sse import SSE_HEADERS, sse_completion_stream, text_chunks
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Message history paging headers; exposed to browsers by the CORS middleware
+CURSOR_HEADERS = ["X-Prev-Cursor", "X-Next-Cursor"]
+
 
 @router.post(
     "/sessions",
@@ -25,20 +55,78 @@ async def create_session_endpoint(
 
 
 @router.get("/sessions", response_model=list[ChatSessionOut])
-async def list_sessions_endpoint(user_id: str = Depends(get_current_user_id)):
-    """List all chat sessions for the current user."""
-    sessions = await list_sessions(user_id)
+async def list_sessions_endpoint(
+    columns: Optional[list[str]] = Depends(sparse_fields(ChatSessionSummary)),
+    user_id: str = Depends(get_current_user_id),
+):
+    """List all chat sessions for the current user, optionally only `fields`."""
+    sessions = await list_sessions(user_id, columns=columns)
+    if columns:
+        return sparse_response(ChatSessionSummary, sessions)
     return sessions
 
 
 @router.get("/sessions/{session_id}/messages", response_model=list[ChatMessageOut])
 async def get_messages_endpoint(
     session_id: str,
+    response: Response,
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
+    direction: Literal["forward", "backward"] = Query("forward"),
     user_id: str = Depends(get_current_user_id),
 ):
-    """Get messages for a specific chat session."""
-    # (Optional: check session ownership here)
-    messages = await get_messages(session_id, limit=limit, offset=offset)
+    """
+    Get messages for a specific chat session, oldest first.
+    Pass the X-Next-Cursor / X-Prev-Cursor response headers back as `cursor`
+    with direction=forward / direction=backward to page through history.
+    direction=backward without a cursor returns the latest messages.
+    """
+    if await get_session(session_id, user_id) is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    try:
+        messages = await get_messages(
+            session_id,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            direction=direction,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if messages:
+        response.headers["X-Prev-Cursor"] = encode_message_cursor(messages[0])
+        response.headers["X-Next-Cursor"] = encode_message_cursor(messages[-1])
     return messages
+
+
+@router.post("/sessions/{session_id}/stream")
+async def stream_turn_endpoint(
+    session_id: str,
+    turn_request: ChatTurnRequest,
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    Send a message to an agent and stream its reply as server-sent events:
+    "delta" events with the text as it is generated, then "usage" and
+    [DONE]. The reply is saved once when the stream ends; if the client
+    disconnects first, the text produced so far is saved as a partial reply.
+    """
+    try:
+        turn = await prepare_turn(
+            user_id, turn_request.agent_id, session_id, turn_request.message
+        )
+    except AgentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return StreamingResponse(
+        sse_completion_stream(
+            text_chunks(stream_agent_reply(turn)),
+            request.is_disconnected,
+            model=turn.model,
+            messages=turn.messages,
+            keepalive=get_settings().SSE_KEEPALIVE_SECONDS,
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
@@ -1,18 +1,25 @@
 from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
+from app.core.config import get_settings
 from app.core.security import get_current_user_id
+from app.services.embedding_batcher import embed_texts
 from app.services.litellm_service import (
     call_litellm_completion,
-    call_litellm_embedding,
     call_litellm_image_generation,
     call_litellm_stream,
     list_litellm_models,
-    litellm_router,
 )
+from app.services.provider_router import (
+    ProviderRouterError,
+    parse_providers,
+    provider_router,
+)
+from app.services.sse import SSE_HEADERS, sse_completion_stream
 
 router = APIRouter(prefix="/litellm", tags=["litellm"])
 
@@ -31,6 +38,15 @@ class LitellmEmbeddingRequest(BaseModel):
     options: Optional[Dict[str, Any]] = None
 
 
+class LitellmRouterRequest(BaseModel):
+    # {"providers": [{"service": ..., "model": ..., "options": {...}}, ...],
+    #  "deadline": seconds}; providers may also be bare service names sharing
+    # a top-level "model"
+    router_config: Dict[str, Any]
+    messages: List[Dict[str, Any]]
+    options: Optional[Dict[str, Any]] = None
+
+
 class LitellmImageRequest(BaseModel):
     service: str
     model: str
@@ -40,15 +56,25 @@ class LitellmImageRequest(BaseModel):
 
 @router.post("/chat")
 async def litellm_chat(
-    req: LitellmChatRequest, user_id: str = Depends(get_current_user_id)
+    req: LitellmChatRequest,
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
 ):
+    # Cache-Control: no-cache / X-Cache-Bypass refresh a cached completion;
+    # Cache-Control: no-store disables the completion cache for this call.
+    cache_control = request.headers.get("cache-control", "").lower()
+    options = dict(req.options or {})
+    if "no-store" in cache_control:
+        options.pop("cache", None)
     try:
         response = await call_litellm_completion(
             user_id=user_id,
             service=req.service,
             model=req.model,
             messages=req.messages,
-            options=req.options,
+            options=options,
+            cache_bypass="no-cache" in cache_control
+            or request.headers.get("x-cache-bypass", "").lower() in ("1", "true"),
         )
         return {"response": response}
     except Exception as e:
@@ -60,11 +86,11 @@ async def litellm_embedding(
     req: LitellmEmbeddingRequest, user_id: str = Depends(get_current_user_id)
 ):
     try:
-        response = await call_litellm_embedding(
+        response = await embed_texts(
             user_id=user_id,
             service=req.service,
             model=req.model,
-            input=req.input,
+            texts=req.input,
             options=req.options,
         )
         return {"embedding": response}
@@ -91,23 +117,28 @@ async def litellm_image(
 
 @router.post("/stream")
 async def litellm_stream(
-    req: LitellmChatRequest, user_id: str = Depends(get_current_user_id)
+    req: LitellmChatRequest,
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
 ):
-    async def event_stream():
-        async for chunk in call_litellm_stream(
-            user_id=user_id,
-            service=req.service,
+    chunks = call_litellm_stream(
+        user_id=user_id,
+        service=req.service,
+        model=req.model,
+        messages=req.messages,
+        options=req.options,
+    )
+    return StreamingResponse(
+        sse_completion_stream(
+            chunks,
+            request.is_disconnected,
             model=req.model,
             messages=req.messages,
-            options=req.options,
-        ):
-            yield (
-                chunk["choices"][0]["delta"]["content"]
-                if "choices" in chunk and chunk["choices"][0].get("delta")
-                else ""
-            )
-
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+            keepalive=get_settings().SSE_KEEPALIVE_SECONDS,
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 
 @router.get("/models")
@@ -117,19 +148,35 @@ async def litellm_models():
 
 @router.post("/router")
 async def litellm_router_endpoint(
-    request: Request,
+    req: LitellmRouterRequest, user_id: str = Depends(get_current_user_id)
 ):
-    body = await request.json()
     try:
-        result = litellm_router(
-            user_id=body.get("user_id", ""),
-            router_config=body.get("router_config", {}),
-            messages=body.get("messages", []),
-            options=body.get("options", {}),
+        providers = parse_providers(req.router_config)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    try:
+        routed = await provider_router.complete(
+            user_id=user_id,
+            providers=providers,
+            messages=req.messages,
+            options=req.options,
+            deadline=req.router_config.get("deadline"),
         )
-        return {"result": result}
-    except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+    except ProviderRouterError as e:
+        return JSONResponse(
+            {"error": str(e), "attempts": e.attempts}, status_code=502
+        )
+    return JSONResponse(
+        jsonable_encoder(
+            {
+                "response": routed.response,
+                "provider": {"service": routed.service, "model": routed.model},
+                "latency_ms": round(routed.latency_ms, 3),
+                "attempts": routed.attempts,
+            }
+        ),
+        headers={"X-Served-By": f"{routed.service}/{routed.model}"},
+    )
 
 
 # Optional: OpenAI-compatible proxy endpoint
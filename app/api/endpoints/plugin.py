@@ -1,13 +1,17 @@
-from typing import List
+from typing import Annotated, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from loguru import logger
 
+from app.api.deps import sparse_fields, sparse_response
 from app.db.supabase_client import SupabaseClientError
+from app.models.bulk import BULK_MAX_ITEMS, BulkResponse
 from app.models.plugin import (
+    PluginConfigurationBulkUpdate,
     PluginConfigurationCreate,
     PluginConfigurationOut,
+    PluginConfigurationSummary,
     PluginConfigurationUpdate,
 )
 from app.services.plugin_service import PluginService, PluginServiceError
@@ -39,13 +43,63 @@ async def create_plugin_config(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/bulk", response_model=BulkResponse)
+async def create_plugin_configs_bulk(
+    configs: Annotated[
+        List[PluginConfigurationCreate],
+        Body(min_length=1, max_length=BULK_MAX_ITEMS),
+    ],
+    user=Depends(get_current_user),
+):
+    try:
+        return await PluginService.create_plugin_configs_bulk(user["id"], configs)
+    except (PluginServiceError, SupabaseClientError) as e:
+        logger.error(f"Plugin config bulk creation failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/bulk", response_model=BulkResponse)
+async def update_plugin_configs_bulk(
+    configs: Annotated[
+        List[PluginConfigurationBulkUpdate],
+        Body(min_length=1, max_length=BULK_MAX_ITEMS),
+    ],
+    user=Depends(get_current_user),
+):
+    try:
+        return await PluginService.update_plugin_configs_bulk(user["id"], configs)
+    except (PluginServiceError, SupabaseClientError) as e:
+        logger.error(f"Plugin config bulk update failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/bulk/delete", response_model=BulkResponse)
+async def delete_plugin_configs_bulk(
+    config_ids: Annotated[
+        List[str], Body(min_length=1, max_length=BULK_MAX_ITEMS)
+    ],
+    user=Depends(get_current_user),
+):
+    try:
+        return await PluginService.delete_plugin_configs_bulk(user["id"], config_ids)
+    except (PluginServiceError, SupabaseClientError) as e:
+        logger.error(f"Plugin config bulk deletion failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/", response_model=List[PluginConfigurationOut])
-async def list_plugin_configs(user=Depends(get_current_user)):
+async def list_plugin_configs(
+    columns: Optional[List[str]] = Depends(sparse_fields(PluginConfigurationSummary)),
+    user=Depends(get_current_user),
+):
     try:
-        return await PluginService.list_plugin_configs(user["id"])
+        configs = await PluginService.list_plugin_configs(user["id"], columns=columns)
     except (PluginServiceError, SupabaseClientError) as e:
         logger.error(f"Plugin config listing failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    if columns:
+        return sparse_response(PluginConfigurationSummary, configs)
+    return configs
 
 
 @router.get("/{config_id}", response_model=PluginConfigurationOut)
@@ -1,15 +1,19 @@
-from typing import List
+from typing import Annotated, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, status
 from loguru import logger
 
+from app.api.deps import sparse_fields, sparse_response
 from app.core.security import get_current_user_id
 from app.db.supabase_client import SupabaseClientError
+from app.models.bulk import BULK_MAX_ITEMS, BulkResponse
 from app.models.workflow import (
+    WorkflowBulkUpdate,
     WorkflowCreate,
     WorkflowOut,
     WorkflowRunRequest,
     WorkflowRunResult,
+    WorkflowSummary,
     WorkflowUpdate,
 )
 from app.services.workflow_service import WorkflowService, WorkflowServiceError
@@ -35,13 +39,61 @@ async def create_workflow(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/bulk", response_model=BulkResponse)
+async def create_workflows_bulk(
+    workflows: Annotated[
+        List[WorkflowCreate], Body(min_length=1, max_length=BULK_MAX_ITEMS)
+    ],
+    user_id: str = Depends(get_current_user_id),
+):
+    try:
+        return await WorkflowService.create_workflows_bulk(user_id, workflows)
+    except (WorkflowServiceError, SupabaseClientError) as e:
+        logger.error(f"Workflow bulk creation failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/bulk", response_model=BulkResponse)
+async def update_workflows_bulk(
+    workflows: Annotated[
+        List[WorkflowBulkUpdate], Body(min_length=1, max_length=BULK_MAX_ITEMS)
+    ],
+    user_id: str = Depends(get_current_user_id),
+):
+    try:
+        return await WorkflowService.update_workflows_bulk(user_id, workflows)
+    except (WorkflowServiceError, SupabaseClientError) as e:
+        logger.error(f"Workflow bulk update failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/bulk/delete", response_model=BulkResponse)
+async def delete_workflows_bulk(
+    workflow_ids: Annotated[
+        List[str], Body(min_length=1, max_length=BULK_MAX_ITEMS)
+    ],
+    user_id: str = Depends(get_current_user_id),
+):
+    try:
+        return await WorkflowService.delete_workflows_bulk(user_id, workflow_ids)
+    except (WorkflowServiceError, SupabaseClientError) as e:
+        logger.error(f"Workflow bulk deletion failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/", response_model=List[WorkflowOut])
-async def list_workflows(user_id: str = Depends(get_current_user_id)):
+async def list_workflows(
+    columns: Optional[List[str]] = Depends(sparse_fields(WorkflowSummary)),
+    user_id: str = Depends(get_current_user_id),
+):
     try:
-        return await WorkflowService.list_workflows(user_id)
+        workflows = await WorkflowService.list_workflows(user_id, columns=columns)
     except (WorkflowServiceError, SupabaseClientError) as e:
         logger.error(f"Workflow listing failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    if columns:
+        return sparse_response(WorkflowSummary, workflows)
+    return workflows
 
 
 @router.get("/{workflow_id}", response_model=WorkflowOut)
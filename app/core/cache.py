@@ -0,0 +1,100 @@
+"""In-process caching primitives shared by the DB and service layers."""
+
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any, Optional
+
+
+class TTLCache:
+    """
+    LRU cache whose entries also expire after a fixed time-to-live.
+    Read-through callers take version(key) before loading a value and pass it
+    to set(), so a load that raced with invalidate(key) is not cached.
+    Not thread-safe; intended for use from a single event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Invalidation stamps of recently invalidated keys; stamps dropped
+        # from this bounded map are folded into _forgotten, which then stands
+        # in for every untracked key (conservatively newer than their loads)
+        self._generation = 0
+        self._invalidated: OrderedDict[Hashable, int] = OrderedDict()
+        self._forgotten = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Like get(), but without counting a hit or miss or refreshing LRU order."""
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[1]
+
+    def version(self, key: Hashable) -> int:
+        """Return key's current version; it changes whenever key is invalidated."""
+        return self._invalidated.get(key, self._forgotten)
+
+    def set(self, key: Hashable, value: Any, version: Optional[int] = None) -> None:
+        """
+        Store value under key, evicting the least recently used entry if full.
+        With `version` (from version(key) before the value was loaded), the
+        value is dropped if key has been invalidated since.
+        """
+        if self.maxsize <= 0:
+            return
+        if version is not None and self.version(key) != version:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry if present and move key to a new version."""
+        self._data.pop(key, None)
+        self._generation += 1
+        self._invalidated[key] = self._generation
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > max(self.maxsize, 1):
+            _, self._forgotten = self._invalidated.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries, move every key to a new version and reset counters."""
+        self._data.clear()
+        self._generation += 1
+        self._invalidated.clear()
+        self._forgotten = self._generation
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current occupancy."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
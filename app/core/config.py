@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -8,6 +10,112 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "INFO"
     BACKEND_CORS_ORIGINS: str = "*"
 
+    # Storage backend: "supabase" (PostgREST over HTTP) or "postgres" (asyncpg)
+    DB_BACKEND: str = "supabase"
+    DATABASE_URL: Optional[str] = None
+    POSTGRES_POOL_MIN_SIZE: int = 1
+    POSTGRES_POOL_MAX_SIZE: int = 20
+    POSTGRES_STATEMENT_CACHE_SIZE: int = 1024
+
+    # Supabase connection pool
+    SUPABASE_POOL_MAX_CONNECTIONS: int = 50
+    SUPABASE_POOL_MAX_KEEPALIVE: int = 20
+    SUPABASE_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    SUPABASE_HTTP2: bool = True
+    SUPABASE_TIMEOUT: float = 30.0
+
+    # Per-request query instrumentation
+    QUERY_DEBUG_HEADERS: bool = False
+    QUERY_REPEAT_THRESHOLD: int = 3
+
+    # Load agent + history and store the user message via one database call
+    # (requires the agent_turn_context migration); otherwise prefetch concurrently
+    AGENT_TURN_CONTEXT_RPC: bool = True
+
+    # Exact-match LLM completion cache (opt-in per agent or per request)
+    COMPLETION_CACHE_TTL_SECONDS: float = 3600.0
+    COMPLETION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    COMPLETION_CACHE_DIR: Optional[str] = None
+
+    # Semantic reply cache (opt-in per agent via config.semantic_cache)
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_EMBEDDING_SERVICE: str = "openai"
+    SEMANTIC_CACHE_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    SEMANTIC_CACHE_MAX_ENTRIES_PER_AGENT: int = 1000
+    SEMANTIC_CACHE_MAX_AGENTS: int = 1000
+    SEMANTIC_CACHE_TTL_SECONDS: float = 86400.0
+
+    # Embedding micro-batching and cache
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0
+    EMBEDDING_BATCH_MAX_SIZE: int = 256
+    EMBEDDING_CACHE_MAX_SIZE: int = 50000
+    EMBEDDING_CACHE_TTL_SECONDS: float = 86400.0
+
+    # Latency-aware provider routing (/litellm/router)
+    ROUTER_EWMA_ALPHA: float = 0.3
+    ROUTER_MAX_ERROR_RATE: float = 0.5
+    ROUTER_RATE_LIMIT_COOLDOWN_SECONDS: float = 30.0
+    ROUTER_DEADLINE_SECONDS: float = 60.0
+
+    # Provider API keys: AES-256-GCM storage key (urlsafe base64, 32 bytes)
+    # and the in-process cache of resolved keys
+    API_KEY_ENCRYPTION_KEY: Optional[str] = None
+    API_KEY_CACHE_TTL_SECONDS: float = 300.0
+    API_KEY_CACHE_MAX_SIZE: int = 10000
+    # Batched last_used_at updates for resolved keys
+    API_KEY_USAGE_FLUSH_INTERVAL_SECONDS: float = 30.0
+    API_KEY_USAGE_MAX_PENDING: int = 10000
+
+    # Pooled provider SDK clients, one per (service, API key)
+    PROVIDER_CLIENT_POOL_SIZE: int = 256
+    # Gemini: one async client per API key
+    GEMINI_CLIENT_POOL_SIZE: int = 256
+
+    # Hedged LLM calls (opt-in per agent or per request)
+    HEDGE_PERCENTILE: float = 95.0
+    HEDGE_DEFAULT_DELAY_MS: float = 2000.0
+    HEDGE_MIN_DELAY_MS: float = 100.0
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_WINDOW_SIZE: int = 500
+    HEDGE_BUDGET_RATIO: float = 0.05
+
+    # Per-provider rate limiting of LLM calls, per (service, model, API key).
+    # RPM/TPM budgets by "service" or "service/model" override the defaults
+    # (0 = unlimited), e.g. {"openai/gpt-4o": {"rpm": 500, "tpm": 30000}};
+    # concurrency adapts between the min and max on 429s and latency
+    RATE_LIMITS: dict[str, dict[str, float]] = {}
+    RATE_LIMIT_DEFAULT_RPM: float = 0.0
+    RATE_LIMIT_DEFAULT_TPM: float = 0.0
+    RATE_LIMIT_INITIAL_CONCURRENCY: int = 32
+    RATE_LIMIT_MIN_CONCURRENCY: int = 1
+    RATE_LIMIT_MAX_CONCURRENCY: int = 256
+    RATE_LIMIT_LATENCY_TOLERANCE: float = 2.0
+    RATE_LIMIT_MAX_QUEUE: int = 1000
+    RATE_LIMIT_QUEUE_TIMEOUT_SECONDS: float = 30.0
+    RATE_LIMIT_DEFAULT_COMPLETION_TOKENS: int = 512
+    RATE_LIMIT_MAX_KEYS: int = 10000
+
+    # Server-sent event streams: keep-alive comment interval while idle
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+
+    # Agent turn context: rows loaded per turn, then packed to a token budget
+    AGENT_HISTORY_MAX_MESSAGES: int = 100
+    AGENT_CONTEXT_MAX_TOKENS: int = 16000
+    AGENT_CONTEXT_DEFAULT_WINDOW: int = 8192
+    AGENT_CONTEXT_RESERVED_OUTPUT_TOKENS: int = 1024
+    AGENT_CONTEXT_TOKEN_CACHE_SIZE: int = 100000
+    AGENT_CONTEXT_TOKEN_CACHE_TTL_SECONDS: float = 3600.0
+
+    # Agent config cache
+    AGENT_CACHE_TTL_SECONDS: float = 60.0
+    AGENT_CACHE_MAX_SIZE: int = 1024
+
+    # Write-behind batching for chat messages
+    CHAT_WRITE_BEHIND_ENABLED: bool = False
+    CHAT_WRITE_BEHIND_INTERVAL_MS: float = 5.0
+    CHAT_WRITE_BEHIND_MAX_BATCH: int = 100
+    CHAT_WRITE_BEHIND_MAX_QUEUE: int = 10000
+
     model_config = SettingsConfigDict(env_file=".env")
 
 
@@ -0,0 +1,24 @@
+"""Registry of in-process metric providers exposed on the /metrics endpoint."""
+
+from typing import Callable
+
+from loguru import logger
+
+_providers: dict[str, Callable[[], dict]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], dict]) -> None:
+    """Register a callable returning a dict of metrics under the given name."""
+    _providers[name] = provider
+
+
+def collect_metrics() -> dict:
+    """Collect a snapshot from every registered provider."""
+    snapshot = {}
+    for name, provider in _providers.items():
+        try:
+            snapshot[name] = provider()
+        except Exception as e:
+            logger.error(f"Error collecting metrics for '{name}': {e}")
+            snapshot[name] = {"error": str(e)}
+    return snapshot
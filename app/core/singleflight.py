@@ -0,0 +1,50 @@
+"""Request coalescing for identical concurrent async calls."""
+
+import asyncio
+from collections.abc import Hashable
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """
+    Runs at most one in-flight call per key; concurrent callers with the same
+    key await the same task and share its result (or exception).
+    The shared call runs as its own task, so a cancelled caller does not
+    cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executed = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of fn(), sharing it with concurrent callers of key."""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._forget, key))
+            self.executed += 1
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Retrieve the exception so an abandoned flight doesn't log a warning
+            task.exception()
+
+    def stats(self) -> dict:
+        """Return how many calls ran versus were collapsed into another."""
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._inflight),
+        }
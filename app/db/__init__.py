@@ -1 +1,19 @@
-from .supabase_client import SupabaseClientError, get_supabase_client
+from .repository import Repository
+from .supabase_client import (
+    SupabaseClientError,
+    close_supabase_client,
+    get_async_supabase_client,
+    get_supabase_client,
+    init_supabase_client,
+    supabase_registry,
+)
+
+__all__ = [
+    "Repository",
+    "SupabaseClientError",
+    "close_supabase_client",
+    "get_async_supabase_client",
+    "get_supabase_client",
+    "init_supabase_client",
+    "supabase_registry",
+]
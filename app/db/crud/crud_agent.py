@@ -2,14 +2,32 @@ from typing import List, Optional
 
 from loguru import logger
 
-from app.db.supabase_client import SupabaseClientError, get_supabase_client
-from app.models.agent import AgentCreate, AgentUpdate
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+from app.db.repository import Repository, select_columns
+from app.db.supabase_client import SupabaseClientError
+from app.models.agent import AgentBulkUpdate, AgentCreate, AgentUpdate
+from app.models.bulk import BulkResponse
 
 AGENT_TABLE = "agents"
 
-# Replace all usages of 'supabase' with the result of get_supabase_client() where needed.
-# For example:
-# supabase = get_supabase_client()
+agent_repo = Repository(AGENT_TABLE)
+
+# Read-through cache of agent rows keyed by (user_id, agent_id).
+# Populated by get_agent_by_id, invalidated by update_agent/archive_agent.
+agent_cache = TTLCache(
+    maxsize=get_settings().AGENT_CACHE_MAX_SIZE,
+    ttl=get_settings().AGENT_CACHE_TTL_SECONDS,
+)
+
+
+def get_agent_cache_stats() -> dict:
+    """Return hit/miss counters for the agent config cache."""
+    return agent_cache.stats()
+
+
+register_metrics("agent_cache", get_agent_cache_stats)
 
 
 async def create_agent(user_id: str, agent: AgentCreate) -> dict:
@@ -19,9 +37,9 @@ async def create_agent(user_id: str, agent: AgentCreate) -> dict:
     """
     data = agent.dict()
     data["user_id"] = user_id
-    supabase = get_supabase_client()
     try:
-        res = supabase.table(AGENT_TABLE).insert(data).execute()
+        query = agent_repo.query().insert(data)
+        res = await agent_repo.execute(query, "insert")
         if res.data:
             return res.data[0]
         logger.error(f"Supabase insert error: {res.error}")
@@ -33,43 +51,52 @@ async def create_agent(user_id: str, agent: AgentCreate) -> dict:
 
 async def get_agent_by_id(agent_id: str, user_id: str) -> Optional[dict]:
     """
-    Retrieve an agent by ID and user.
+    Retrieve an agent by ID and user, served from the agent cache when fresh.
     Returns None if not found.
     Raises SupabaseClientError on failure.
     """
-    supabase = get_supabase_client()
+    key = (user_id, agent_id)
+    cached = agent_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+    # A read that started before an update/archive must neither be shared with
+    # later callers nor cached over the invalidation
+    version = agent_cache.version(key)
     try:
-        res = (
-            supabase.table(AGENT_TABLE)
+        query = (
+            agent_repo.query()
             .select("*")
             .eq("id", agent_id)
             .eq("user_id", user_id)
             .single()
-            .execute()
         )
+        res = await agent_repo.execute_shared(("id", user_id, agent_id, version), query)
         if res.data:
-            return res.data
+            agent_cache.set(key, dict(res.data), version=version)
+            return dict(res.data)
         return None
     except Exception as e:
         logger.error(f"Error fetching agent by id: {e}")
         raise SupabaseClientError("Failed to fetch agent")
 
 
-async def get_agents_by_user(user_id: str) -> List[dict]:
+async def get_agents_by_user(
+    user_id: str, columns: Optional[List[str]] = None
+) -> List[dict]:
     """
     Retrieve all non-archived agents for a user.
+    `columns` restricts the selected columns (default: all).
     Returns empty list if none found.
     Raises SupabaseClientError on failure.
     """
-    supabase = get_supabase_client()
     try:
-        res = (
-            supabase.table(AGENT_TABLE)
-            .select("*")
+        query = (
+            agent_repo.query()
+            .select(select_columns(columns))
             .eq("user_id", user_id)
             .eq("archived", False)
-            .execute()
         )
+        res = await agent_repo.execute(query, "select")
         return res.data or []
     except Exception as e:
         logger.error(f"Error fetching agents by user: {e}")
@@ -85,21 +112,23 @@ async def update_agent(
     Raises SupabaseClientError on failure.
     """
     data = agent.dict(exclude_unset=True)
-    supabase = get_supabase_client()
     try:
-        res = (
-            supabase.table(AGENT_TABLE)
+        query = (
+            agent_repo.query()
             .update(data)
             .eq("id", agent_id)
             .eq("user_id", user_id)
-            .execute()
         )
+        res = await agent_repo.execute(query, "update")
         if res.data:
             return res.data[0]
         return None
     except Exception as e:
         logger.error(f"Error updating agent: {e}")
         raise SupabaseClientError("Failed to update agent")
+    finally:
+        # Also on failure: the write may have been applied before the error
+        agent_cache.invalidate((user_id, agent_id))
 
 
 async def archive_agent(agent_id: str, user_id: str) -> Optional[dict]:
@@ -108,22 +137,74 @@ async def archive_agent(agent_id: str, user_id: str) -> Optional[dict]:
     Returns updated agent dict or None.
     Raises SupabaseClientError on failure.
     """
-    supabase = get_supabase_client()
     try:
-        res = (
-            supabase.table(AGENT_TABLE)
+        query = (
+            agent_repo.query()
             .update({"archived": True})
             .eq("id", agent_id)
             .eq("user_id", user_id)
-            .execute()
         )
+        res = await agent_repo.execute(query, "update")
         if res.data:
             return res.data[0]
         return None
     except Exception as e:
         logger.error(f"Error archiving agent: {e}")
         raise SupabaseClientError("Failed to archive agent")
+    finally:
+        # Also on failure: the write may have been applied before the error
+        agent_cache.invalidate((user_id, agent_id))
+
+
+async def create_agents_bulk(user_id: str, agents: List[AgentCreate]) -> BulkResponse:
+    """
+    Create many agents for a user with a single multi-row insert.
+    Raises SupabaseClientError on failure.
+    """
+    rows = [{**agent.dict(), "user_id": user_id} for agent in agents]
+    try:
+        created = await agent_repo.insert_many(rows)
+    except Exception as e:
+        logger.error(f"Error bulk creating {len(rows)} agents: {e}")
+        raise SupabaseClientError("Failed to create agents")
+    return BulkResponse.from_created(created)
+
+
+async def update_agents_bulk(
+    user_id: str, agents: List[AgentBulkUpdate]
+) -> BulkResponse:
+    """
+    Update many agents owned by a user (one concurrent update per agent).
+    Agents not found or not owned by the user are reported as not_found.
+    Raises SupabaseClientError on failure.
+    """
+    updates = {a.id: a.dict(exclude_unset=True, exclude={"id"}) for a in agents}
+    try:
+        updated = await agent_repo.update_many(user_id, updates)
+    except Exception as e:
+        logger.error(f"Error bulk updating {len(updates)} agents: {e}")
+        raise SupabaseClientError("Failed to update agents")
+    finally:
+        # Rows are updated concurrently, so some may have changed on failure
+        for agent_id in updates:
+            agent_cache.invalidate((user_id, agent_id))
+    return BulkResponse.from_ids([a.id for a in agents], updated, "updated")
+
+
+async def archive_agents_bulk(user_id: str, agent_ids: List[str]) -> BulkResponse:
+    """
+    Archive many agents owned by a user in a single statement.
+    Raises SupabaseClientError on failure.
+    """
+    try:
+        archived = await agent_repo.set_many(user_id, agent_ids, {"archived": True})
+    except Exception as e:
+        logger.error(f"Error bulk archiving {len(agent_ids)} agents: {e}")
+        raise SupabaseClientError("Failed to archive agents")
+    finally:
+        for agent_id in agent_ids:
+            agent_cache.invalidate((user_id, agent_id))
+    return BulkResponse.from_ids(agent_ids, archived, "archived")
 
 
-# TODO: When async supabase client is available, refactor these methods to async and use await.
 # TODO: Integrate KeyService for secure secret handling when available.
@@ -1,19 +1,27 @@
-from typing import List
+import asyncio
+import base64
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional, Tuple
 
 from loguru import logger
 
-from app.db.supabase_client import SupabaseClientError, get_supabase_client
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+from app.db.crud.crud_agent import agent_cache, get_agent_by_id
+from app.db.repository import Repository, select_columns
+from app.db.supabase_client import SupabaseClientError
+from app.db.write_behind import WriteBehindBuffer
 from app.models.chat import ChatMessageCreate, ChatSessionCreate
 
-# TODO: When async supabase client is available, refactor these methods to async/await.
 # TODO: Integrate KeyService for secure secret handling and Vault integration when ready.
 
 SESSION_TABLE = "chat_sessions"
 MESSAGE_TABLE = "chat_messages"
 
-# Replace all usages of 'supabase' with the result of get_supabase_client() where needed.
-# For example:
-# supabase = get_supabase_client()
+session_repo = Repository(SESSION_TABLE)
+message_repo = Repository(MESSAGE_TABLE)
 
 
 async def create_session(user_id: str, session: ChatSessionCreate) -> dict:
@@ -23,9 +31,9 @@ async def create_session(user_id: str, session: ChatSessionCreate) -> dict:
     """
     data = session.dict()
     data["user_id"] = user_id
-    supabase = get_supabase_client()
     try:
-        res = supabase.table(SESSION_TABLE).insert(data).execute()
+        query = session_repo.query().insert(data)
+        res = await session_repo.execute(query, "insert")
         if res.data:
             return res.data[0]
         logger.error(f"Supabase insert error: {res.error}")
@@ -35,38 +43,66 @@ async def create_session(user_id: str, session: ChatSessionCreate) -> dict:
         raise SupabaseClientError("Failed to create chat session")
 
 
-async def list_sessions(user_id: str) -> List[dict]:
+async def list_sessions(
+    user_id: str, columns: Optional[List[str]] = None
+) -> List[dict]:
     """
     List all non-archived chat sessions for a user, ordered by creation time (desc).
+    `columns` restricts the selected columns (default: all).
     Returns empty list if none found.
     Raises SupabaseClientError on failure.
     """
-    supabase = get_supabase_client()
     try:
-        res = (
-            supabase.table(SESSION_TABLE)
-            .select("*")
+        query = (
+            session_repo.query()
+            .select(select_columns(columns))
             .eq("user_id", user_id)
             .eq("archived", False)
             .order("created_at", desc=True)
-            .execute()
         )
+        res = await session_repo.execute(query, "select")
         return res.data or []
     except Exception as e:
         logger.error(f"Error listing chat sessions: {e}")
         raise SupabaseClientError("Failed to list chat sessions")
 
 
+async def get_session(session_id: str, user_id: str) -> Optional[dict]:
+    """
+    Retrieve a chat session by ID if it belongs to the user.
+    Returns None if not found.
+    Raises SupabaseClientError on failure.
+    """
+    try:
+        uuid.UUID(session_id)
+    except ValueError:
+        return None
+    try:
+        query = (
+            session_repo.query()
+            .select("*")
+            .eq("id", session_id)
+            .eq("user_id", user_id)
+            .limit(1)
+        )
+        res = await session_repo.execute(query, "select")
+        return res.data[0] if res.data else None
+    except Exception as e:
+        logger.error(f"Error fetching chat session: {e}")
+        raise SupabaseClientError("Failed to fetch chat session")
+
+
 async def save_message(chat_session_id: str, message: ChatMessageCreate) -> dict:
     """
     Save a chat message to a session.
     Raises SupabaseClientError on failure.
     """
-    data = message.dict()
+    # Unset optional columns (e.g. token_counts) are left to their defaults
+    data = message.dict(exclude_none=True)
     data["chat_session_id"] = chat_session_id
-    supabase = get_supabase_client()
     try:
-        res = supabase.table(MESSAGE_TABLE).insert(data).execute()
+        query = message_repo.query().insert(data)
+        res = await message_repo.execute(query, "insert")
         if res.data:
             return res.data[0]
         logger.error(f"Supabase insert error: {res.error}")
@@ -76,25 +112,182 @@ async def save_message(chat_session_id: str, message: ChatMessageCreate) -> dict
         raise SupabaseClientError("Failed to save chat message")
 
 
+async def save_messages(rows: List[dict]) -> List[dict]:
+    """
+    Insert many message rows (each carrying its chat_session_id) in one statement.
+    Rows are stored in list order. Raises SupabaseClientError on failure.
+    """
+    try:
+        query = message_repo.query().insert(rows)
+        res = await message_repo.execute(query, "insert")
+        return res.data or []
+    except Exception as e:
+        logger.error(f"Error bulk saving {len(rows)} chat messages: {e}")
+        raise SupabaseClientError("Failed to save chat messages")
+
+
+message_write_buffer = WriteBehindBuffer(
+    MESSAGE_TABLE,
+    save_messages,
+    max_batch_size=get_settings().CHAT_WRITE_BEHIND_MAX_BATCH,
+    flush_interval=get_settings().CHAT_WRITE_BEHIND_INTERVAL_MS / 1000,
+    max_queue_size=get_settings().CHAT_WRITE_BEHIND_MAX_QUEUE,
+)
+register_metrics("chat_write_behind", message_write_buffer.stats)
+
+
+async def enqueue_message(
+    chat_session_id: str, message: ChatMessageCreate
+) -> asyncio.Future:
+    """
+    Queue a chat message for the next group commit instead of inserting it now.
+    The timestamp is fixed at enqueue time so per-session ordering survives
+    batching. Returns a future resolving to the stored row (or the flush error).
+    """
+    data = message.dict(exclude_none=True)
+    data["chat_session_id"] = chat_session_id
+    data.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+    return await message_write_buffer.submit(data)
+
+
+async def persist_message(chat_session_id: str, message: ChatMessageCreate) -> None:
+    """
+    Persist a chat message, through the write-behind buffer when
+    CHAT_WRITE_BEHIND_ENABLED is set, otherwise with a direct insert.
+    """
+    if get_settings().CHAT_WRITE_BEHIND_ENABLED:
+        await enqueue_message(chat_session_id, message)
+    else:
+        await save_message(chat_session_id, message)
+
+
+def encode_message_cursor(message: dict) -> str:
+    """Build an opaque pagination cursor from a message's timestamp and id."""
+    raw = json.dumps([str(message["timestamp"]), str(message["id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_message_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor produced by encode_message_cursor into a normalised
+    (ISO timestamp, UUID) pair that is safe to embed in a filter string.
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        timestamp, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (
+            datetime.fromisoformat(timestamp).isoformat(),
+            str(uuid.UUID(message_id)),
+        )
+    except Exception as e:
+        raise ValueError("Invalid message cursor") from e
+
+
 async def get_messages(
-    chat_session_id: str, limit: int = 50, offset: int = 0
+    chat_session_id: str,
+    limit: int = 50,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    direction: str = "forward",
 ) -> List[dict]:
     """
-    Retrieve messages for a chat session, paginated.
+    Retrieve messages for a chat session in chronological order.
+    With a cursor, uses keyset pagination on (timestamp, id) to return the page
+    after (direction="forward") or before (direction="backward") the cursor.
+    With direction="backward" and no cursor, returns the latest `limit` messages.
+    `offset` is only honoured for forward reads without a cursor (legacy).
     Returns empty list if none found.
-    Raises SupabaseClientError on failure.
+    Raises ValueError on an invalid cursor, SupabaseClientError on failure.
     """
-    supabase = get_supabase_client()
+    backward = direction == "backward"
+    keyset_filter = None
+    if cursor:
+        timestamp, message_id = decode_message_cursor(cursor)
+        op = "lt" if backward else "gt"
+        keyset_filter = (
+            f'timestamp.{op}."{timestamp}",'
+            f'and(timestamp.eq."{timestamp}",id.{op}."{message_id}")'
+        )
     try:
-        res = (
-            supabase.table(MESSAGE_TABLE)
+        query = (
+            message_repo.query()
             .select("*")
             .eq("chat_session_id", chat_session_id)
-            .order("timestamp", desc=False)
-            .range(offset, offset + limit - 1)
-            .execute()
         )
-        return res.data or []
+        if keyset_filter:
+            query = query.or_(keyset_filter)
+        query = query.order("timestamp", desc=backward).order("id", desc=backward)
+        if cursor or backward:
+            query = query.limit(limit)
+        else:
+            query = query.range(offset, offset + limit - 1)
+        res = await message_repo.execute(query, "select")
+        rows = res.data or []
+        return list(reversed(rows)) if backward else rows
     except Exception as e:
         logger.error(f"Error retrieving chat messages: {e}")
         raise SupabaseClientError("Failed to retrieve chat messages")
+
+
+async def get_latest_messages(chat_session_id: str, limit: int = 20) -> List[dict]:
+    """
+    Retrieve the most recent `limit` messages of a session, oldest first.
+    Raises SupabaseClientError on failure.
+    """
+    return await get_messages(chat_session_id, limit=limit, direction="backward")
+
+
+class TurnContext(NamedTuple):
+    agent: Optional[dict]
+    history: List[dict]
+    message: Optional[dict]
+
+
+async def get_turn_context(
+    user_id: str,
+    agent_id: str,
+    chat_session_id: str,
+    message: ChatMessageCreate,
+    history_limit: int = 20,
+) -> TurnContext:
+    """
+    Load the agent, the latest `history_limit` messages (oldest first, not
+    including `message`) and store the incoming `message` for an agent turn.
+    With AGENT_TURN_CONTEXT_RPC this is a single call to the
+    agent_turn_context database function; otherwise the agent and history are
+    fetched concurrently and the message is persisted afterwards.
+    `agent` is None, and nothing is stored or returned, if the user does not
+    own both the agent and the chat session.
+    Raises SupabaseClientError on failure.
+    """
+    if not get_settings().AGENT_TURN_CONTEXT_RPC:
+        agent, session, history = await asyncio.gather(
+            get_agent_by_id(agent_id, user_id),
+            get_session(chat_session_id, user_id),
+            get_latest_messages(chat_session_id, limit=history_limit),
+        )
+        if agent is None or session is None:
+            return TurnContext(None, [], None)
+        await persist_message(chat_session_id, message)
+        return TurnContext(agent, history, None)
+
+    # As in get_agent_by_id: don't cache an agent row that raced an update
+    version = agent_cache.version((user_id, agent_id))
+    params = {
+        "p_user_id": user_id,
+        "p_agent_id": agent_id,
+        "p_chat_session_id": chat_session_id,
+        "p_message": message.dict(exclude_none=True),
+        "p_history_limit": history_limit,
+    }
+    try:
+        query = message_repo.rpc("agent_turn_context", params)
+        res = await message_repo.execute(query, "rpc")
+    except Exception as e:
+        logger.error(f"Error loading turn context: {e}")
+        raise SupabaseClientError("Failed to load turn context")
+    data = res.data or {}
+    agent = data.get("agent")
+    if agent:
+        agent_cache.set((user_id, agent_id), dict(agent), version=version)
+    return TurnContext(agent, data.get("history") or [], data.get("message"))
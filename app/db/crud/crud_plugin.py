@@ -9,8 +9,8 @@ from typing import Optional
 
 from postgrest import APIError  # type: ignore
 
-# Assuming supabase_py_async client is used, adjust imports if using Prisma
-from supabase_py_async import AsyncClient
+# Pass the shared client from app.db.supabase_client.get_async_supabase_client()
+from supabase import AsyncClient
 
 from app.models.plugin import (
     PluginConfigurationCreate,
@@ -0,0 +1,174 @@
+"""Request-scoped accounting of data-access round trips.
+
+Every ``Repository.execute`` call is timed and recorded with its table,
+operation, row count and query *shape* (the query with its values stripped).
+Records go to the ``QueryLog`` of the current request, when one is active,
+and to process-wide per-table counters exposed on /metrics. A request that
+issues the same shape several times is flagged as a likely N+1 pattern.
+"""
+
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from loguru import logger
+
+from app.core.metrics import register_metrics
+from app.db.sql_builder import SqlQuery, SqlRpc
+
+
+@dataclass
+class QueryRecord:
+    table: str
+    operation: str
+    shape: str
+    duration_ms: float
+    rows: int
+    error: bool = False
+
+
+@dataclass
+class QueryLog:
+    """All data-access calls made while serving one request."""
+
+    records: list[QueryRecord] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.records)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(r.duration_ms for r in self.records)
+
+    def repeated_shapes(self, threshold: int) -> dict[str, int]:
+        """Return shapes issued at least `threshold` times in this request."""
+        counts = Counter(r.shape for r in self.records)
+        return {shape: n for shape, n in counts.items() if n >= threshold}
+
+
+class QueryMetrics:
+    """Process-wide call, latency and row counters per table and operation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops: dict[str, dict] = {}
+        self.requests = 0
+        self.requests_with_repeats = 0
+
+    def record(self, record: QueryRecord) -> None:
+        key = f"{record.table}.{record.operation}"
+        with self._lock:
+            ops = self._ops.setdefault(
+                key, {"calls": 0, "errors": 0, "rows": 0, "total_ms": 0.0}
+            )
+            ops["calls"] += 1
+            ops["errors"] += int(record.error)
+            ops["rows"] += record.rows
+            ops["total_ms"] += record.duration_ms
+
+    def record_request(self, repeated: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.requests_with_repeats += int(repeated)
+
+    def stats(self) -> dict:
+        """Return per-operation counters with average latency."""
+        with self._lock:
+            operations = {
+                key: {
+                    **ops,
+                    "total_ms": round(ops["total_ms"], 3),
+                    "avg_ms": round(ops["total_ms"] / ops["calls"], 3),
+                }
+                for key, ops in self._ops.items()
+            }
+            return {
+                "requests": self.requests,
+                "requests_with_repeats": self.requests_with_repeats,
+                "operations": operations,
+            }
+
+
+query_metrics = QueryMetrics()
+register_metrics("queries", query_metrics.stats)
+
+_current_log: ContextVar[Optional[QueryLog]] = ContextVar(
+    "query_log", default=None
+)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryLog]:
+    """Collect every query issued in this context (and tasks it spawns)."""
+    log = QueryLog()
+    token = _current_log.set(log)
+    try:
+        yield log
+    finally:
+        _current_log.reset(token)
+
+
+def current_query_log() -> Optional[QueryLog]:
+    """Return the query log of the request being served, if any."""
+    return _current_log.get()
+
+
+def query_shape(query: Any) -> str:
+    """
+    Describe a query without its values so identical-shape queries compare
+    equal: compiled SQL for the SQL backend, or the PostgREST method, table
+    and filter operators for the Supabase client.
+    """
+    if isinstance(query, (SqlQuery, SqlRpc)):
+        return query.compile()[0]
+    try:
+        request = query.request
+        parts = []
+        for key, value in request.params.multi_items():
+            if key in ("select", "order", "on_conflict"):
+                parts.append(f"{key}={value}")
+            elif key in ("limit", "offset"):
+                parts.append(key)
+            else:
+                parts.append(f"{key}={value.split('.', 1)[0]}")
+        table = str(request.path).rstrip("/").rsplit("/", 1)[-1]
+        return f"{request.http_method} {table}?{'&'.join(parts)}"
+    except (AttributeError, TypeError):
+        return type(query).__name__
+
+
+def report_request(log: QueryLog, label: str, repeat_threshold: int) -> dict:
+    """
+    Account a finished request and warn about query shapes it repeated at
+    least `repeat_threshold` times (typically a per-item lookup in a loop).
+    Returns the repeated shapes with their counts.
+    """
+    repeated = log.repeated_shapes(repeat_threshold)
+    for shape, count in repeated.items():
+        logger.warning(
+            f"{label} issued {count} queries of the same shape (possible N+1): "
+            f"{shape}"
+        )
+    query_metrics.record_request(bool(repeated))
+    return repeated
+
+
+def record_query(
+    table: str,
+    operation: str,
+    shape: str,
+    duration_ms: float,
+    rows: int,
+    error: bool = False,
+) -> None:
+    """Add one round trip to the process metrics and the current request log."""
+    record = QueryRecord(table, operation, shape, duration_ms, rows, error)
+    query_metrics.record(record)
+    log = _current_log.get()
+    if log is not None:
+        log.records.append(record)
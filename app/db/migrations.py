@@ -0,0 +1,62 @@
+"""Versioned schema migrations.
+
+Migrations are plain SQL files in ``supabase/migrations`` named
+``<version>_<description>.sql`` so the Supabase CLI can apply them as-is.
+``apply_migrations`` applies the same files to any Postgres reachable with
+asyncpg (local development, CI, the direct Postgres backend), recording each
+applied version in ``schema_migrations``.
+"""
+
+from pathlib import Path
+from typing import NamedTuple
+
+import asyncpg
+from loguru import logger
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "supabase" / "migrations"
+
+
+class Migration(NamedTuple):
+    version: str
+    name: str
+    path: Path
+
+
+def list_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """Return the migrations in `directory` ordered by version."""
+    migrations = []
+    for path in sorted(directory.glob("*.sql")):
+        version, _, name = path.stem.partition("_")
+        migrations.append(Migration(version, name, path))
+    return migrations
+
+
+async def apply_migrations(
+    conn: asyncpg.Connection, directory: Path = MIGRATIONS_DIR
+) -> list[str]:
+    """
+    Apply pending migrations in version order, each in its own transaction.
+    Returns the versions applied by this call.
+    """
+    await conn.execute(
+        "create table if not exists schema_migrations ("
+        " version text primary key,"
+        " applied_at timestamptz not null default now())"
+    )
+    applied = {
+        row["version"]
+        for row in await conn.fetch("select version from schema_migrations")
+    }
+    newly_applied = []
+    for migration in list_migrations(directory):
+        if migration.version in applied:
+            continue
+        async with conn.transaction():
+            await conn.execute(migration.path.read_text())
+            await conn.execute(
+                "insert into schema_migrations (version) values ($1)",
+                migration.version,
+            )
+        logger.info(f"Applied migration {migration.version} ({migration.name})")
+        newly_applied.append(migration.version)
+    return newly_applied
@@ -0,0 +1,113 @@
+"""Direct Postgres storage backend on an asyncpg connection pool.
+
+Selected with ``DB_BACKEND=postgres``. Queries built by the repositories are
+compiled by ``app.db.sql_builder`` and run here, skipping the PostgREST HTTP
+hop. Values are exchanged in PostgREST's JSON shape (ids as strings,
+timestamps as ISO 8601 strings, json/jsonb as Python objects) so callers see
+identical rows on either backend.
+"""
+
+import json
+import re
+from typing import Any, Optional
+
+import asyncpg
+from loguru import logger
+
+from app.core.config import get_settings
+from app.db.supabase_client import SupabaseClientError
+
+# Postgres' text output for timestamp/timestamptz, e.g. "2024-01-01 00:00:00+00"
+_TIMESTAMP = re.compile(
+    r"^(\d{4,}-\d\d-\d\d) (\d\d:\d\d:\d\d(?:\.\d+)?)([+-]\d\d(?::\d\d)*)?$"
+)
+
+
+def _to_text(value: Any) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _iso_timestamp(text: str) -> str:
+    """Rewrite a timestamp as PostgREST (to_json) does: "2024-01-01T00:00:00+00:00"."""
+    match = _TIMESTAMP.match(text)
+    if match is None:  # infinity, BC dates
+        return text
+    date, clock, offset = match.groups()
+    if offset and len(offset) == 3:
+        offset += ":00"
+    return f"{date}T{clock}{offset or ''}"
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    """Register text codecs so rows match what PostgREST would return."""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name,
+            schema="pg_catalog",
+            encoder=json.dumps,
+            decoder=json.loads,
+            format="text",
+        )
+    for type_name, decoder in (
+        ("uuid", str),
+        ("timestamptz", _iso_timestamp),
+        ("timestamp", _iso_timestamp),
+        ("date", str),
+    ):
+        await conn.set_type_codec(
+            type_name,
+            schema="pg_catalog",
+            encoder=_to_text,
+            decoder=decoder,
+            format="text",
+        )
+
+
+class PostgresBackend:
+    """Owns the asyncpg pool and executes compiled statements on it."""
+
+    def __init__(self):
+        self._pool: Optional[asyncpg.Pool] = None
+
+    async def init(self) -> None:
+        """Create the connection pool. Raises SupabaseClientError on failure."""
+        if self._pool is not None:
+            return
+        settings = get_settings()
+        if not settings.DATABASE_URL:
+            raise SupabaseClientError("DATABASE_URL is required for DB_BACKEND=postgres")
+        try:
+            self._pool = await asyncpg.create_pool(
+                settings.DATABASE_URL,
+                min_size=settings.POSTGRES_POOL_MIN_SIZE,
+                max_size=settings.POSTGRES_POOL_MAX_SIZE,
+                statement_cache_size=settings.POSTGRES_STATEMENT_CACHE_SIZE,
+                init=_init_connection,
+            )
+            logger.info("Postgres connection pool initialized.")
+        except Exception as e:
+            logger.error(f"Failed to create Postgres pool: {e}")
+            raise SupabaseClientError("Could not initialize Postgres pool")
+
+    async def fetch(self, sql: str, args: list[Any]) -> list[dict]:
+        """Run a statement on a pooled connection; prepared statements are cached."""
+        if self._pool is None:
+            await self.init()
+        async with self._pool.acquire() as conn:
+            records = await conn.fetch(sql, *args)
+        return [dict(record) for record in records]
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+# Singleton backend for app-wide usage
+postgres_backend = PostgresBackend()
+
+
+def get_sql_executor() -> PostgresBackend:
+    """Return the executor used by repositories when DB_BACKEND=postgres."""
+    return postgres_backend
@@ -0,0 +1,96 @@
+"""Query plan checks for the SQL the repositories generate.
+
+CRUD functions are run against a ``RecordingExecutor`` to capture the exact
+statements they would send, which are then EXPLAINed on a real Postgres with
+sequential scans disabled. Any remaining ``Seq Scan`` means no index can serve
+the query's filters.
+"""
+
+import json
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+import asyncpg
+
+from app.db.repository import use_sql_executor
+
+
+@dataclass
+class CapturedQuery:
+    label: str
+    sql: str
+    args: list[Any]
+
+
+class RecordingExecutor:
+    """SQL executor that records statements and returns no rows."""
+
+    def __init__(self):
+        self.statements: list[tuple[str, list[Any]]] = []
+
+    async def fetch(self, sql: str, args: list[Any]) -> list[dict]:
+        self.statements.append((sql, list(args)))
+        return []
+
+
+async def capture_queries(
+    probes: list[tuple[str, Callable[[], Awaitable[Any]]]],
+) -> list[CapturedQuery]:
+    """
+    Run each probe with repository queries routed to a recorder and return
+    the statements issued. Probe errors (e.g. "not found" on an empty result)
+    are ignored; only the captured SQL matters.
+    """
+    captured = []
+    for label, probe in probes:
+        recorder = RecordingExecutor()
+        with use_sql_executor(recorder):
+            try:
+                await probe()
+            except Exception:
+                pass
+        captured.extend(
+            CapturedQuery(label, sql, args) for sql, args in recorder.statements
+        )
+    return captured
+
+
+def find_seq_scans(plan: Any) -> list[str]:
+    """Return the relations read by a Seq Scan anywhere in an EXPLAIN JSON plan."""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    if isinstance(plan, list):
+        return [rel for item in plan for rel in find_seq_scans(item)]
+    if "Plan" in plan:
+        return find_seq_scans(plan["Plan"])
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", []):
+        found.extend(find_seq_scans(child))
+    return found
+
+
+async def explain(conn: asyncpg.Connection, query: CapturedQuery) -> Any:
+    """EXPLAIN a captured statement, without executing it."""
+    return await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query.sql}", *query.args)
+
+
+async def check_query_plans(
+    conn: asyncpg.Connection, queries: list[CapturedQuery]
+) -> list[tuple[CapturedQuery, list[str]]]:
+    """
+    EXPLAIN every non-insert statement with seq scans disabled.
+    Returns (query, relations) pairs for plans that still scan a table.
+    """
+    failures = []
+    async with conn.transaction():
+        await conn.execute("SET LOCAL enable_seqscan = off")
+        for query in queries:
+            if query.sql.startswith("INSERT"):
+                continue
+            relations = find_seq_scans(await explain(conn, query))
+            if relations:
+                failures.append((query, relations))
+    return failures
@@ -0,0 +1,153 @@
+"""Async data access layer shared by the CRUD modules and services.
+
+Every query goes through a ``Repository`` so it is awaited on the configured
+backend instead of blocking the event loop: the pooled async PostgREST client
+by default, or the asyncpg pool when ``DB_BACKEND=postgres``.
+"""
+
+import asyncio
+import time
+from collections.abc import Hashable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+from app.core.singleflight import SingleFlight
+from app.db.instrumentation import query_shape, record_query
+from app.db.postgres import get_sql_executor
+from app.db.sql_builder import SqlExecutor, SqlRpc, SqlTable
+from app.db.supabase_client import get_async_supabase_client
+
+# Shared by all repositories so identical concurrent reads collapse into one
+read_coalescer = SingleFlight()
+register_metrics("read_coalescing", read_coalescer.stats)
+
+# Executor forced for the current context, e.g. by tools that capture the SQL
+# the CRUD layer would run. Takes precedence over the configured backend.
+_sql_executor_override: ContextVar[Optional[SqlExecutor]] = ContextVar(
+    "sql_executor_override", default=None
+)
+
+
+@contextmanager
+def use_sql_executor(executor: SqlExecutor) -> Iterator[SqlExecutor]:
+    """Route every repository query in this context through `executor`."""
+    token = _sql_executor_override.set(executor)
+    try:
+        yield executor
+    finally:
+        _sql_executor_override.reset(token)
+
+
+def _active_sql_executor() -> Optional[SqlExecutor]:
+    """Return the SQL executor to use, or None for the Supabase client."""
+    override = _sql_executor_override.get()
+    if override is not None:
+        return override
+    if get_settings().DB_BACKEND == "postgres":
+        return get_sql_executor()
+    return None
+
+
+class Repository:
+    """Async access to a single Supabase table."""
+
+    def __init__(self, table: str):
+        self.table = table
+
+    def query(self) -> Any:
+        """Start a request builder for this table on the configured backend."""
+        executor = _active_sql_executor()
+        if executor is not None:
+            return SqlTable(self.table, executor)
+        return get_async_supabase_client().table(self.table)
+
+    def rpc(self, fn: str, params: dict) -> Any:
+        """Start a call to a database function on the configured backend."""
+        executor = _active_sql_executor()
+        if executor is not None:
+            return SqlRpc(fn, params, executor)
+        return get_async_supabase_client().rpc(fn, params)
+
+    async def execute(self, query: Any, operation: str = "select") -> Any:
+        """
+        Await a built query on the async client, recording its round trip.
+        Errors propagate unchanged so callers keep their own error mapping.
+        """
+        logger.debug(f"Supabase {operation} on {self.table}")
+        shape = query_shape(query)
+        started = time.perf_counter()
+        try:
+            res = await query.execute()
+        except Exception:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            record_query(self.table, operation, shape, elapsed_ms, 0, error=True)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        data = getattr(res, "data", None)
+        rows = len(data) if isinstance(data, list) else int(data is not None)
+        record_query(self.table, operation, shape, elapsed_ms, rows)
+        return res
+
+    async def execute_shared(self, key: Hashable, query: Any) -> Any:
+        """
+        Await a read, sharing one in-flight query among concurrent callers that
+        pass the same key. Only use for side-effect-free selects; the response
+        object is shared, so callers must not mutate it.
+        """
+        return await read_coalescer.do(
+            (self.table, key), lambda: self.execute(query, "select")
+        )
+
+    async def insert_many(self, rows: list[dict]) -> list[dict]:
+        """Insert rows in one multi-row statement; returns stored rows in order."""
+        res = await self.execute(self.query().insert(rows), "insert")
+        return res.data or []
+
+    async def update_many(self, user_id: str, updates: dict[str, dict]) -> list[dict]:
+        """
+        Apply per-row partial updates, keyed by id, to rows owned by user_id.
+        Each row gets its own UPDATE of just its changed columns, issued
+        concurrently, so concurrent writes to other columns survive and rows
+        deleted in the meantime are not re-created. Ids not owned by the user
+        are skipped; rows with nothing to change are returned as they are.
+        """
+        if not updates:
+            return []
+        pending = []
+        for row_id, data in updates.items():
+            if data:
+                query = self.query().update(data).eq("id", row_id)
+                pending.append(self.execute(query.eq("user_id", user_id), "update"))
+        unchanged = [row_id for row_id, data in updates.items() if not data]
+        if unchanged:
+            query = self.query().select("*").eq("user_id", user_id)
+            pending.append(self.execute(query.in_("id", unchanged), "select"))
+        results = await asyncio.gather(*pending)
+        return [row for res in results for row in res.data or []]
+
+    async def set_many(self, user_id: str, ids: list[str], data: dict) -> list[dict]:
+        """Apply the same update to all listed rows owned by user_id at once."""
+        query = (
+            self.query()
+            .update(data)
+            .eq("user_id", user_id)
+            .in_("id", ids)
+        )
+        res = await self.execute(query, "update")
+        return res.data or []
+
+    async def delete_many(self, user_id: str, ids: list[str]) -> list[dict]:
+        """Delete all listed rows owned by user_id in one statement."""
+        query = self.query().delete().eq("user_id", user_id).in_("id", ids)
+        res = await self.execute(query, "delete")
+        return res.data or []
+
+
+def select_columns(columns: Optional[list[str]] = None) -> str:
+    """Turn an optional column projection into a PostgREST select clause."""
+    return ",".join(columns) if columns else "*"
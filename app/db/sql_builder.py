@@ -0,0 +1,339 @@
+"""SQL query builder mirroring the PostgREST request builder API.
+
+Repositories build queries with the same chain (``select().eq().order()...``)
+whichever storage backend is configured. With the direct Postgres backend the
+chain is compiled here into one parameterised statement and run through a
+``SqlExecutor``; parameterised SQL keeps the statement text stable per query
+shape, so the driver's prepared statement cache is reused across requests.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Optional, Protocol, Union
+
+from postgrest import APIError  # type: ignore
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+_OPERATORS = {
+    "eq": "=",
+    "neq": "<>",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+}
+
+
+class SqlExecutor(Protocol):
+    """Runs a compiled statement and returns the resulting rows as dicts."""
+
+    async def fetch(self, sql: str, args: list[Any]) -> list[dict]: ...
+
+
+@dataclass
+class SqlResponse:
+    """Result of an executed query; shaped like the PostgREST APIResponse."""
+
+    data: Any
+    count: Optional[int] = None
+    error: Optional[str] = None
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a column or table name, rejecting anything but plain identifiers."""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return f'"{name}"'
+
+
+def _split_top_level(expr: str) -> list[str]:
+    """Split a PostgREST logic expression on commas outside parens and quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in expr:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+@dataclass
+class SqlQuery:
+    """A single statement being built against one table."""
+
+    table: str
+    executor: SqlExecutor
+    operation: str = "select"
+    columns: str = "*"
+    payload: Union[dict, list, None] = None
+    on_conflict: Optional[list[str]] = None
+    filters: list[str] = field(default_factory=list)
+    args: list[Any] = field(default_factory=list)
+    ordering: list[str] = field(default_factory=list)
+    limit_count: Optional[int] = None
+    offset_count: Optional[int] = None
+    single_row: bool = False
+    # With single_row: whether no row is allowed (maybe_single) or an error
+    optional_row: bool = False
+
+    # --- statements -----------------------------------------------------
+
+    def select(self, columns: str = "*") -> "SqlQuery":
+        self.operation = "select"
+        self.columns = columns
+        return self
+
+    def insert(self, payload: Union[dict, list]) -> "SqlQuery":
+        self.operation = "insert"
+        self.payload = payload
+        return self
+
+    def upsert(
+        self, payload: Union[dict, list], on_conflict: Union[str, list] = "id"
+    ) -> "SqlQuery":
+        self.operation = "insert"
+        self.payload = payload
+        if isinstance(on_conflict, str):
+            on_conflict = [c.strip() for c in on_conflict.split(",") if c.strip()]
+        self.on_conflict = list(on_conflict)
+        return self
+
+    def update(self, payload: dict) -> "SqlQuery":
+        self.operation = "update"
+        self.payload = payload
+        return self
+
+    def delete(self) -> "SqlQuery":
+        self.operation = "delete"
+        return self
+
+    # --- filters and modifiers -----------------------------------------
+
+    def _param(self, value: Any) -> str:
+        self.args.append(value)
+        return f"${len(self.args)}"
+
+    def _condition(self, column: str, op: str, value: Any) -> str:
+        if op == "is":
+            if str(value).lower() != "null":
+                raise ValueError(f"Unsupported 'is' value: {value!r}")
+            return f"{quote_identifier(column)} IS NULL"
+        if op not in _OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op!r}")
+        return f"{quote_identifier(column)} {_OPERATORS[op]} {self._param(value)}"
+
+    def eq(self, column: str, value: Any) -> "SqlQuery":
+        self.filters.append(self._condition(column, "eq", value))
+        return self
+
+    def neq(self, column: str, value: Any) -> "SqlQuery":
+        self.filters.append(self._condition(column, "neq", value))
+        return self
+
+    def in_(self, column: str, values: list) -> "SqlQuery":
+        values = list(values)
+        if not values:
+            self.filters.append("FALSE")
+            return self
+        placeholders = ", ".join(self._param(v) for v in values)
+        self.filters.append(f"{quote_identifier(column)} IN ({placeholders})")
+        return self
+
+    def _logic(self, expr: str, joiner: str) -> str:
+        clauses = []
+        for raw_part in _split_top_level(expr):
+            part = raw_part.strip()
+            if part.startswith(("and(", "or(")) and part.endswith(")"):
+                inner_joiner = " AND " if part.startswith("and(") else " OR "
+                inner = part[part.index("(") + 1 : -1]
+                clauses.append(self._logic(inner, inner_joiner))
+                continue
+            column, op, value = part.split(".", 2)
+            if value.startswith('"') and value.endswith('"'):
+                value = value[1:-1]
+            clauses.append(self._condition(column, op, value))
+        return "(" + joiner.join(clauses) + ")"
+
+    def or_(self, filters: str) -> "SqlQuery":
+        """Add a PostgREST-style logic filter, e.g. 'a.gt.1,and(a.eq.1,b.gt.2)'."""
+        self.filters.append(self._logic(filters, " OR "))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "SqlQuery":
+        self.ordering.append(f"{quote_identifier(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, count: int) -> "SqlQuery":
+        self.limit_count = count
+        return self
+
+    def range(self, start: int, end: int) -> "SqlQuery":
+        self.offset_count = start
+        self.limit_count = end - start + 1
+        return self
+
+    def single(self) -> "SqlQuery":
+        """Return one row instead of a list; raise APIError unless exactly one."""
+        self.single_row = True
+        self.optional_row = False
+        return self
+
+    def maybe_single(self) -> "SqlQuery":
+        """Return one row, or None when there is none; raise APIError on more."""
+        self.single_row = True
+        self.optional_row = True
+        return self
+
+    # --- compilation ----------------------------------------------------
+
+    def _select_list(self) -> str:
+        if self.columns.strip() == "*":
+            return "*"
+        return ", ".join(quote_identifier(c.strip()) for c in self.columns.split(","))
+
+    def _where(self) -> str:
+        return f" WHERE {' AND '.join(self.filters)}" if self.filters else ""
+
+    def _compile_insert(self) -> str:
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        # Insert arguments must precede any filter arguments added earlier
+        self.args = []
+        values = []
+        for row in rows:
+            cells = [self._param(row[c]) if c in row else "DEFAULT" for c in columns]
+            values.append(f"({', '.join(cells)})")
+        sql = (
+            f"INSERT INTO {quote_identifier(self.table)} "
+            f"({', '.join(quote_identifier(c) for c in columns)}) "
+            f"VALUES {', '.join(values)}"
+        )
+        if self.on_conflict:
+            updates = ", ".join(
+                f"{quote_identifier(c)} = EXCLUDED.{quote_identifier(c)}"
+                for c in columns
+                if c not in self.on_conflict
+            )
+            conflict = ", ".join(quote_identifier(c) for c in self.on_conflict)
+            action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            sql += f" ON CONFLICT ({conflict}) {action}"
+        return sql + " RETURNING *"
+
+    def compile(self) -> tuple[str, list[Any]]:
+        """Return the SQL text and positional arguments for this query."""
+        # Compiling renumbers arguments; work on a copy so it can be repeated
+        filter_args = self.args
+        self.args = list(filter_args)
+        try:
+            return self._compile()
+        finally:
+            self.args = filter_args
+
+    def _compile(self) -> tuple[str, list[Any]]:
+        table = quote_identifier(self.table)
+        if self.operation == "insert":
+            return self._compile_insert(), self.args
+        if self.operation == "update":
+            filter_args = self.args
+            self.args = []
+            assignments = ", ".join(
+                f"{quote_identifier(c)} = {self._param(v)}"
+                for c, v in self.payload.items()
+            )
+            # Renumber filter placeholders after the SET arguments
+            shift = len(self.args)
+            where = re.sub(
+                r"\$(\d+)", lambda m: f"${int(m.group(1)) + shift}", self._where()
+            )
+            self.args += filter_args
+            return f"UPDATE {table} SET {assignments}{where} RETURNING *", self.args
+        if self.operation == "delete":
+            return f"DELETE FROM {table}{self._where()} RETURNING *", self.args
+        sql = f"SELECT {self._select_list()} FROM {table}{self._where()}"
+        if self.ordering:
+            sql += f" ORDER BY {', '.join(self.ordering)}"
+        # Two rows are enough to tell "more than one" apart for single()
+        limit = 2 if self.single_row else self.limit_count
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        if self.offset_count:
+            sql += f" OFFSET {int(self.offset_count)}"
+        return sql, self.args
+
+    async def execute(self) -> SqlResponse:
+        sql, args = self.compile()
+        rows = await self.executor.fetch(sql, args)
+        if self.single_row:
+            if len(rows) == 1 or (not rows and self.optional_row):
+                return SqlResponse(data=rows[0] if rows else None)
+            # Same error PostgREST returns for a single object request
+            raise APIError(
+                {
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "code": "PGRST116",
+                    "hint": None,
+                    "details": f"The result contains {len(rows)} rows",
+                }
+            )
+        return SqlResponse(data=rows)
+
+
+class SqlRpc:
+    """A stored function call, mirroring ``client.rpc(fn, params)``."""
+
+    def __init__(self, fn: str, params: dict, executor: SqlExecutor):
+        self.fn = fn
+        self.params = params
+        self.executor = executor
+
+    def compile(self) -> tuple[str, list[Any]]:
+        """Call the function with named arguments; its value is the result."""
+        named = ", ".join(
+            f"{quote_identifier(name)} => ${idx}"
+            for idx, name in enumerate(self.params, start=1)
+        )
+        sql = f'SELECT {quote_identifier(self.fn)}({named}) AS "result"'
+        return sql, list(self.params.values())
+
+    async def execute(self) -> SqlResponse:
+        sql, args = self.compile()
+        rows = await self.executor.fetch(sql, args)
+        return SqlResponse(data=rows[0]["result"] if rows else None)
+
+
+class SqlTable:
+    """Entry point mirroring ``client.table(name)`` for the SQL backend."""
+
+    def __init__(self, table: str, executor: SqlExecutor):
+        self.table = table
+        self.executor = executor
+
+    def _query(self) -> SqlQuery:
+        return SqlQuery(self.table, self.executor)
+
+    def select(self, columns: str = "*") -> SqlQuery:
+        return self._query().select(columns)
+
+    def insert(self, payload: Union[dict, list]) -> SqlQuery:
+        return self._query().insert(payload)
+
+    def upsert(
+        self, payload: Union[dict, list], on_conflict: Union[str, list] = "id"
+    ) -> SqlQuery:
+        return self._query().upsert(payload, on_conflict=on_conflict)
+
+    def update(self, payload: dict) -> SqlQuery:
+        return self._query().update(payload)
+
+    def delete(self) -> SqlQuery:
+        return self._query().delete()
@@ -1,8 +1,28 @@
+import threading
+from typing import Optional
+
+import httpx
 from loguru import logger
-from supabase import Client, create_client
+from supabase import (
+    AsyncClient,
+    AsyncClientOptions,
+    Client,
+    ClientOptions,
+    create_client,
+)
 
 from app.core.config import get_settings
 
+__all__ = [
+    "SupabaseClientError",
+    "SupabaseClientRegistry",
+    "close_supabase_client",
+    "get_async_supabase_client",
+    "get_supabase_client",
+    "init_supabase_client",
+    "supabase_registry",
+]
+
 
 class SupabaseClientError(Exception):
     """Custom exception for Supabase client errors."""
@@ -10,22 +30,169 @@ class SupabaseClientError(Exception):
     pass
 
 
+class SupabaseClientRegistry:
+    """
+    Owns the process-wide Supabase clients and their pooled HTTP transports.
+    Clients are created lazily on first use (or eagerly on app startup) and
+    reused for every request, so DB calls share keep-alive connections instead
+    of paying client construction and a TCP/TLS handshake each time.
+    The async client backs the repository layer; the sync client is kept for
+    scripts and legacy callers.
+    """
+
+    def __init__(self):
+        self._client: Optional[Client] = None
+        self._http_client: Optional[httpx.Client] = None
+        self._async_client: Optional[AsyncClient] = None
+        self._async_http_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build_http_client(client_cls):
+        settings = get_settings()
+        limits = httpx.Limits(
+            max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.SUPABASE_POOL_KEEPALIVE_EXPIRY,
+        )
+        try:
+            return client_cls(
+                http2=settings.SUPABASE_HTTP2,
+                limits=limits,
+                timeout=settings.SUPABASE_TIMEOUT,
+            )
+        except ImportError:
+            # http2 requires the optional 'h2' package; fall back to HTTP/1.1
+            logger.warning("HTTP/2 unavailable for Supabase transport, using HTTP/1.1")
+            return client_cls(limits=limits, timeout=settings.SUPABASE_TIMEOUT)
+
+    def get_client(self) -> Client:
+        """
+        Return the shared Supabase client, creating it on first use.
+        Raises SupabaseClientError on failure.
+        """
+        if self._client is not None:
+            return self._client
+        with self._lock:
+            if self._client is None:
+                try:
+                    settings = get_settings()
+                    # TODO: Integrate KeyService for secret retrieval when ready
+                    http_client = self._build_http_client(httpx.Client)
+                    options = ClientOptions(
+                        httpx_client=http_client,
+                        postgrest_client_timeout=settings.SUPABASE_TIMEOUT,
+                    )
+                    self._client = create_client(
+                        settings.SUPABASE_URL,
+                        settings.SUPABASE_SERVICE_ROLE_KEY,
+                        options=options,
+                    )
+                    self._http_client = http_client
+                    logger.info("Supabase client pool initialized.")
+                except Exception as e:
+                    logger.error(f"Failed to create Supabase client: {e}")
+                    raise SupabaseClientError("Could not initialize Supabase client")
+        return self._client
+
+    def get_async_client(self) -> AsyncClient:
+        """
+        Return the shared async Supabase client, creating it on first use.
+        Raises SupabaseClientError on failure.
+        """
+        if self._async_client is not None:
+            return self._async_client
+        with self._lock:
+            if self._async_client is None:
+                try:
+                    settings = get_settings()
+                    http_client = self._build_http_client(httpx.AsyncClient)
+                    options = AsyncClientOptions(
+                        httpx_client=http_client,
+                        postgrest_client_timeout=settings.SUPABASE_TIMEOUT,
+                    )
+                    # The service role key is sent as the auth header, so the
+                    # session lookup done by AsyncClient.create() is not needed.
+                    self._async_client = AsyncClient(
+                        settings.SUPABASE_URL,
+                        settings.SUPABASE_SERVICE_ROLE_KEY,
+                        options=options,
+                    )
+                    self._async_http_client = http_client
+                    logger.info("Async Supabase client pool initialized.")
+                except Exception as e:
+                    logger.error(f"Failed to create async Supabase client: {e}")
+                    raise SupabaseClientError("Could not initialize Supabase client")
+        return self._async_client
+
+    async def health_check(self) -> bool:
+        """
+        Probe the PostgREST endpoint over the pooled async transport.
+        Returns True if the service answered, False otherwise.
+        """
+        try:
+            self.get_async_client()
+            settings = get_settings()
+            key = settings.SUPABASE_SERVICE_ROLE_KEY
+            res = await self._async_http_client.get(
+                f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1/",
+                headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            )
+            return res.status_code < 500
+        except Exception as e:
+            logger.warning(f"Supabase health check failed: {e}")
+            return False
+
+    async def close(self) -> None:
+        """Close the pooled transports and drop the shared clients."""
+        with self._lock:
+            http_client, async_http_client = self._http_client, self._async_http_client
+            self._http_client = None
+            self._client = None
+            self._async_http_client = None
+            self._async_client = None
+        try:
+            if http_client is not None:
+                http_client.close()
+            if async_http_client is not None:
+                await async_http_client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing Supabase transport: {e}")
+
+
+# Singleton registry for app-wide usage
+supabase_registry = SupabaseClientRegistry()
+
+
 def get_supabase_client() -> Client:
     """
-    Factory for Supabase client. Prepares for async usage and secret retrieval via KeyService.
+    Return the process-wide pooled Supabase client.
     Raises SupabaseClientError on failure.
     """
-    try:
-        settings = get_settings()
-        url = settings.SUPABASE_URL
-        key = settings.SUPABASE_SERVICE_ROLE_KEY
-        # TODO: Integrate KeyService for secret retrieval when ready
-        client = create_client(url, key)
-        return client
-    except Exception as e:
-        logger.error(f"Failed to create Supabase client: {e}")
-        raise SupabaseClientError("Could not initialize Supabase client")
+    return supabase_registry.get_client()
+
+
+def get_async_supabase_client() -> AsyncClient:
+    """
+    Return the process-wide pooled async Supabase client.
+    Raises SupabaseClientError on failure.
+    """
+    return supabase_registry.get_async_client()
+
+
+async def init_supabase_client() -> None:
+    """Eagerly create the shared clients on app startup and probe health."""
+    supabase_registry.get_client()
+    supabase_registry.get_async_client()
+    if not await supabase_registry.health_check():
+        logger.warning("Supabase did not pass the startup health check.")
+
+
+async def close_supabase_client() -> None:
+    """Release pooled Supabase connections on app shutdown."""
+    await supabase_registry.close()
 
 
 # Do NOT create a global supabase client at import time.
-# Always use get_supabase_client() when you need the client.
+# Application code should query through app.db.repository.Repository, which
+# uses get_async_supabase_client() under the hood.
@@ -0,0 +1,235 @@
+"""Write-behind buffering for high-volume writes.
+
+Rows submitted from many concurrent requests are group-committed by a single
+background worker in one bulk write, so callers do not wait on a round trip
+per row and the database sees far fewer statements at peak. For updates where
+only the latest value per key matters, ``CoalescingBuffer`` collapses repeated
+writes to a key between flushes.
+"""
+
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Optional
+
+from loguru import logger
+
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    """
+    Bounded queue of rows flushed in submission order by one worker task.
+    A batch is flushed after `flush_interval` seconds or once `max_batch_size`
+    rows are pending. Each submit returns a future resolving to the stored row,
+    or failing with the flush error, so callers can surface failures if needed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_fn: Callable[[list[dict]], Awaitable[list[dict]]],
+        max_batch_size: int = 100,
+        flush_interval: float = 0.005,
+        max_queue_size: int = 10000,
+    ):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.submitted = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_error: Optional[str] = None
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            # Start the worker in an empty context so its flushes are not
+            # attributed to whichever request happened to start it.
+            self._task = contextvars.Context().run(loop.create_task, self._run())
+
+    async def submit(self, row: dict) -> asyncio.Future:
+        """
+        Queue a row for the next bulk write.
+        Waits for space when the queue is full (backpressure).
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        # Mark failures as retrieved so fire-and-forget callers don't log noise;
+        # the error is still logged and counted by the buffer itself.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        await self._queue.put((row, future))
+        self.submitted += 1
+        return future
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            deadline = self._loop.time() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stop:
+                return
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        rows = [row for row, _ in batch]
+        self.batches += 1
+        try:
+            stored: Any = await self.flush_fn(rows)
+        except Exception as e:
+            self.failed += len(batch)
+            self.last_error = str(e)
+            logger.error(
+                f"Write-behind flush of {len(batch)} {self.name} rows failed: {e}"
+            )
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.flushed += len(batch)
+        stored = stored or []
+        for idx, (row, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(stored[idx] if idx < len(stored) else row)
+
+    async def close(self) -> None:
+        """Flush everything still queued and stop the worker."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        """Return queue depth and flush counters."""
+        return {
+            "pending": self._queue.qsize() if self._queue else 0,
+            "submitted": self.submitted,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_error": self.last_error,
+        }
+
+
+class CoalescingBuffer:
+    """
+    Latest value per key, written out by one worker every `flush_interval`
+    seconds. Repeated records of a key between flushes collapse into one
+    entry, so each flush is a single bulk write however hot the keys are.
+    Holds at most `max_pending` keys: reaching the bound triggers an early
+    flush, and new keys arriving while the buffer is still full are dropped.
+    Failed flushes are logged and dropped (intended for best-effort data such
+    as usage timestamps). Not thread-safe; use from a single event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_fn: Callable[[dict], Awaitable[Any]],
+        flush_interval: float = 30.0,
+        max_pending: int = 10000,
+    ):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: dict = {}
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_error: Optional[str] = None
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._full = asyncio.Event()
+            self._stopping = False
+            # Empty context, as for WriteBehindBuffer, so flushes are not
+            # attributed to the request that started the worker
+            self._task = contextvars.Context().run(loop.create_task, self._run())
+
+    def record(self, key: Any, value: Any) -> None:
+        """Set the value to write for key, replacing any unflushed value."""
+        self._ensure_started()
+        self.recorded += 1
+        if key not in self._pending and len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending[key] = value
+        if len(self._pending) >= self.max_pending:
+            self._full.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write out everything pending now."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        self.batches += 1
+        try:
+            await self.flush_fn(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            self.last_error = str(e)
+            logger.error(f"Flush of {len(batch)} {self.name} entries failed: {e}")
+            return
+        self.flushed += len(batch)
+
+    async def close(self) -> None:
+        """Flush what is still pending and stop the worker."""
+        if self._task is not None and not self._task.done():
+            self._stopping = True
+            self._full.set()
+            await self._task
+        self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        """Return pending size and flush counters."""
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_error": self.last_error,
+        }
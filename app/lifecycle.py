@@ -0,0 +1,79 @@
+"""
+Process lifecycle shared by the application entrypoints (``app.main`` and the
+root ``main`` served by the Docker image): storage start-up, flushing and
+closing of buffers and pools on shutdown, per-request query instrumentation
+and the /metrics endpoint.
+"""
+
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, FastAPI, Request
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.metrics import collect_metrics
+from app.db.crud.crud_chat import message_write_buffer
+from app.db.instrumentation import report_request, track_queries
+from app.db.postgres import postgres_backend
+from app.db.supabase_client import close_supabase_client, init_supabase_client
+from app.services.gemini_service import gemini_clients
+from app.services.key_service import api_key_usage
+from app.services.provider_clients import provider_clients
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics():
+    return collect_metrics()
+
+
+async def startup() -> None:
+    logger.info("Atlas AgentVerse Backend starting up.")
+    if get_settings().DB_BACKEND == "postgres":
+        await postgres_backend.init()
+    else:
+        await init_supabase_client()
+
+
+async def shutdown() -> None:
+    logger.info("Atlas AgentVerse Backend shutting down.")
+    # Flush buffered writes before closing the connections they need
+    await message_write_buffer.close()
+    await api_key_usage.close()
+    await postgres_backend.close()
+    await close_supabase_client()
+    await provider_clients.close()
+    await gemini_clients.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+
+async def instrument_queries(request: Request, call_next):
+    """Count data-access round trips per request and flag repeated shapes."""
+    settings = get_settings()
+    with track_queries() as log:
+        response = await call_next(request)
+    report_request(
+        log, f"{request.method} {request.url.path}", settings.QUERY_REPEAT_THRESHOLD
+    )
+    if settings.QUERY_DEBUG_HEADERS:
+        response.headers["X-DB-Queries"] = str(log.count)
+        response.headers["Server-Timing"] = (
+            f'db;dur={log.total_ms:.1f};desc="{log.count} queries"'
+        )
+    return response
+
+
+def install(app: FastAPI) -> None:
+    """Add the shared query instrumentation middleware and /metrics route."""
+    app.middleware("http")(instrument_queries)
+    app.include_router(router)
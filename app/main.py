@@ -8,12 +8,12 @@ Atlas AgentVerse Backend Entrypoint
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from loguru import logger
 
 # Import routers (add more as you expand)
 from app.api.endpoints import agents, chat, openai, plugin, realtime, workflow
 from app.core import error_handlers
 from app.core.config import get_settings
+from app.lifecycle import install, lifespan
 
 settings = get_settings()
 
@@ -21,6 +21,7 @@ app = FastAPI(
     title="Atlas AgentVerse Backend",
     version="0.1.0",
     description="API for managing agents, plugins, workflows, chat, and orchestration.",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -32,8 +33,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=chat.CURSOR_HEADERS,
 )
 
+# Query instrumentation and /metrics, shared with the root entrypoint
+install(app)
+
 # Routers (modular, easy to expand)
 app.include_router(plugin.router, prefix="/api/v1/plugins", tags=["plugins"])
 app.include_router(workflow.router, prefix="/api/v1/workflows", tags=["workflows"])
@@ -46,19 +51,6 @@ app.include_router(chat.router, prefix="/api/v1/chat", tags=["chat"])
 error_handlers.register_error_handlers(app)
 
 
-# Startup/shutdown events for logging, DB, etc.
-@app.on_event("startup")
-def startup_event():
-    logger.info("Atlas AgentVerse Backend starting up.")
-    # Initialize DB, external services, etc. here
-
-
-@app.on_event("shutdown")
-def shutdown_event():
-    logger.info("Atlas AgentVerse Backend shutting down.")
-    # Cleanup resources here
-
-
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
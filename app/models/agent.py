@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Any, List, Optional
 
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class AgentBase(BaseModel):
@@ -9,7 +9,8 @@ class AgentBase(BaseModel):
     description: Optional[str] = None
     avatar_url: Optional[str] = None
     color_theme: Optional[str] = None
-    tags: Optional[List[str]] = None
+    # Validated even when omitted so inserts send [] for the NOT NULL column
+    tags: Optional[List[str]] = Field(None, validate_default=True)
     provider: Optional[str] = None
     model: Optional[str] = None
     system_prompt: Optional[str] = None
@@ -43,9 +44,31 @@ class AgentUpdate(AgentBase):
     pass
 
 
+class AgentBulkUpdate(AgentUpdate):
+    id: str
+
+
 class AgentOut(AgentBase):
     id: str
     user_id: str
     created_at: Optional[datetime]
     updated_at: Optional[datetime]
     model_config = ConfigDict(from_attributes=True)
+
+
+class AgentSummary(BaseModel):
+    """Lightweight agent projection for list views (sparse fieldsets)."""
+
+    id: str
+    name: Optional[str] = None
+    description: Optional[str] = None
+    avatar_url: Optional[str] = None
+    color_theme: Optional[str] = None
+    tags: Optional[List[str]] = None
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    status: Optional[str] = None
+    agent_type: Optional[str] = None
+    archived: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,46 @@
+from typing import Any, List, Optional
+
+from pydantic import BaseModel
+
+# Upper bound on items accepted by a single bulk request
+BULK_MAX_ITEMS = 500
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str  # "created", "updated", "archived", "deleted" or "not_found"
+    id: Optional[str] = None
+    data: Optional[dict[str, Any]] = None
+
+
+class BulkResponse(BaseModel):
+    results: List[BulkItemResult]
+    succeeded: int
+    failed: int
+
+    @classmethod
+    def from_created(cls, rows: List[dict]) -> "BulkResponse":
+        """Build results for a multi-row insert; rows come back in input order."""
+        results = [
+            BulkItemResult(index=idx, status="created", id=row.get("id"), data=row)
+            for idx, row in enumerate(rows)
+        ]
+        return cls(results=results, succeeded=len(results), failed=0)
+
+    @classmethod
+    def from_ids(cls, ids: List[str], rows: List[dict], status: str) -> "BulkResponse":
+        """Match affected rows back to the requested ids; missing ids are not_found."""
+        by_id = {row.get("id"): row for row in rows}
+        results = []
+        for idx, item_id in enumerate(ids):
+            row = by_id.get(item_id)
+            results.append(
+                BulkItemResult(
+                    index=idx,
+                    status=status if row else "not_found",
+                    id=item_id,
+                    data=row,
+                )
+            )
+        succeeded = sum(1 for r in results if r.status != "not_found")
+        return cls(results=results, succeeded=succeeded, failed=len(ids) - succeeded)
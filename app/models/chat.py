@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class SessionParticipant(BaseModel):
@@ -12,7 +12,10 @@ class SessionParticipant(BaseModel):
 class ChatSessionBase(BaseModel):
     name: Optional[str] = None
     agent_id: Optional[str] = None
-    participants: Optional[List[SessionParticipant]] = None
+    # Validated even when omitted so inserts send [] for the NOT NULL column
+    participants: Optional[List[SessionParticipant]] = Field(
+        None, validate_default=True
+    )
     archived: Optional[bool] = False
 
     # Extensibility fields
@@ -41,11 +44,24 @@ class ChatSessionOut(ChatSessionBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ChatSessionSummary(BaseModel):
+    """Lightweight chat session projection for list views (sparse fieldsets)."""
+
+    id: str
+    name: Optional[str] = None
+    agent_id: Optional[str] = None
+    archived: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
 class ChatMessageBase(BaseModel):
     content: str
     sender_id: str
     sender_type: str  # "user", "agent", or "system"
     metadata: Optional[Any] = None
+    # Token count per tokenizer encoding, e.g. {"o200k_base": 12}
+    token_counts: Optional[Dict[str, int]] = None
 
 
 class ChatMessageCreate(ChatMessageBase):
@@ -57,3 +73,10 @@ class ChatMessageOut(ChatMessageBase):
     chat_session_id: str
     timestamp: datetime
     model_config = ConfigDict(from_attributes=True)
+
+
+class ChatTurnRequest(BaseModel):
+    """A user message for an agent in a chat session."""
+
+    agent_id: str
+    message: str
@@ -18,9 +18,23 @@ class PluginConfigurationUpdate(PluginConfigurationBase):
     pass
 
 
+class PluginConfigurationBulkUpdate(PluginConfigurationUpdate):
+    id: str
+
+
 class PluginConfigurationOut(PluginConfigurationBase):
     id: str
     user_id: str
     created_at: Optional[datetime]
     updated_at: Optional[datetime]
     model_config = ConfigDict(from_attributes=True)
+
+
+class PluginConfigurationSummary(BaseModel):
+    """Plugin configuration projection for list views; never carries the blob."""
+
+    id: str
+    plugin_type: Optional[str] = None
+    name: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
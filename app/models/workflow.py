@@ -27,6 +27,10 @@ class WorkflowUpdate(BaseModel):
     steps: Optional[List[WorkflowStep]] = None
 
 
+class WorkflowBulkUpdate(WorkflowUpdate):
+    id: str
+
+
 class WorkflowOut(WorkflowBase):
     id: str
     user_id: str
@@ -35,6 +39,16 @@ class WorkflowOut(WorkflowBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class WorkflowSummary(BaseModel):
+    """Lightweight workflow projection for list views; omits the steps array."""
+
+    id: str
+    name: Optional[str] = None
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
 class WorkflowRunRequest(BaseModel):
     inputs: Dict[str, Any]
 
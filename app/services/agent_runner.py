@@ -1,11 +1,42 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass
+from typing import Optional
+
 from agents import Agent, Runner
+from openai.types.responses import ResponseTextDeltaEvent
 from pydantic import BaseModel
 
-from app.db.crud.crud_agent import get_agent_by_id
-from app.db.crud.crud_chat import get_messages, save_message
+from app.core.config import get_settings
+from app.db.crud.crud_agent import agent_cache
+from app.db.crud.crud_chat import get_turn_context, persist_message
+from app.models.a2a import A2ARequest
 from app.models.agent import AgentOut
-from app.services.a2a_service import send_a2a_task
-from app.services.gemini_service import gemini_generate_text
+from app.models.chat import ChatMessageCreate
+from app.services.a2a_service import A2AService
+from app.services.context_builder import (
+    build_context,
+    count_tokens,
+    token_counts_for,
+    token_counts_for_any_model,
+)
+from app.services.gemini_service import gemini_generate_text, gemini_stream_text
+from app.services.litellm_service import (
+    call_litellm_completion,
+    call_litellm_stream,
+    chunk_content,
+)
+from app.services.semantic_cache import (
+    embed_for_cache,
+    semantic_cache,
+    semantic_cache_config,
+)
+
+DEFAULT_MODEL = "gpt-4-turbo"
+
+
+class AgentNotFoundError(Exception):
+    """The agent or the chat session is missing or not owned by the user."""
 
 
 class AgentResponse(BaseModel):
@@ -13,80 +44,280 @@ class AgentResponse(BaseModel):
     agent: AgentOut
 
 
-async def run_agent(
+def _sdk_agent(agent: dict) -> Agent:
+    instructions = agent.get("instructions") or "You are a helpful assistant."
+    return Agent(name=agent.get("name", "Assistant"), instructions=instructions)
+
+
+@dataclass
+class AgentTurn:
+    """An agent turn ready for generation: the agent and its packed context."""
+
+    user_id: str
+    agent_id: str
+    chat_session_id: str
+    user_message: str
+    agent: dict
+    model: str
+    config: dict
+    history: list[dict]
+    messages: list[dict]
+    use_cache: bool
+    embedding: Optional[list[float]] = None
+    # Semantic cache version of the agent when its config was loaded
+    cache_version: int = 0
+    cached_reply: Optional[str] = None
+
+
+def _provider(agent: dict) -> str:
+    return (agent.get("provider") or agent.get("framework") or "").lower()
+
+
+def _litellm_target(turn: AgentTurn) -> tuple[str, Optional[dict]]:
+    """Service and request options of a litellm or openai agent."""
+    agent = turn.agent
+    if _provider(agent) == "openai":
+        return "openai", None
+    service = agent.get("litellm_service") or agent.get("provider") or "openai"
+    return service, agent.get("litellm_options") or {}
+
+
+async def _sdk_reply(turn: AgentTurn) -> str:
+    # Use OpenAI Agents SDK for orchestration
+    # The packed conversation (both sides, newest turns within budget)
+    result = await Runner.run(_sdk_agent(turn.agent), turn.messages)
+    return result.final_output
+
+
+async def _litellm_reply(turn: AgentTurn) -> str:
+    # Use LiteLLM for any supported model/provider
+    service, options = _litellm_target(turn)
+    response = await call_litellm_completion(
+        turn.user_id,
+        service,
+        turn.model,
+        turn.messages,
+        options,
+        cache=turn.use_cache,
+        hedge=turn.config.get("hedge"),
+    )
+    return response["choices"][0]["message"]["content"]
+
+
+async def _gemini_reply(turn: AgentTurn) -> str:
+    return await gemini_generate_text(turn.user_id, turn.user_message, turn.model)
+
+
+async def _a2a_reply(turn: AgentTurn) -> str:
+    params = {
+        "message": turn.user_message,
+        "history": turn.history,
+        "agent_id": turn.agent_id,
+    }
+    request = A2ARequest(
+        to_agent_url=turn.config.get("a2a_url"),
+        method="tasks/send",
+        params=params,
+    )
+    response = await A2AService.send_a2a(request, turn.user_id)
+    result = response.result or {}
+    return result.get("message", "") if isinstance(result, dict) else ""
+
+
+async def _sdk_stream(turn: AgentTurn) -> AsyncIterator[str]:
+    result = Runner.run_streamed(_sdk_agent(turn.agent), turn.messages)
+    try:
+        async for event in result.stream_events():
+            if event.type == "raw_response_event" and isinstance(
+                event.data, ResponseTextDeltaEvent
+            ):
+                yield event.data.delta
+    finally:
+        result.cancel()
+
+
+async def _litellm_stream(turn: AgentTurn) -> AsyncIterator[str]:
+    service, options = _litellm_target(turn)
+    async for chunk in call_litellm_stream(
+        turn.user_id, service, turn.model, turn.messages, options
+    ):
+        text = chunk_content(chunk)
+        if text:
+            yield text
+
+
+async def _gemini_stream(turn: AgentTurn) -> AsyncIterator[str]:
+    async for text in gemini_stream_text(turn.user_id, turn.user_message, turn.model):
+        yield text
+
+
+# Reply generation per agent provider; providers missing from _REPLY_STREAMS
+# (a2a) answer in one piece when streamed
+_REPLY_GENERATORS: dict[str, Callable[[AgentTurn], Awaitable[str]]] = {
+    "openai-agent-sdk": _sdk_reply,
+    "litellm": _litellm_reply,
+    "openai": _litellm_reply,
+    "gemini": _gemini_reply,
+    "a2a": _a2a_reply,
+}
+_REPLY_STREAMS: dict[str, Callable[[AgentTurn], AsyncIterator[str]]] = {
+    "openai-agent-sdk": _sdk_stream,
+    "litellm": _litellm_stream,
+    "openai": _litellm_stream,
+    "gemini": _gemini_stream,
+}
+
+
+async def _generate_reply(turn: AgentTurn) -> str:
+    """Produce the agent's reply with its configured provider."""
+    provider = _provider(turn.agent)
+    generate = _REPLY_GENERATORS.get(provider)
+    if generate is None:
+        raise Exception(f"Unknown agent provider: {provider}")
+    return await generate(turn)
+
+
+async def prepare_turn(
     user_id: str, agent_id: str, chat_session_id: str, user_message: str
-) -> AgentResponse:
-    # Fetch agent config
-    agent = await get_agent_by_id(agent_id, user_id)
+) -> AgentTurn:
+    """
+    Store the user's message and load the agent with the history that fits its
+    token budget; also looks the message up in the agent's semantic cache.
+    """
+    settings = get_settings()
+    # Store the user's token count with the message, for the agent's model
+    # when it is already known (cached agent), otherwise under every encoding
+    # a model can resolve to, so the message is never re-tokenized later
+    known = agent_cache.peek((user_id, agent_id))
+    if known is not None:
+        known_model = known.get("model") or DEFAULT_MODEL
+        token_counts = token_counts_for(known_model, user_message)
+    else:
+        token_counts = token_counts_for_any_model(user_message)
+    # Taken before the agent is loaded, so a reply generated from a config
+    # that is updated meanwhile is not added after the update's invalidation
+    cache_version = semantic_cache.version(agent_id)
+    # Load agent config and recent history, and store the user's message, in
+    # one round trip before the model call
+    context = await get_turn_context(
+        user_id,
+        agent_id,
+        chat_session_id,
+        ChatMessageCreate(
+            content=user_message,
+            sender_id=user_id,
+            sender_type="user",
+            token_counts=token_counts,
+        ),
+        history_limit=settings.AGENT_HISTORY_MAX_MESSAGES,
+    )
+    agent = context.agent
     if not agent:
-        raise Exception("Agent not found or not owned by user")
-    provider = (agent.get("provider") or agent.get("framework") or "").lower()
-    model = agent.get("model") or "gpt-4-turbo"
-    agent.get("plugin_config") or {}
-
-    # Fetch chat history (optional: limit for context window)
-    history = await get_messages(chat_session_id, limit=20, offset=0)
-
-    # Prepare messages/context for LLM
-    if provider == "openai-agent-sdk":
-        # Use OpenAI Agents SDK for orchestration
-        instructions = agent.get("instructions") or "You are a helpful assistant."
-        openai_agent = Agent(
-            name=agent.get("name", "Assistant"), instructions=instructions
-        )
-        # Compose the prompt from user message and history (simple concat for demo)
-        prompt = user_message
-        if history:
-            prompt = (
-                "\n".join([msg["content"] for msg in history if msg["role"] == "user"])
-                + f"\n{user_message}"
+        raise AgentNotFoundError("Agent not found or not owned by user")
+    model = agent.get("model") or DEFAULT_MODEL
+    config = agent.get("config") if isinstance(agent.get("config"), dict) else {}
+
+    # Keep the newest turns that fit the model's budget, leaving room for the
+    # instructions and the reply
+    options = agent.get("litellm_options") or {}
+    reserved = count_tokens(model, agent.get("instructions") or "") + int(
+        options.get("max_tokens")
+        or config.get("max_tokens")
+        or settings.AGENT_CONTEXT_RESERVED_OUTPUT_TOKENS
+    )
+    packed = build_context(
+        model, context.history, user_message, reserved, config.get("context_tokens")
+    )
+    turn = AgentTurn(
+        user_id=user_id,
+        agent_id=agent_id,
+        chat_session_id=chat_session_id,
+        user_message=user_message,
+        agent=agent,
+        model=model,
+        config=config,
+        history=packed.history,
+        messages=packed.messages,
+        # Agents opt in to the exact-match completion cache via config
+        use_cache=bool(config.get("completion_cache")),
+        cache_version=cache_version,
+    )
+
+    # Agents may opt in to answering near-duplicate questions from cache
+    semantic = semantic_cache_config(config)
+    if semantic is not None:
+        turn.embedding = await embed_for_cache(user_id, user_message, semantic)
+        if turn.embedding is not None:
+            cached = await semantic_cache.lookup(
+                agent_id, turn.embedding, semantic.threshold
             )
-        # Run agent using SDK (sync wrapper for demo; production: use async)
-        result = await Runner.run_async(openai_agent, prompt)
-        agent_reply = result.final_output
-    elif provider == "litellm":
-        # Use LiteLLM for any supported model/provider
-        from app.services.litellm_service import call_litellm_completion
-
-        service = agent.get("litellm_service") or agent.get("provider") or "openai"
-        model = agent.get("model") or "gpt-4-turbo"
-        options = agent.get("litellm_options") or {}
-        response = await call_litellm_completion(
-            user_id,
-            service,
-            model,
-            history + [{"role": "user", "content": user_message}],
-            options,
-        )
-        agent_reply = response["choices"][0]["message"]["content"]
-    elif provider == "openai":
-        response = await call_litellm_completion(
-            user_id,
-            provider,
-            model,
-            history + [{"role": "user", "content": user_message}],
-        )
-        agent_reply = response["choices"][0]["message"]["content"]
-    elif provider == "gemini":
-        agent_reply = await gemini_generate_text(user_id, user_message, model)
-    elif provider == "a2a":
-        params = {"message": user_message, "history": history, "agent_id": agent_id}
-        response = await send_a2a_task(
-            user_id, agent.get("config", {}).get("a2a_url"), "tasks/send", params
+            if cached is not None:
+                turn.cached_reply = cached[0]
+    return turn
+
+
+async def _finish_turn(turn: AgentTurn, agent_reply: str, partial: bool = False):
+    """Cache a generated reply and save it as the agent's message."""
+    if turn.embedding is not None and turn.cached_reply is None and not partial:
+        semantic_cache.add(
+            turn.agent_id, turn.embedding, agent_reply, version=turn.cache_version
         )
-        agent_reply = response.get("result", {}).get("message", "")
+    # Save agent's response as a message (write-behind when enabled)
+    await persist_message(
+        turn.chat_session_id,
+        ChatMessageCreate(
+            content=agent_reply,
+            sender_id=turn.agent_id,
+            sender_type="agent",
+            metadata={"partial": True} if partial else None,
+            token_counts=token_counts_for(turn.model, agent_reply),
+        ),
+    )
+
+
+async def run_agent(
+    user_id: str, agent_id: str, chat_session_id: str, user_message: str
+) -> AgentResponse:
+    turn = await prepare_turn(user_id, agent_id, chat_session_id, user_message)
+    if turn.cached_reply is not None:
+        agent_reply = turn.cached_reply
     else:
-        raise Exception(f"Unknown agent provider: {provider}")
+        agent_reply = await _generate_reply(turn)
+    await _finish_turn(turn, agent_reply)
+    return AgentResponse(response=agent_reply, agent=AgentOut(**turn.agent))
 
-    # Save agent's response as a message
-    await save_message(
-        chat_session_id,
-        {
-            "content": agent_reply,
-            "sender_id": agent_id,
-            "sender_type": "agent",
-            "metadata": None,
-        },
-    )
 
-    return AgentResponse(response=agent_reply, agent=AgentOut(**agent))
+async def _stream_reply(turn: AgentTurn) -> AsyncIterator[str]:
+    """Yield the agent's reply text as its provider produces it."""
+    if turn.cached_reply is not None:
+        yield turn.cached_reply
+        return
+    stream = _REPLY_STREAMS.get(_provider(turn.agent))
+    if stream is None:
+        yield await _generate_reply(turn)
+        return
+    async for text in stream(turn):
+        yield text
+
+
+async def stream_agent_reply(turn: AgentTurn) -> AsyncIterator[str]:
+    """
+    Streaming variant of run_agent for a prepared turn: yields the reply's
+    text as it arrives and saves the message once, when the stream ends. If it
+    ends early (client disconnect, provider error) the text produced so far is
+    saved with metadata {"partial": true}.
+    """
+    parts: list[str] = []
+    complete = False
+    try:
+        async for text in _stream_reply(turn):
+            parts.append(text)
+            yield text
+        complete = True
+    finally:
+        agent_reply = "".join(parts)
+        if complete or agent_reply:
+            # Shielded so the save survives the cancellation of a dropped stream
+            await asyncio.shield(
+                _finish_turn(turn, agent_reply, partial=not complete)
+            )
@@ -0,0 +1,220 @@
+"""Exact-match cache for chat completion responses.
+
+Responses are keyed by a canonical hash of the user, service, model, messages
+and the options that affect generation, and stored as JSON in an in-memory LRU tier
+bounded by bytes, optionally backed by an on-disk tier that survives restarts.
+Caching is opt-in per call (see ``call_litellm_completion``). Entries are never
+shared between users: each completion was paid for with the caller's own
+provider key and may answer a conversation only that user should see.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Protocol
+
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+
+# Options that do not change the generated text and so stay out of the key
+NON_SEMANTIC_OPTIONS = frozenset(
+    {
+        "api_key",
+        "cache",
+        "metadata",
+        "num_retries",
+        "request_timeout",
+        "timeout",
+        "user",
+    }
+)
+
+
+def completion_cache_key(
+    user_id: str,
+    service: str,
+    model: str,
+    messages: list,
+    options: Optional[dict] = None,
+) -> str:
+    """Return a stable hash of the user and everything that determines a completion."""
+    relevant = {
+        k: v for k, v in (options or {}).items() if k not in NON_SEMANTIC_OPTIONS
+    }
+    payload = json.dumps(
+        [user_id, service.lower(), model, messages, relevant],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def is_cacheable(options: Optional[dict] = None) -> bool:
+    """Streams and multi-choice requests are never cached."""
+    options = options or {}
+    return not options.get("stream") and options.get("n", 1) == 1
+
+
+class CacheTier(Protocol):
+    """Storage backend for serialized completions."""
+
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+
+class MemoryTier:
+    """LRU of serialized entries bounded by total bytes, with per-entry TTL."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        if len(value) > self.max_bytes:
+            return
+        if key in self._data:
+            self._drop(key)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self.bytes += len(value)
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        _, value = self._data.pop(key)
+        self.bytes -= len(value)
+
+
+class DiskTier:
+    """One file per entry under `directory`; expiry is checked on read."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        if entry["expires_at"] <= time.time():
+            path.unlink(missing_ok=True)
+            return None
+        return entry["value"].encode()
+
+    def _write(self, key: str, value: bytes, ttl: float) -> None:
+        entry = {"expires_at": time.time() + ttl, "value": value.decode()}
+        tmp = self._path(key).with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entry))
+        tmp.replace(self._path(key))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await asyncio.to_thread(self._write, key, value, ttl)
+
+
+class CompletionCache:
+    """
+    Two-tier completion cache. Lookups try memory then disk (promoting disk
+    hits into memory); stores write through to every tier. Tier errors are
+    logged and treated as misses so the cache never fails a completion.
+    """
+
+    def __init__(self, memory: MemoryTier, disk: Optional[CacheTier] = None):
+        self.memory = memory
+        self.disk = disk
+        self.ttl = get_settings().COMPLETION_CACHE_TTL_SECONDS
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Return the cached response for key, or None."""
+        value = await self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                value = await self.disk.get(key)
+            except Exception as e:
+                logger.warning(f"Completion cache disk read failed: {e}")
+            if value is not None:
+                self.disk_hits += 1
+                await self.memory.set(key, value, self.ttl)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, key: str, response: dict, ttl: Optional[float] = None) -> None:
+        """Store a JSON-serializable response under key."""
+        ttl = self.ttl if ttl is None else ttl
+        value = json.dumps(response, default=str).encode()
+        await self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            try:
+                await self.disk.set(key, value, ttl)
+            except Exception as e:
+                logger.warning(f"Completion cache disk write failed: {e}")
+        self.stores += 1
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and memory tier occupancy."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+            "bytes": self.memory.bytes,
+            "max_bytes": self.memory.max_bytes,
+            "evictions": self.memory.evictions,
+        }
+
+
+def _build_completion_cache() -> CompletionCache:
+    settings = get_settings()
+    disk = None
+    if settings.COMPLETION_CACHE_DIR:
+        disk = DiskTier(settings.COMPLETION_CACHE_DIR)
+    return CompletionCache(MemoryTier(settings.COMPLETION_CACHE_MAX_BYTES), disk)
+
+
+# Singleton cache for app-wide usage
+completion_cache = _build_completion_cache()
+register_metrics("completion_cache", completion_cache.stats)
@@ -0,0 +1,165 @@
+"""Token-aware packing of chat history into a model's context window.
+
+Messages are counted with the model's tokenizer (one cached tiktoken encoding
+per model) and the newest turns are kept until the turn's token budget is
+spent: the model's input window minus the tokens reserved for instructions and
+the reply, capped by a per-agent limit. Counts are stored with each message
+(``chat_messages.token_counts``, keyed by encoding) when it is written, so
+history is not re-tokenized on every turn; rows without a stored count are
+counted once and remembered in process.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import litellm
+import tiktoken
+
+# Importing litellm's default encoding points tiktoken at the tokenizer files
+# bundled with litellm, so no encoding is downloaded at runtime
+from litellm.litellm_core_utils.default_encoding import encoding as default_encoding
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+
+# Chat-format framing per message (role, separators) and for the reply primer
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+_ROLES = {"agent": "assistant", "system": "system"}
+
+
+def history_to_messages(history: list[dict]) -> list[dict]:
+    """Map stored chat messages to chat-completion messages."""
+    return [
+        {"role": _ROLES.get(msg.get("sender_type"), "user"), "content": msg["content"]}
+        for msg in history
+    ]
+
+
+@lru_cache(maxsize=256)
+def tokenizer_for(model: str) -> tiktoken.Encoding:
+    """Return the tiktoken encoding for a model (cl100k_base if unknown)."""
+    try:
+        return tiktoken.encoding_for_model(model.rsplit("/", 1)[-1])
+    except KeyError:
+        return default_encoding
+
+
+@lru_cache(maxsize=256)
+def context_window(model: str) -> int:
+    """Return the model's input token limit, or the configured default."""
+    try:
+        info = litellm.get_model_info(model)
+        window = info.get("max_input_tokens") or info.get("max_tokens")
+    except Exception:
+        window = None
+    return window or get_settings().AGENT_CONTEXT_DEFAULT_WINDOW
+
+
+def count_tokens(model: str, text: str) -> int:
+    """Count the tokens of text with the model's tokenizer."""
+    return len(tokenizer_for(model).encode(text or "", disallowed_special=()))
+
+
+def count_message_tokens(model: str, messages: list[dict]) -> int:
+    """Count the tokens of chat messages, including per-message framing."""
+    total = 0
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            # Multimodal content: count the text parts
+            content = " ".join(
+                part.get("text", "") for part in content if isinstance(part, dict)
+            )
+        total += count_tokens(model, str(content)) + MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+def token_counts_for(model: str, text: str) -> dict[str, int]:
+    """Return the token_counts to store with a new message for this model."""
+    return {tokenizer_for(model).name: count_tokens(model, text)}
+
+
+# Encodings tokenizer_for resolves models to: o200k_base for current OpenAI
+# models, cl100k_base for older ones and as the fallback for all others
+STORED_ENCODINGS = ("o200k_base", default_encoding.name)
+
+
+def token_counts_for_any_model(text: str) -> dict[str, int]:
+    """Return token_counts under every STORED_ENCODINGS, for an unknown model."""
+    return {
+        name: len(tiktoken.get_encoding(name).encode(text or "", disallowed_special=()))
+        for name in STORED_ENCODINGS
+    }
+
+
+# Counts of stored messages that had none for the encoding, by message id
+_counted = TTLCache(
+    maxsize=get_settings().AGENT_CONTEXT_TOKEN_CACHE_SIZE,
+    ttl=get_settings().AGENT_CONTEXT_TOKEN_CACHE_TTL_SECONDS,
+)
+register_metrics("context_token_counts", _counted.stats)
+
+
+def message_tokens(model: str, message: dict) -> int:
+    """Token count of a stored message: stored, remembered or counted now."""
+    encoding = tokenizer_for(model).name
+    stored = message.get("token_counts")
+    if isinstance(stored, dict) and encoding in stored:
+        return int(stored[encoding])
+    key = (encoding, message.get("id"))
+    if key[1] is not None:
+        cached = _counted.get(key)
+        if cached is not None:
+            return cached
+    count = count_tokens(model, message.get("content", ""))
+    if key[1] is not None:
+        _counted.set(key, count)
+    return count
+
+
+@dataclass
+class PackedContext:
+    messages: list[dict]
+    history: list[dict]
+    tokens: int
+    budget: int
+    dropped: int
+
+
+def build_context(
+    model: str,
+    history: list[dict],
+    user_message: str,
+    reserved_tokens: int = 0,
+    max_tokens: Optional[int] = None,
+) -> PackedContext:
+    """
+    Pack the newest history that fits the model's budget, followed by the new
+    user message. `history` is oldest first; `reserved_tokens` covers what the
+    caller adds outside the messages (instructions, the reply). `max_tokens`
+    caps the budget below the model's window (default AGENT_CONTEXT_MAX_TOKENS).
+    History is cut at the first message that does not fit, so kept turns stay
+    contiguous.
+    """
+    settings = get_settings()
+    cap = max_tokens or settings.AGENT_CONTEXT_MAX_TOKENS
+    budget = min(context_window(model) - reserved_tokens, cap)
+    used = (
+        REPLY_PRIMING_TOKENS
+        + count_tokens(model, user_message)
+        + MESSAGE_OVERHEAD_TOKENS
+    )
+    kept: list[dict] = []
+    for message in reversed(history):
+        cost = message_tokens(model, message) + MESSAGE_OVERHEAD_TOKENS
+        if used + cost > budget:
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    messages = history_to_messages(kept) + [{"role": "user", "content": user_message}]
+    return PackedContext(messages, kept, used, budget, len(history) - len(kept))
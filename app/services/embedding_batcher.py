@@ -0,0 +1,283 @@
+"""Micro-batching and caching for embedding requests.
+
+Concurrent ``embed`` calls for the same user, service, model and options are
+collected for a short window, identical strings are sent once, and the unique
+texts go to the provider in batches of at most ``max_batch_size``. Vectors are
+cached by (service, model, options, text hash) so repeated strings skip the
+provider entirely. Batches are never shared between users, since each call is
+billed to the caller's own provider key.
+
+Each cached text also keeps its share of the provider-reported prompt tokens
+and the model name the provider answered with, so responses keep the
+provider's shape, with usage summed over the request's own texts.
+"""
+
+import asyncio
+import hashlib
+import json
+from collections.abc import Hashable
+from typing import NamedTuple, Optional
+
+from loguru import logger
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+from app.services.context_builder import count_tokens
+from app.services.litellm_service import call_litellm_embedding
+from app.services.rate_limiter import prompt_tokens
+
+
+class EmbeddedText(NamedTuple):
+    vector: list[float]
+    # This text's share of the provider batch's prompt tokens
+    tokens: int
+    # Model name as reported by the provider
+    model: str
+
+
+def _apportion(total: int, weights: list[int]) -> list[int]:
+    """Split total in proportion to weights; the remainder goes to the last."""
+    weight_sum = sum(weights)
+    if not weight_sum:
+        shares = [0] * len(weights)
+    else:
+        shares = [total * weight // weight_sum for weight in weights]
+    if shares:
+        shares[-1] += total - sum(shares)
+    return shares
+
+
+def _response_model(response, default: str) -> str:
+    model = getattr(response, "model", None)
+    if model is None and isinstance(response, dict):
+        model = response.get("model")
+    return model or default
+
+
+class _PendingBatch:
+    def __init__(self):
+        # text -> futures of every caller waiting on that text
+        self.waiters: dict[str, list[asyncio.Future]] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces embedding requests into provider-sized batches.
+    Not thread-safe; intended for use from a single event loop.
+    """
+
+    def __init__(
+        self,
+        window: float = 0.005,
+        max_batch_size: int = 256,
+        cache_size: int = 50000,
+        cache_ttl: float = 86400.0,
+    ):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._pending: dict[Hashable, _PendingBatch] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.requested = 0
+        self.deduplicated = 0
+        self.provider_calls = 0
+        self.provider_texts = 0
+
+    @staticmethod
+    def _options_key(options: Optional[dict]) -> str:
+        return json.dumps(options or {}, sort_keys=True, default=str)
+
+    @staticmethod
+    def _cache_key(service: str, model: str, options_key: str, text: str) -> tuple:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return (service.lower(), model, options_key, digest)
+
+    async def embed(
+        self,
+        user_id: str,
+        service: str,
+        model: str,
+        texts: list[str],
+        options: Optional[dict] = None,
+    ) -> list[list[float]]:
+        """Return one vector per input text, in input order."""
+        embedded = await self.embed_texts(user_id, service, model, texts, options)
+        return [item.vector for item in embedded]
+
+    async def embed_texts(
+        self,
+        user_id: str,
+        service: str,
+        model: str,
+        texts: list[str],
+        options: Optional[dict] = None,
+    ) -> list[EmbeddedText]:
+        """Return one EmbeddedText per input text, in input order."""
+        options_key = self._options_key(options)
+        self.requested += len(texts)
+        vectors: list[Optional[EmbeddedText]] = [None] * len(texts)
+        waiting: dict[str, asyncio.Future] = {}
+        group_key = (user_id, service.lower(), model, options_key)
+        for idx, text in enumerate(texts):
+            cached = self.cache.get(self._cache_key(service, model, options_key, text))
+            if cached is not None:
+                vectors[idx] = cached
+            elif text not in waiting:
+                waiting[text] = self._enqueue(
+                    group_key, text, user_id, service, model, options
+                )
+            else:
+                self.deduplicated += 1
+        if waiting:
+            results = await asyncio.gather(*waiting.values())
+            resolved = dict(zip(waiting, results, strict=True))
+            for idx, text in enumerate(texts):
+                if vectors[idx] is None:
+                    vectors[idx] = resolved[text]
+        return vectors
+
+    def _enqueue(
+        self,
+        group_key: Hashable,
+        text: str,
+        user_id: str,
+        service: str,
+        model: str,
+        options: Optional[dict],
+    ) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.get(group_key)
+        if batch is None:
+            batch = self._pending[group_key] = _PendingBatch()
+            batch.timer = loop.call_later(
+                self.window,
+                self._flush,
+                group_key,
+                user_id,
+                service,
+                model,
+                options,
+            )
+        if text in batch.waiters:
+            self.deduplicated += 1
+        batch.waiters.setdefault(text, []).append(future)
+        if len(batch.waiters) >= self.max_batch_size:
+            batch.timer.cancel()
+            self._flush(group_key, user_id, service, model, options)
+        return future
+
+    def _flush(
+        self,
+        group_key: Hashable,
+        user_id: str,
+        service: str,
+        model: str,
+        options: Optional[dict],
+    ) -> None:
+        batch = self._pending.pop(group_key, None)
+        if batch is None:
+            return
+        texts = list(batch.waiters)
+        for start in range(0, len(texts), self.max_batch_size):
+            chunk = texts[start : start + self.max_batch_size]
+            task = asyncio.ensure_future(
+                self._run_chunk(batch, chunk, user_id, service, model, options)
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_chunk(
+        self,
+        batch: _PendingBatch,
+        chunk: list[str],
+        user_id: str,
+        service: str,
+        model: str,
+        options: Optional[dict],
+    ) -> None:
+        self.provider_calls += 1
+        self.provider_texts += len(chunk)
+        try:
+            response = await call_litellm_embedding(
+                user_id, service, model, chunk, options
+            )
+            data = sorted(
+                enumerate(response["data"]),
+                key=lambda pair: pair[1].get("index", pair[0]),
+            )
+            vectors = [item["embedding"] for _, item in data]
+            if len(vectors) != len(chunk):
+                raise ValueError(
+                    f"Got {len(vectors)} embeddings for {len(chunk)} inputs"
+                )
+            counts = [count_tokens(model, text) for text in chunk]
+            total = prompt_tokens(response)
+            tokens = counts if total is None else _apportion(total, counts)
+            reported_model = _response_model(response, model)
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(chunk)} texts failed: {e}")
+            for text in chunk:
+                for future in batch.waiters[text]:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        options_key = self._options_key(options)
+        for text, vector, count in zip(chunk, vectors, tokens, strict=True):
+            embedded = EmbeddedText(vector, count, reported_model)
+            self.cache.set(self._cache_key(service, model, options_key, text), embedded)
+            for future in batch.waiters[text]:
+                if not future.done():
+                    future.set_result(embedded)
+
+    def stats(self) -> dict:
+        """Return batching counters and embedding cache occupancy."""
+        return {
+            "requested": self.requested,
+            "deduplicated": self.deduplicated,
+            "provider_calls": self.provider_calls,
+            "provider_texts": self.provider_texts,
+            "cache": self.cache.stats(),
+        }
+
+
+# Singleton batcher for app-wide usage
+embedding_batcher = EmbeddingBatcher(
+    window=get_settings().EMBEDDING_BATCH_WINDOW_MS / 1000,
+    max_batch_size=get_settings().EMBEDDING_BATCH_MAX_SIZE,
+    cache_size=get_settings().EMBEDDING_CACHE_MAX_SIZE,
+    cache_ttl=get_settings().EMBEDDING_CACHE_TTL_SECONDS,
+)
+register_metrics("embedding_batcher", embedding_batcher.stats)
+
+
+async def embed_texts(
+    user_id: str,
+    service: str,
+    model: str,
+    texts: list[str],
+    options: Optional[dict] = None,
+) -> dict:
+    """
+    Embed texts through the shared batcher.
+    Returns an OpenAI-style embedding list response with the provider's model
+    name and the prompt tokens of these texts as usage. Inputs that are not
+    all strings (e.g. token arrays) go straight to the provider.
+    """
+    if not all(isinstance(text, str) for text in texts):
+        return await call_litellm_embedding(user_id, service, model, texts, options)
+    embedded = await embedding_batcher.embed_texts(
+        user_id, service, model, texts, options
+    )
+    tokens = sum(item.tokens for item in embedded)
+    return {
+        "object": "list",
+        "model": embedded[0].model if embedded else model,
+        "data": [
+            {"object": "embedding", "index": idx, "embedding": item.vector}
+            for idx, item in enumerate(embedded)
+        ],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
@@ -1,15 +1,109 @@
-import google.generativeai as genai
+"""Gemini text generation with per-key clients.
 
+``genai.configure`` sets one process-wide API key, so concurrent requests for
+different users could send each other's keys. Instead each API key gets its own
+async gRPC client from a bounded pool, and requests are sent through it
+directly; ``GenerativeModel`` handles have no per-model credentials.
+"""
+
+from typing import Optional
+
+import google.ai.generativelanguage as glm
+from google.generativeai.types import content_types, generation_types, safety_types
+
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+from app.services.context_builder import count_tokens
 from app.services.key_service import get_api_key
+from app.services.provider_clients import ProviderClientPool
+from app.services.rate_limiter import rate_limiter
 
+gemini_clients = ProviderClientPool(
+    max_size=get_settings().GEMINI_CLIENT_POOL_SIZE,
+    factories={
+        "gemini": lambda api_key: glm.GenerativeServiceAsyncClient(
+            client_options={"api_key": api_key}
+        )
+    },
+)
+register_metrics("gemini_clients", gemini_clients.stats)
 
-async def gemini_generate_text(
-    user_id: str, prompt: str, model: str = "gemini-pro", options: dict = None
-):
+
+def gemini_request(
+    model: str, prompt: str, options: Optional[dict] = None
+) -> glm.GenerateContentRequest:
+    """
+    Build the request for a prompt; `options` may hold "generation_config" and
+    "safety_settings" as accepted by ``GenerativeModel.generate_content``.
+    """
+    options = options or {}
+    return glm.GenerateContentRequest(
+        model=model if model.startswith("models/") else f"models/{model}",
+        contents=content_types.to_contents(prompt),
+        generation_config=generation_types.to_generation_config_dict(
+            options.get("generation_config")
+        ),
+        safety_settings=safety_types.normalize_safety_settings(
+            options.get("safety_settings")
+        ),
+    )
+
+
+def _text(response) -> str:
+    # Concatenated text parts of the first candidate; empty for chunks that
+    # only carry a finish reason or usage
+    if not response.candidates:
+        return ""
+    return "".join(part.text for part in response.candidates[0].content.parts)
+
+
+async def _gemini_key(user_id: str) -> str:
     api_key = await get_api_key(user_id, "gemini")
     if not api_key:
         raise Exception("No Gemini API key found for user.")
-    genai.configure(api_key=api_key)
-    model_obj = genai.GenerativeModel(model)
-    response = await model_obj.generate_content_async(prompt, **(options or {}))
-    return response.text if hasattr(response, "text") else response
+    return api_key
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) if usage else None
+
+
+def _generated_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "candidates_token_count", None) if usage else None
+
+
+async def gemini_generate_text(
+    user_id: str, prompt: str, model: str = "gemini-pro", options: dict = None
+):
+    api_key = await _gemini_key(user_id)
+    client = gemini_clients.get("gemini", api_key)
+    request = gemini_request(model, prompt, options)
+    response = await rate_limiter.run(
+        "gemini",
+        model,
+        api_key,
+        lambda: client.generate_content(request),
+        estimate=lambda: count_tokens(model, prompt),
+        used_tokens=_usage_tokens,
+        work=_generated_tokens,
+    )
+    return _text(response)
+
+
+async def gemini_stream_text(
+    user_id: str, prompt: str, model: str = "gemini-pro", options: dict = None
+):
+    """Yield the generated text as Gemini streams it."""
+    api_key = await _gemini_key(user_id)
+    client = gemini_clients.get("gemini", api_key)
+    request = gemini_request(model, prompt, options)
+    async with rate_limiter.hold(
+        "gemini", model, api_key, estimate=lambda: count_tokens(model, prompt)
+    ):
+        response = await client.stream_generate_content(request)
+        async for chunk in response:
+            text = _text(chunk)
+            if text:
+                yield text
@@ -0,0 +1,146 @@
+"""Hedged requests to cut the latency tail of LLM calls.
+
+A hedged call starts the primary request and, if it has not finished after a
+delay derived from a latency percentile of recent calls to the same model,
+starts a backup request (same or alternate provider). Whichever succeeds first
+wins and the other is cancelled. Backups are capped to a fraction of the calls
+that allowed hedging, so the extra provider cost stays bounded.
+"""
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, Optional
+
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+
+
+def _label(key: Hashable) -> str:
+    return "/".join(map(str, key)) if isinstance(key, tuple) else str(key)
+
+
+class Hedger:
+    """
+    Per-key latency windows plus the hedge budget.
+    Not thread-safe; intended for use from a single event loop.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        default_delay: float = 2.0,
+        min_delay: float = 0.1,
+        min_samples: int = 20,
+        window_size: int = 500,
+        budget_ratio: float = 0.05,
+    ):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window_size = window_size
+        self.budget_ratio = budget_ratio
+        self._latencies: dict[Hashable, deque[float]] = {}
+        self.calls = 0
+        self.eligible = 0
+        self.hedged = 0
+        self.backup_wins = 0
+        self.over_budget = 0
+
+    def observe(self, key: Hashable, seconds: float) -> None:
+        """Add a completed call's latency to the key's window."""
+        window = self._latencies.get(key)
+        if window is None:
+            window = self._latencies[key] = deque(maxlen=self.window_size)
+        window.append(seconds)
+
+    def delay_for(self, key: Hashable) -> float:
+        """Seconds to wait before hedging: the key's latency percentile."""
+        window = self._latencies.get(key)
+        if window is None or len(window) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(window)
+        rank = round(self.percentile / 100 * (len(ordered) - 1))
+        return max(self.min_delay, ordered[rank])
+
+    def _within_budget(self) -> bool:
+        return self.hedged < self.budget_ratio * self.eligible
+
+    async def run(
+        self,
+        key: Hashable,
+        primary: Callable[[], Awaitable[Any]],
+        backup: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        """
+        Await primary(), starting backup() if it is still running after the
+        hedge delay and the budget allows. Returns the first successful result
+        and cancels the other call; raises the primary's error if both fail.
+        Without a backup the call is only timed.
+        """
+        self.calls += 1
+        self.eligible += int(backup is not None)
+        delay = self.delay_for(key)
+        started = time.monotonic()
+        primary_task = asyncio.ensure_future(primary())
+        backup_task = None
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if done or backup is None or not self._within_budget():
+                if not done and backup is not None:
+                    self.over_budget += 1
+                result = await primary_task
+                self.observe(key, time.monotonic() - started)
+                return result
+
+            self.hedged += 1
+            backup_started = time.monotonic()
+            backup_task = asyncio.ensure_future(backup())
+            pending = {primary_task, backup_task}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        continue
+                    if task is backup_task:
+                        self.backup_wins += 1
+                        self.observe(key, time.monotonic() - backup_started)
+                    else:
+                        self.observe(key, time.monotonic() - started)
+                    return task.result()
+            raise primary_task.exception()
+        finally:
+            for task in (primary_task, backup_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        """Return hedge counters and the current delay per key."""
+        return {
+            "calls": self.calls,
+            "eligible": self.eligible,
+            "hedged": self.hedged,
+            "backup_wins": self.backup_wins,
+            "over_budget": self.over_budget,
+            "hedge_rate": self.hedged / self.eligible if self.eligible else 0.0,
+            "delays_ms": {
+                _label(key): round(self.delay_for(key) * 1000, 1)
+                for key in self._latencies
+            },
+        }
+
+
+# Singleton hedger for app-wide usage
+hedger = Hedger(
+    percentile=get_settings().HEDGE_PERCENTILE,
+    default_delay=get_settings().HEDGE_DEFAULT_DELAY_MS / 1000,
+    min_delay=get_settings().HEDGE_MIN_DELAY_MS / 1000,
+    min_samples=get_settings().HEDGE_MIN_SAMPLES,
+    window_size=get_settings().HEDGE_WINDOW_SIZE,
+    budget_ratio=get_settings().HEDGE_BUDGET_RATIO,
+)
+register_metrics("hedging", hedger.stats)
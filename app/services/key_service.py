@@ -1,10 +1,113 @@
-from datetime import datetime
+import base64
+import os
+from datetime import datetime, timezone
 from typing import Optional
 
-from app.db.supabase_client import get_supabase_client
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from loguru import logger
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+from app.db.repository import Repository
+from app.db.write_behind import CoalescingBuffer
 
 KEYS_TABLE = "user_api_keys"
 
+key_repo = Repository(KEYS_TABLE)
+
+_STORED_PREFIX = "v1:"
+_NONCE_BYTES = 12
+# Cached marker for "this user has no key for this service"
+_NO_KEY = object()
+
+
+class KeyServiceError(Exception):
+    """Raised when an API key cannot be encrypted or decrypted."""
+
+    pass
+
+
+def _associated_data(user_id: str, service: str) -> bytes:
+    # Binds a ciphertext to its row so it cannot be replayed for another
+    # user or service
+    return f"{user_id}\x1f{service}".encode()
+
+
+def _seal(cipher: AESGCM, plaintext: str, aad: bytes) -> bytes:
+    nonce = os.urandom(_NONCE_BYTES)
+    return nonce + cipher.encrypt(nonce, plaintext.encode(), aad)
+
+
+def _open(cipher: AESGCM, sealed: bytes, aad: bytes) -> str:
+    nonce, ciphertext = sealed[:_NONCE_BYTES], sealed[_NONCE_BYTES:]
+    return cipher.decrypt(nonce, ciphertext, aad).decode()
+
+
+def _storage_cipher() -> AESGCM:
+    secret = get_settings().API_KEY_ENCRYPTION_KEY
+    if not secret:
+        raise KeyServiceError("API_KEY_ENCRYPTION_KEY is not configured")
+    try:
+        return AESGCM(base64.urlsafe_b64decode(secret))
+    except ValueError as e:
+        raise KeyServiceError(f"Invalid API_KEY_ENCRYPTION_KEY: {e}") from e
+
+
+def encrypt_api_key(key: str, user_id: str, service: str) -> str:
+    """Encrypt an API key for storage in user_api_keys.encrypted_key."""
+    sealed = _seal(_storage_cipher(), key, _associated_data(user_id, service))
+    return _STORED_PREFIX + base64.urlsafe_b64encode(sealed).decode()
+
+
+def decrypt_api_key(stored: str, user_id: str, service: str) -> str:
+    """Decrypt a stored API key. Raises KeyServiceError if it is not valid."""
+    if not stored.startswith(_STORED_PREFIX):
+        raise KeyServiceError("Unknown API key encoding")
+    try:
+        sealed = base64.urlsafe_b64decode(stored[len(_STORED_PREFIX) :])
+        return _open(_storage_cipher(), sealed, _associated_data(user_id, service))
+    except (InvalidTag, ValueError) as e:
+        raise KeyServiceError("Stored API key could not be decrypted") from e
+
+
+# Resolved keys, keyed by (user_id, service). Values are re-encrypted under a
+# key that only lives in this process, so plaintext keys are not kept in the
+# cache; a hit costs one AES-GCM open instead of a query plus decryption.
+_cache_cipher = AESGCM(AESGCM.generate_key(bit_length=256))
+api_key_cache = TTLCache(
+    maxsize=get_settings().API_KEY_CACHE_MAX_SIZE,
+    ttl=get_settings().API_KEY_CACHE_TTL_SECONDS,
+)
+register_metrics("api_key_cache", api_key_cache.stats)
+
+
+def invalidate_api_key(user_id: str, service: str) -> None:
+    """Drop the cached key of a user and service."""
+    api_key_cache.invalidate((user_id, service))
+
+
+async def touch_api_keys(usage: dict[tuple[str, str], datetime]) -> None:
+    """Set last_used_at of many (user_id, service) keys in one statement."""
+    keys = [
+        {"user_id": user_id, "service": service, "used_at": used_at.isoformat()}
+        for (user_id, service), used_at in usage.items()
+    ]
+    query = key_repo.rpc("touch_api_keys", {"p_keys": keys})
+    await key_repo.execute(query, "rpc")
+
+
+# Key resolutions record their time here; the latest per key is written out
+# with one bulk update per flush interval instead of a write per LLM call
+api_key_usage = CoalescingBuffer(
+    f"{KEYS_TABLE}.last_used_at",
+    touch_api_keys,
+    flush_interval=get_settings().API_KEY_USAGE_FLUSH_INTERVAL_SECONDS,
+    max_pending=get_settings().API_KEY_USAGE_MAX_PENDING,
+)
+register_metrics("api_key_usage", api_key_usage.stats)
+
 
 class KeyService:
     """
@@ -26,48 +129,76 @@ class KeyService:
 
 
 async def store_api_key(user_id: str, service: str, key: str) -> None:
-    """Store an API key for a user and service in Supabase."""
+    """Encrypt and store (or replace) a user's API key for a service."""
     data = {
         "user_id": user_id,
         "service": service,
+        "encrypted_key": encrypt_api_key(key, user_id, service),
         "created_at": datetime.utcnow().isoformat(),
     }
-    supabase = get_supabase_client()
-    res = (
-        supabase.table(KEYS_TABLE)
-        .upsert(data, on_conflict=["user_id", "service"])
-        .execute()
-    )
-    if res.error:
-        raise Exception(res.error)
+    query = key_repo.query().upsert(data, on_conflict="user_id,service")
+    await key_repo.execute(query, "upsert")
+    invalidate_api_key(user_id, service)
 
 
 async def get_api_key(user_id: str, service: str) -> Optional[str]:
-    """Stub: Always returns None."""
-    return None
+    """
+    Return the user's decrypted API key for a service, or None if there is
+    none (or it cannot be decrypted). Resolved keys and misses are cached for
+    API_KEY_CACHE_TTL_SECONDS; concurrent misses share one query. Each
+    resolution is recorded for the batched last_used_at update.
+    """
+    aad = _associated_data(user_id, service)
+    cache_key = (user_id, service)
+    cached = api_key_cache.get(cache_key)
+    if cached is _NO_KEY:
+        return None
+    if cached is not None:
+        api_key_usage.record((user_id, service), datetime.now(timezone.utc))
+        return _open(_cache_cipher, cached, aad)
+    # Keys stored or deleted while this read is in flight invalidate it
+    version = api_key_cache.version(cache_key)
+    query = (
+        key_repo.query()
+        .select("encrypted_key")
+        .eq("user_id", user_id)
+        .eq("service", service)
+        .limit(1)
+    )
+    res = await key_repo.execute_shared(("key", user_id, service, version), query)
+    rows = res.data or []
+    if not rows or not rows[0].get("encrypted_key"):
+        api_key_cache.set(cache_key, _NO_KEY, version=version)
+        return None
+    try:
+        key = decrypt_api_key(rows[0]["encrypted_key"], user_id, service)
+    except KeyServiceError as e:
+        logger.error(f"Could not decrypt {service} API key of user {user_id}: {e}")
+        return None
+    api_key_cache.set(cache_key, _seal(_cache_cipher, key, aad), version=version)
+    api_key_usage.record((user_id, service), datetime.now(timezone.utc))
+    return key
 
 
 async def list_api_keys(user_id: str) -> list[dict]:
     """List all API keys for a user from Supabase."""
-    supabase = get_supabase_client()
-    res = (
-        supabase.table(KEYS_TABLE)
+    query = (
+        key_repo.query()
         .select("id,service,created_at,last_used_at")
         .eq("user_id", user_id)
-        .execute()
     )
+    res = await key_repo.execute(query, "select")
     return res.data or []
 
 
 async def delete_api_key(user_id: str, key_id: str) -> None:
-    """Delete an API key for a user from Supabase."""
-    supabase = get_supabase_client()
-    res = (
-        supabase.table(KEYS_TABLE)
+    """Delete an API key for a user and drop it from the key cache."""
+    query = (
+        key_repo.query()
         .delete()
         .eq("user_id", user_id)
         .eq("id", key_id)
-        .execute()
     )
-    if res.error:
-        raise Exception(res.error)
+    res = await key_repo.execute(query, "delete")
+    for row in res.data or []:
+        invalidate_api_key(user_id, row["service"])
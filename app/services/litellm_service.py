@@ -1,63 +1,170 @@
+import inspect
+from typing import Union
+
 import litellm
+from loguru import logger
 
+from app.core.config import get_settings
+from app.services.completion_cache import (
+    completion_cache,
+    completion_cache_key,
+    is_cacheable,
+)
+from app.services.context_builder import count_message_tokens, count_tokens
+from app.services.hedging import hedger
 from app.services.key_service import get_api_key
+from app.services.provider_clients import provider_clients
+from app.services.rate_limiter import rate_limiter, usage_tokens
 
 
-async def call_litellm_completion(
-    user_id: str, service: str, model: str, messages: list, options: dict = None
-):
+async def _credentials(user_id: str, service: str) -> dict:
+    """Per-call LiteLLM credentials for the user's key on this service."""
     api_key = await get_api_key(user_id, service)
     if not api_key:
         raise Exception(f"No API key found for service: {service}")
-    # Set the API key for the provider dynamically
-    # For OpenAI: litellm.openai_api_key, for others: see LiteLLM docs
-    if service.lower() == "openai":
-        litellm.openai_api_key = api_key
-        # Optionally handle OpenAI Assistants API or v2 here in the future
-    elif service.lower() == "azure":
-        litellm.azure_api_key = api_key
-    elif service.lower() == "anthropic":
-        litellm.anthropic_api_key = api_key
-    # Add more providers as needed
-
-    completion = await litellm.acompletion(
-        model=model, messages=messages, **(options or {})
+    return provider_clients.credentials(service, api_key)
+
+
+def _completion_estimate(model: str, messages: list, options: dict):
+    """Tokens to reserve for a completion: the prompt plus the reply limit."""
+    return lambda: count_message_tokens(model, messages) + int(
+        options.get("max_tokens")
+        or options.get("max_completion_tokens")
+        or get_settings().RATE_LIMIT_DEFAULT_COMPLETION_TOKENS
+    )
+
+
+def _limited_completion(service: str, model: str, messages: list, options: dict):
+    """A rate-limited LiteLLM completion call, as a zero-argument callable."""
+    return lambda: rate_limiter.run(
+        service,
+        model,
+        options["api_key"],
+        lambda: litellm.acompletion(model=model, messages=messages, **options),
+        estimate=_completion_estimate(model, messages, options),
     )
+
+
+async def _hedge_backup(
+    user_id: str,
+    service: str,
+    model: str,
+    messages: list,
+    options: dict,
+    credentials: dict,
+    hedge: Union[bool, dict],
+):
+    """
+    Build the backup call for a hedged completion: the same request, or the
+    same messages on the alternate "service"/"model" of a hedge dict.
+    `options` are the request's options without credentials and
+    `credentials` the primary's; an alternate service gets its own key and
+    client instead. Returns None (no hedging) when the alternate service has
+    no API key.
+    """
+    backup_service, backup_model = service, model
+    if isinstance(hedge, dict):
+        backup_service = hedge.get("service") or service
+        backup_model = hedge.get("model") or model
+    if backup_service.lower() != service.lower():
+        api_key = await get_api_key(user_id, backup_service)
+        if not api_key:
+            logger.warning(f"No API key for hedge service {backup_service}")
+            return None
+        credentials = provider_clients.credentials(backup_service, api_key)
+    return _limited_completion(
+        backup_service, backup_model, messages, {**options, **credentials}
+    )
+
+
+async def call_litellm_completion(
+    user_id: str,
+    service: str,
+    model: str,
+    messages: list,
+    options: dict = None,
+    cache: bool = False,
+    cache_bypass: bool = False,
+    hedge: Union[bool, dict, None] = None,
+):
+    """
+    Run a chat completion through LiteLLM.
+    With `cache` (per agent) or `options["cache"]` (per request: True, or a
+    dict with optional "ttl" and "bypass"), identical requests are answered
+    from the exact-match completion cache. `cache_bypass` skips the lookup but
+    still stores the fresh response.
+    With `hedge` (per agent) or `options["hedge"]` (per request: True, or a
+    dict with an alternate "service" and/or "model"), a backup request is sent
+    when the call runs past the model's recent latency percentile, and the
+    first response wins.
+    """
+    options = dict(options or {})
+    hedge = options.pop("hedge", None) or hedge
+    cache_options = options.pop("cache", None)
+    if isinstance(cache_options, dict):
+        cache_bypass = cache_bypass or bool(cache_options.get("bypass"))
+        ttl = cache_options.get("ttl")
+    else:
+        ttl = None
+    use_cache = (cache or bool(cache_options)) and is_cacheable(options)
+
+    credentials = await _credentials(user_id, service)
+
+    cache_key = None
+    if use_cache:
+        cache_key = completion_cache_key(user_id, service, model, messages, options)
+        if cache_bypass:
+            completion_cache.bypassed += 1
+        else:
+            cached = await completion_cache.get(cache_key)
+            if cached is not None:
+                return litellm.ModelResponse(**cached)
+
+    call_options = {**options, **credentials}
+    backup = None
+    if hedge and not options.get("stream"):
+        backup = await _hedge_backup(
+            user_id, service, model, messages, options, credentials, hedge
+        )
+    completion = await hedger.run(
+        (service.lower(), model),
+        _limited_completion(service, model, messages, call_options),
+        backup,
+    )
+    if cache_key is not None:
+        await completion_cache.set(cache_key, completion.model_dump(), ttl=ttl)
     return completion
 
 
 async def call_litellm_embedding(
     user_id: str, service: str, model: str, input: list, options: dict = None
 ):
-    api_key = await get_api_key(user_id, service)
-    if not api_key:
-        raise Exception(f"No API key found for service: {service}")
-    if service.lower() == "openai":
-        litellm.openai_api_key = api_key
-    elif service.lower() == "azure":
-        litellm.azure_api_key = api_key
-    elif service.lower() == "anthropic":
-        litellm.anthropic_api_key = api_key
-    # Add more providers as needed
-    embedding = await litellm.aembedding(model=model, input=input, **(options or {}))
+    credentials = await _credentials(user_id, service)
+    embedding = await rate_limiter.run(
+        service,
+        model,
+        credentials["api_key"],
+        lambda: litellm.aembedding(
+            model=model, input=input, **{**(options or {}), **credentials}
+        ),
+        estimate=lambda: sum(count_tokens(model, str(text)) for text in input),
+        # Embedding time tracks the input size
+        work=usage_tokens,
+    )
     return embedding
 
 
 async def call_litellm_image_generation(
     user_id: str, service: str, model: str, prompt: str, options: dict = None
 ):
-    api_key = await get_api_key(user_id, service)
-    if not api_key:
-        raise Exception(f"No API key found for service: {service}")
-    if service.lower() == "openai":
-        litellm.openai_api_key = api_key
-    elif service.lower() == "azure":
-        litellm.azure_api_key = api_key
-    elif service.lower() == "anthropic":
-        litellm.anthropic_api_key = api_key
-    # Add more providers as needed
-    image = await litellm.aimage_generation(
-        model=model, prompt=prompt, **(options or {})
+    credentials = await _credentials(user_id, service)
+    image = await rate_limiter.run(
+        service,
+        model,
+        credentials["api_key"],
+        lambda: litellm.aimage_generation(
+            model=model, prompt=prompt, **{**(options or {}), **credentials}
+        ),
     )
     return image
 
@@ -65,20 +172,49 @@ async def call_litellm_image_generation(
 async def call_litellm_stream(
     user_id: str, service: str, model: str, messages: list, options: dict = None
 ):
-    api_key = await get_api_key(user_id, service)
-    if not api_key:
-        raise Exception(f"No API key found for service: {service}")
+    credentials = await _credentials(user_id, service)
+    options = {**(options or {}), **credentials}
     if service.lower() == "openai":
-        litellm.openai_api_key = api_key
-    elif service.lower() == "azure":
-        litellm.azure_api_key = api_key
-    elif service.lower() == "anthropic":
-        litellm.anthropic_api_key = api_key
-    # Add more providers as needed
-    async for chunk in litellm.acompletion(
-        model=model, messages=messages, stream=True, **(options or {})
+        # Ask for a final usage chunk so the stream can report token counts
+        options.setdefault("stream_options", {"include_usage": True})
+    async with rate_limiter.hold(
+        service,
+        model,
+        credentials["api_key"],
+        estimate=_completion_estimate(model, messages, options),
     ):
-        yield chunk
+        stream = await litellm.acompletion(
+            model=model, messages=messages, stream=True, **options
+        )
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await _close_stream(stream)
+
+
+def chunk_content(chunk) -> str:
+    """Text delta of a streamed completion chunk ("" if it carries none)."""
+    if not isinstance(chunk, dict):
+        chunk = chunk.model_dump() if hasattr(chunk, "model_dump") else dict(chunk)
+    choices = chunk.get("choices") or []
+    if not choices:
+        return ""
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+async def _close_stream(stream) -> None:
+    """Close a LiteLLM stream and the provider stream it wraps."""
+    for target in (stream, getattr(stream, "completion_stream", None)):
+        close = getattr(target, "aclose", None) or getattr(target, "close", None)
+        if close is None:
+            continue
+        try:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.warning(f"Error closing upstream stream: {e}")
 
 
 # Model listing for demo (could be static or from config)
@@ -90,19 +226,3 @@ def list_litellm_models():
         {"provider": "ollama", "models": ["llama2", "mistral"]},
     ]
 
-
-# Router/failover: wrapper for router logic
-def litellm_router(
-    user_id: str, router_config: dict, messages: list, options: dict = None
-):
-    # router_config example: {"providers": ["openai", "anthropic"], "fallback": True}
-    # This is a simple demo; real logic could use litellm's router/fallback features
-    for provider in router_config.get("providers", []):
-        try:
-            # Could use call_litellm_completion with provider
-            # For demo, call synchronously (should be async in real usage)
-            # This is a placeholder for actual router logic
-            return provider  # Replace with actual call
-        except Exception:
-            continue
-    raise Exception("All providers failed")
@@ -2,8 +2,11 @@ from typing import Optional
 
 from loguru import logger
 
-from app.db.supabase_client import SupabaseClientError, get_supabase_client
+from app.db.repository import Repository, select_columns
+from app.db.supabase_client import SupabaseClientError
+from app.models.bulk import BulkResponse
 from app.models.plugin import (
+    PluginConfigurationBulkUpdate,
     PluginConfigurationCreate,
     PluginConfigurationUpdate,
 )
@@ -11,6 +14,8 @@ from app.services.key_service import KeyService
 
 PLUGIN_TABLE = "plugin_configurations"
 
+plugin_repo = Repository(PLUGIN_TABLE)
+
 
 class PluginServiceError(Exception):
     """Custom exception for PluginService errors."""
@@ -34,8 +39,8 @@ class PluginService:
             data = config.dict()
             data["user_id"] = user_id
             data["encrypted_config_blob"] = encrypted_blob
-            supabase = get_supabase_client()
-            res = supabase.table(PLUGIN_TABLE).insert(data).execute()
+            query = plugin_repo.query().insert(data)
+            res = await plugin_repo.execute(query, "insert")
             if res.data:
                 return res.data[0]
             logger.error(f"Supabase insert error: {res.error}")
@@ -51,16 +56,15 @@ class PluginService:
         Returns None if not found. Raises PluginServiceError on failure.
         """
         try:
-            supabase = get_supabase_client()
-            res = (
-                supabase.table(PLUGIN_TABLE)
+            query = (
+                plugin_repo.query()
                 .select("*")
                 .eq("id", config_id)
                 .eq("user_id", user_id)
                 .single()
-                .execute()
             )
-            return res.data if res.data else None
+            res = await plugin_repo.execute_shared(("id", user_id, config_id), query)
+            return dict(res.data) if res.data else None
         except Exception as e:
             logger.error(f"Error fetching plugin config: {e}")
             raise PluginServiceError("Failed to fetch plugin configuration")
@@ -79,14 +83,13 @@ class PluginService:
             )
             data = config.dict()
             data["encrypted_config_blob"] = encrypted_blob
-            supabase = get_supabase_client()
-            res = (
-                supabase.table(PLUGIN_TABLE)
+            query = (
+                plugin_repo.query()
                 .update(data)
                 .eq("id", config_id)
                 .eq("user_id", user_id)
-                .execute()
             )
+            res = await plugin_repo.execute(query, "update")
             return res.data[0] if res.data else None
         except Exception as e:
             logger.error(f"Error updating plugin config: {e}")
@@ -99,49 +102,137 @@ class PluginService:
         Raises PluginServiceError on failure.
         """
         try:
-            supabase = get_supabase_client()
-            res = (
-                supabase.table(PLUGIN_TABLE)
+            query = (
+                plugin_repo.query()
                 .delete()
                 .eq("id", config_id)
                 .eq("user_id", user_id)
-                .execute()
             )
+            res = await plugin_repo.execute(query, "delete")
             return bool(res.data)
         except Exception as e:
             logger.error(f"Error deleting plugin config: {e}")
             raise PluginServiceError("Failed to delete plugin configuration")
 
     @staticmethod
-    async def list_plugin_configs(user_id: str) -> list[dict]:
+    async def get_plugin_configs(config_ids: list[str], user_id: str) -> dict:
         """
-        List all plugin configurations for a user.
+        Retrieve several plugin configurations of a user in one query.
+        Returns a dict keyed by id; ids not found are omitted.
         Raises PluginServiceError on failure.
         """
+        ids = list(dict.fromkeys(config_ids))
+        if not ids:
+            return {}
         try:
-            supabase = get_supabase_client()
-            res = (
-                supabase.table(PLUGIN_TABLE)
+            query = (
+                plugin_repo.query()
                 .select("*")
                 .eq("user_id", user_id)
-                .execute()
+                .in_("id", ids)
+            )
+            res = await plugin_repo.execute(query, "select")
+            return {row["id"]: row for row in res.data or []}
+        except Exception as e:
+            logger.error(f"Error fetching plugin configs: {e}")
+            raise PluginServiceError("Failed to fetch plugin configurations")
+
+    @staticmethod
+    async def list_plugin_configs(
+        user_id: str, columns: Optional[list[str]] = None
+    ) -> list[dict]:
+        """
+        List all plugin configurations for a user.
+        `columns` restricts the selected columns (default: all).
+        Raises PluginServiceError on failure.
+        """
+        try:
+            query = (
+                plugin_repo.query()
+                .select(select_columns(columns))
+                .eq("user_id", user_id)
             )
+            res = await plugin_repo.execute(query, "select")
             return res.data or []
         except Exception as e:
             logger.error(f"Error listing plugin configs: {e}")
             raise PluginServiceError("Failed to list plugin configurations")
 
     @staticmethod
-    async def execute(config_id: str, inputs: dict) -> dict:
+    async def create_plugin_configs_bulk(
+        user_id: str, configs: list[PluginConfigurationCreate]
+    ) -> BulkResponse:
+        """
+        Create many plugin configurations for a user with one multi-row insert.
+        Raises PluginServiceError on failure.
+        """
+        try:
+            rows = []
+            for config in configs:
+                data = config.dict()
+                data["user_id"] = user_id
+                data["encrypted_config_blob"] = KeyService.encrypt_config(
+                    config.encrypted_config_blob, user_id
+                )
+                rows.append(data)
+            created = await plugin_repo.insert_many(rows)
+            return BulkResponse.from_created(created)
+        except Exception as e:
+            logger.error(f"Error bulk creating plugin configs: {e}")
+            raise PluginServiceError("Failed to create plugin configurations")
+
+    @staticmethod
+    async def update_plugin_configs_bulk(
+        user_id: str, configs: list[PluginConfigurationBulkUpdate]
+    ) -> BulkResponse:
+        """
+        Update many plugin configurations owned by a user (one concurrent update per row).
+        Raises PluginServiceError on failure.
+        """
+        try:
+            updates = {}
+            for config in configs:
+                data = config.dict(exclude={"id"})
+                data["encrypted_config_blob"] = KeyService.encrypt_config(
+                    config.encrypted_config_blob, user_id
+                )
+                updates[config.id] = data
+            updated = await plugin_repo.update_many(user_id, updates)
+            return BulkResponse.from_ids([c.id for c in configs], updated, "updated")
+        except Exception as e:
+            logger.error(f"Error bulk updating plugin configs: {e}")
+            raise PluginServiceError("Failed to update plugin configurations")
+
+    @staticmethod
+    async def delete_plugin_configs_bulk(
+        user_id: str, config_ids: list[str]
+    ) -> BulkResponse:
+        """
+        Delete many plugin configurations owned by a user in one statement.
+        Raises PluginServiceError on failure.
+        """
+        try:
+            deleted = await plugin_repo.delete_many(user_id, config_ids)
+            return BulkResponse.from_ids(config_ids, deleted, "deleted")
+        except Exception as e:
+            logger.error(f"Error bulk deleting plugin configs: {e}")
+            raise PluginServiceError("Failed to delete plugin configurations")
+
+    @staticmethod
+    async def execute(
+        config_id: str, inputs: dict, config: Optional[dict] = None
+    ) -> dict:
         """
         Execute a plugin using its configuration. Decrypts config and runs logic.
+        Pass `config` when the row was already loaded to skip the lookup.
         Raises PluginServiceError on failure.
         """
         try:
             # Fetch config, decrypt, and execute plugin logic
-            config = await PluginService.get_plugin_config(
-                config_id, inputs.get("user_id")
-            )
+            if config is None:
+                config = await PluginService.get_plugin_config(
+                    config_id, inputs.get("user_id")
+                )
             if not config:
                 logger.error(f"Plugin configuration not found: {config_id}")
                 raise PluginServiceError("Plugin configuration not found")
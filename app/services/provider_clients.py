@@ -0,0 +1,125 @@
+"""Per-call provider credentials backed by a pool of reusable SDK clients.
+
+LiteLLM calls get the caller's API key as an argument instead of through the
+module-level ``litellm.*_api_key`` globals, so concurrent requests for users
+with different keys cannot pick up each other's credentials. For providers
+whose SDK client LiteLLM accepts (OpenAI), one client per (service, key) is
+kept in a bounded LRU and reused across requests, keeping its connections
+warm. Other providers get the key only and use LiteLLM's shared transport.
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Optional
+
+import openai
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+
+_CLIENT_FACTORIES = {
+    "openai": lambda api_key: openai.AsyncOpenAI(api_key=api_key),
+}
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Stable, non-reversible identifier of an API key."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class ProviderClientPool:
+    """
+    LRU of provider SDK clients keyed by service and API key fingerprint.
+    Evicted clients are closed after `close_delay` seconds so requests still
+    using them can finish. Not thread-safe; intended for use from a single
+    event loop.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        close_delay: float = 600.0,
+        factories: Optional[dict[str, Callable[[str], Any]]] = None,
+    ):
+        self.max_size = max_size
+        self.close_delay = close_delay
+        self.factories = _CLIENT_FACTORIES if factories is None else factories
+        self._clients: OrderedDict[tuple[str, str], Any] = OrderedDict()
+        self._closing: set[asyncio.Task] = set()
+        self.hits = 0
+        self.created = 0
+        self.evictions = 0
+
+    def get(self, service: str, api_key: str) -> Optional[Any]:
+        """Return the pooled client for service and key, or None if unsupported."""
+        factory = self.factories.get(service.lower())
+        if factory is None:
+            return None
+        key = (service.lower(), key_fingerprint(api_key))
+        client = self._clients.get(key)
+        if client is not None:
+            self._clients.move_to_end(key)
+            self.hits += 1
+            return client
+        client = self._clients[key] = factory(api_key)
+        self.created += 1
+        while len(self._clients) > self.max_size:
+            _, evicted = self._clients.popitem(last=False)
+            self.evictions += 1
+            self._retire(evicted)
+        return client
+
+    def credentials(self, service: str, api_key: str) -> dict:
+        """LiteLLM keyword arguments authenticating one call as this key."""
+        kwargs: dict[str, Any] = {"api_key": api_key}
+        client = self.get(service, api_key)
+        if client is not None:
+            kwargs["client"] = client
+        return kwargs
+
+    def _retire(self, client: Any) -> None:
+        async def close_later():
+            await asyncio.sleep(self.close_delay)
+            await self._close(client)
+
+        task = asyncio.ensure_future(close_later())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(client: Any) -> None:
+        try:
+            # gRPC clients (Gemini) are closed through their transport
+            close = getattr(client, "close", None) or client.transport.close
+            await close()
+        except Exception as e:
+            logger.warning(f"Error closing provider client: {e}")
+
+    async def close(self) -> None:
+        """Close every pooled client (on application shutdown)."""
+        for task in list(self._closing):
+            task.cancel()
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await self._close(client)
+
+    def stats(self) -> dict:
+        """Return pool occupancy and reuse counters."""
+        return {
+            "clients": len(self._clients),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "created": self.created,
+            "evictions": self.evictions,
+        }
+
+
+# Singleton pool for app-wide usage
+provider_clients = ProviderClientPool(
+    max_size=get_settings().PROVIDER_CLIENT_POOL_SIZE
+)
+register_metrics("provider_clients", provider_clients.stats)
@@ -0,0 +1,256 @@
+"""Latency-aware routing of chat completions across LLM providers.
+
+Each (service, model) pair keeps an exponentially weighted moving average of
+its latency and error rate, and is put in a cooldown after a 429. A routed call
+tries the fastest healthy provider first and fails over to the next one on
+error until the call's deadline runs out; unhealthy providers are only tried
+as a last resort. Statistics are process-wide and exposed on /metrics.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+from app.services.litellm_service import call_litellm_completion
+
+
+class ProviderRouterError(Exception):
+    """Raised when no provider could serve a routed call."""
+
+    def __init__(self, message: str, attempts: Optional[list[dict]] = None):
+        super().__init__(message)
+        self.attempts = attempts or []
+
+
+@dataclass
+class ProviderSpec:
+    service: str
+    model: str
+    options: dict = field(default_factory=dict)
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return (self.service.lower(), self.model)
+
+
+@dataclass
+class ProviderStats:
+    latency_ms: Optional[float] = None
+    error_rate: float = 0.0
+    calls: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    cooldown_until: float = 0.0
+
+
+@dataclass
+class RoutedCompletion:
+    response: Any
+    service: str
+    model: str
+    latency_ms: float
+    attempts: list[dict]
+
+
+def parse_providers(router_config: dict) -> list[ProviderSpec]:
+    """
+    Read the provider list of a router config. Entries are dicts with
+    "service", "model" and optional "options", or bare service names that use
+    the config's top-level "model".
+    """
+    specs = []
+    for item in router_config.get("providers") or []:
+        entry = item
+        if isinstance(item, str):
+            entry = {"service": item, "model": router_config.get("model")}
+        if not isinstance(entry, dict) or not entry.get("service"):
+            raise ValueError(f"Invalid provider entry: {entry!r}")
+        if not entry.get("model"):
+            raise ValueError(f"No model given for provider '{entry['service']}'")
+        specs.append(
+            ProviderSpec(entry["service"], entry["model"], entry.get("options") or {})
+        )
+    if not specs:
+        raise ValueError("router_config.providers must list at least one provider")
+    return specs
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+class ProviderRouter:
+    """
+    Orders providers by observed health and latency and fails over between
+    them. Not thread-safe; intended for use from a single event loop.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        max_error_rate: float = 0.5,
+        rate_limit_cooldown: float = 30.0,
+        deadline: float = 60.0,
+    ):
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.rate_limit_cooldown = rate_limit_cooldown
+        self.deadline = deadline
+        self._stats: dict[tuple[str, str], ProviderStats] = {}
+        self.routed = 0
+        self.failovers = 0
+        self.exhausted = 0
+
+    def stats_for(self, spec: ProviderSpec) -> ProviderStats:
+        return self._stats.setdefault(spec.key, ProviderStats())
+
+    def is_healthy(self, spec: ProviderSpec, now: Optional[float] = None) -> bool:
+        stats = self.stats_for(spec)
+        now = time.monotonic() if now is None else now
+        return stats.cooldown_until <= now and stats.error_rate <= self.max_error_rate
+
+    def rank(self, providers: list[ProviderSpec]) -> list[ProviderSpec]:
+        """
+        Healthy providers by EWMA latency (never-tried ones first so they get a
+        sample), then unhealthy ones by how soon they recover. Ties keep the
+        configured order.
+        """
+        now = time.monotonic()
+
+        def order(spec: ProviderSpec) -> tuple:
+            stats = self.stats_for(spec)
+            if self.is_healthy(spec, now):
+                return (0, stats.latency_ms or 0.0)
+            return (1, stats.cooldown_until, stats.error_rate)
+
+        return sorted(providers, key=order)
+
+    def record_success(self, spec: ProviderSpec, latency_ms: float) -> None:
+        stats = self.stats_for(spec)
+        stats.calls += 1
+        if stats.latency_ms is None:
+            stats.latency_ms = latency_ms
+        else:
+            stats.latency_ms += self.alpha * (latency_ms - stats.latency_ms)
+        stats.error_rate *= 1 - self.alpha
+
+    def record_failure(
+        self, spec: ProviderSpec, error: BaseException, latency_ms: float
+    ) -> None:
+        """
+        Count a provider-side failure: timeouts, 429s and 5xx responses.
+        Request errors (4xx) and local errors such as a missing API key fail
+        over without marking the provider unhealthy for everyone else.
+        """
+        status = _status_code(error)
+        timed_out = isinstance(error, asyncio.TimeoutError)
+        if not timed_out and status != 429 and (status or 0) < 500:
+            return
+        stats = self.stats_for(spec)
+        stats.calls += 1
+        stats.errors += 1
+        stats.error_rate += self.alpha * (1.0 - stats.error_rate)
+        if timed_out and stats.latency_ms is not None:
+            stats.latency_ms = max(stats.latency_ms, latency_ms)
+        if status == 429:
+            stats.rate_limited += 1
+            stats.cooldown_until = time.monotonic() + self.rate_limit_cooldown
+
+    async def complete(
+        self,
+        user_id: str,
+        providers: list[ProviderSpec],
+        messages: list,
+        options: Optional[dict] = None,
+        deadline: Optional[float] = None,
+    ) -> RoutedCompletion:
+        """
+        Run a chat completion on the best provider, failing over on errors
+        until `deadline` seconds have passed. Raises ProviderRouterError with
+        every attempt when no provider succeeds in time.
+        """
+        self.routed += 1
+        deadline = self.deadline if deadline is None else deadline
+        give_up_at = time.monotonic() + deadline
+        attempts: list[dict] = []
+        for spec in self.rank(providers):
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                break
+            if attempts:
+                self.failovers += 1
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    call_litellm_completion(
+                        user_id,
+                        spec.service,
+                        spec.model,
+                        messages,
+                        {**(options or {}), **spec.options},
+                    ),
+                    timeout=remaining,
+                )
+            except Exception as e:
+                elapsed_ms = (time.monotonic() - started) * 1000
+                self.record_failure(spec, e, elapsed_ms)
+                if isinstance(e, asyncio.TimeoutError):
+                    error = "deadline exceeded"
+                else:
+                    error = str(e)
+                attempts.append(
+                    {"service": spec.service, "model": spec.model, "error": error}
+                )
+                logger.warning(
+                    f"Provider {spec.service}/{spec.model} failed after "
+                    f"{elapsed_ms:.0f}ms: {error}"
+                )
+                continue
+            elapsed_ms = (time.monotonic() - started) * 1000
+            self.record_success(spec, elapsed_ms)
+            attempts.append({"service": spec.service, "model": spec.model})
+            return RoutedCompletion(
+                response, spec.service, spec.model, elapsed_ms, attempts
+            )
+        self.exhausted += 1
+        raise ProviderRouterError(
+            f"All providers failed within {deadline}s", attempts
+        )
+
+    def stats(self) -> dict:
+        """Return routing counters and per-provider health."""
+        now = time.monotonic()
+        return {
+            "routed": self.routed,
+            "failovers": self.failovers,
+            "exhausted": self.exhausted,
+            "providers": {
+                f"{service}/{model}": {
+                    "latency_ms": (
+                        round(s.latency_ms, 3) if s.latency_ms is not None else None
+                    ),
+                    "error_rate": round(s.error_rate, 4),
+                    "calls": s.calls,
+                    "errors": s.errors,
+                    "rate_limited": s.rate_limited,
+                    "cooldown_s": round(max(0.0, s.cooldown_until - now), 3),
+                }
+                for (service, model), s in self._stats.items()
+            },
+        }
+
+
+# Singleton router for app-wide usage
+provider_router = ProviderRouter(
+    alpha=get_settings().ROUTER_EWMA_ALPHA,
+    max_error_rate=get_settings().ROUTER_MAX_ERROR_RATE,
+    rate_limit_cooldown=get_settings().ROUTER_RATE_LIMIT_COOLDOWN_SECONDS,
+    deadline=get_settings().ROUTER_DEADLINE_SECONDS,
+)
+register_metrics("provider_router", provider_router.stats)
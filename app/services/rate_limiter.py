@@ -0,0 +1,488 @@
+"""Per-provider rate limiting and adaptive concurrency for LLM calls.
+
+Every provider call is admitted through the limiter for its (service, model,
+API key). A limiter enforces optional requests-per-minute and tokens-per-minute
+token buckets and a concurrency limit that adapts AIMD-style: it grows by about
+one slot per limit's worth of successful calls made while saturated (and
+recovers towards its initial value while it is not), and is halved on a 429 or
+when, with every slot busy, a call's latency per generated token is far above
+the recent average. Latency is normalised by output tokens because completion
+time mostly tracks reply length; calls without a token count, such as streams,
+are not latency samples. Calls that cannot
+start yet wait in a FIFO queue until their deadline; a full queue or an expired
+deadline raises RateLimiterError instead of sending the request, so bursts are
+smoothed locally rather than turned into 429 storms and retries.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+from app.services.provider_clients import key_fingerprint
+
+
+class RateLimiterError(Exception):
+    """Raised when a call is not admitted before its queue deadline."""
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether a provider error is a 429 (LiteLLM status_code, Google code)."""
+    for attr in ("status_code", "code"):
+        if getattr(error, attr, None) == 429:
+            return True
+    return False
+
+
+def _usage_field(result: Any, field: str) -> Optional[int]:
+    usage = getattr(result, "usage", None)
+    if usage is None and isinstance(result, dict):
+        usage = result.get("usage")
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get(field)
+    return getattr(usage, field, None)
+
+
+def usage_tokens(result: Any) -> Optional[int]:
+    """Total tokens reported in a LiteLLM response's usage, if any."""
+    return _usage_field(result, "total_tokens")
+
+
+def prompt_tokens(result: Any) -> Optional[int]:
+    """Input tokens reported in a LiteLLM response's usage, if any."""
+    return _usage_field(result, "prompt_tokens")
+
+
+def completion_tokens(result: Any) -> Optional[int]:
+    """Generated tokens reported in a LiteLLM response's usage, if any."""
+    return _usage_field(result, "completion_tokens")
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, holding at most a minute's worth."""
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.level = self.available(now)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` can be taken (0.0 if now). Amounts above the
+        capacity only need a full bucket and leave it in debt.
+        """
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def available(self, now: float) -> float:
+        return min(self.capacity, self.level + (now - self.updated) * self.rate)
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= amount
+
+    def adjust(self, amount: float) -> None:
+        """Charge (positive) or refund (negative) the difference to an estimate."""
+        self.level = min(self.capacity, self.level - amount)
+
+
+@dataclass
+class Lease:
+    tokens: int
+    started: float
+
+
+class ProviderLimiter:
+    """
+    Token buckets, adaptive concurrency and the wait queue for one
+    (service, model, key). Not thread-safe; intended for use from a single
+    event loop.
+    """
+
+    def __init__(
+        self,
+        rpm: float = 0.0,
+        tpm: float = 0.0,
+        initial_concurrency: int = 32,
+        min_concurrency: int = 1,
+        max_concurrency: int = 256,
+        latency_tolerance: float = 2.0,
+        max_queue: int = 1000,
+        alpha: float = 0.2,
+        decrease_factor: float = 0.5,
+        min_samples: int = 10,
+        min_work: int = 32,
+    ):
+        now = time.monotonic()
+        self.requests = TokenBucket(rpm, now) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, now) if tpm > 0 else None
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(max_concurrency, min_concurrency)
+        self.initial_concurrency = float(
+            min(max(initial_concurrency, min_concurrency), self.max_concurrency)
+        )
+        self.limit = self.initial_concurrency
+        self.latency_tolerance = latency_tolerance
+        self.max_queue = max_queue
+        self.alpha = alpha
+        self.decrease_factor = decrease_factor
+        self.min_samples = min_samples
+        # Short replies are dominated by fixed overhead (time to first token),
+        # so their per-token latency says nothing about overload
+        self.min_work = min_work
+        # EWMA of seconds per unit of work (generated token)
+        self.latency: Optional[float] = None
+        self.samples = 0
+        self.in_flight = 0
+        self._queue: deque[object] = deque()
+        self._changed = asyncio.Event()
+        self._last_decrease = 0.0
+        self.admitted = 0
+        self.throttled = 0
+        self.decreases = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.wait_seconds = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _admit_delay(self, tokens: int, now: float) -> Optional[float]:
+        """
+        0.0 if a call can start now, else the seconds until the buckets allow
+        it, or None while every concurrency slot is taken.
+        """
+        if self.in_flight >= int(self.limit):
+            return None
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.delay(1, now))
+        if self.tokens is not None and tokens:
+            delay = max(delay, self.tokens.delay(tokens, now))
+        return delay
+
+    async def acquire(self, tokens: int, timeout: float) -> Lease:
+        """
+        Wait in line until the call fits the concurrency limit and budgets.
+        Raises RateLimiterError if the queue is full or `timeout` passes.
+        """
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise RateLimiterError("Rate limit queue is full")
+        enqueued = time.monotonic()
+        give_up_at = enqueued + timeout
+        waiter = object()
+        self._queue.append(waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        try:
+            while True:
+                now = time.monotonic()
+                delay = None
+                if self._queue[0] is waiter:
+                    delay = self._admit_delay(tokens, now)
+                    if delay == 0.0:
+                        break
+                remaining = give_up_at - now
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise RateLimiterError(
+                        f"Not admitted by the rate limiter within {timeout}s"
+                    )
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(
+                        changed.wait(), min(remaining, delay or remaining)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            was_head = self._queue[0] is waiter
+            self._queue.remove(waiter)
+            if was_head:
+                self._notify()
+        now = time.monotonic()
+        if self.requests is not None:
+            self.requests.take(1, now)
+        if self.tokens is not None and tokens:
+            self.tokens.take(tokens, now)
+        self.in_flight += 1
+        self.admitted += 1
+        self.wait_seconds += now - enqueued
+        return Lease(tokens, now)
+
+    def release(
+        self,
+        lease: Lease,
+        error: Optional[BaseException] = None,
+        used_tokens: Optional[int] = None,
+        work: Optional[int] = None,
+    ) -> None:
+        """
+        Free the call's slot and adapt the limit: a 429, or a saturated call
+        whose latency per unit of `work` (generated tokens) is above tolerance,
+        decreases it; other successes increase it. Without `work`, or with less
+        than `min_work`, the call's latency is not sampled. `used_tokens` settles the TPM estimate taken at
+        admission.
+        """
+        now = time.monotonic()
+        saturated = self.in_flight >= int(self.limit)
+        self.in_flight -= 1
+        if self.tokens is not None and used_tokens is not None:
+            self.tokens.adjust(used_tokens - lease.tokens)
+        if error is not None:
+            if is_rate_limited(error):
+                self.throttled += 1
+                self._decrease(lease, now)
+        elif saturated and self._too_slow(now - lease.started, work):
+            self._decrease(lease, now)
+        else:
+            # Grow while the limit is what holds calls back; otherwise only
+            # recover to the initial limit, so idle keys stay protected
+            ceiling = self.max_concurrency if saturated else self.initial_concurrency
+            if self.limit < ceiling:
+                self.limit = min(ceiling, self.limit + 1 / self.limit)
+        if error is None and work and work >= self.min_work:
+            self._observe((now - lease.started) / work)
+        self._notify()
+
+    def _too_slow(self, latency: float, work: Optional[int]) -> bool:
+        if not work or work < self.min_work:
+            return False
+        if self.latency is None or self.samples < self.min_samples:
+            return False
+        return latency / work > self.latency_tolerance * self.latency
+
+    def _observe(self, per_unit: float) -> None:
+        self.samples += 1
+        if self.latency is None:
+            self.latency = per_unit
+        else:
+            self.latency += self.alpha * (per_unit - self.latency)
+
+    def _decrease(self, lease: Lease, now: float) -> None:
+        # Calls started before the last decrease saw the old limit; their
+        # signals would cut it again for the same overload
+        if lease.started < self._last_decrease:
+            return
+        self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+        self._last_decrease = now
+        self.decreases += 1
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "decreases": self.decreases,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "avg_wait_ms": (
+                round(self.wait_seconds / self.admitted * 1000, 1)
+                if self.admitted
+                else 0.0
+            ),
+            "latency_ms_per_token": (
+                round(self.latency * 1000, 3) if self.latency is not None else None
+            ),
+            "rpm_available": (
+                round(self.requests.available(now), 1)
+                if self.requests is not None
+                else None
+            ),
+            "tpm_available": (
+                round(self.tokens.available(now), 1)
+                if self.tokens is not None
+                else None
+            ),
+        }
+
+
+class RateLimiter:
+    """
+    Limiters by (service, model, API key fingerprint), created on first use
+    with the configured budgets; idle limiters beyond `max_keys` are dropped.
+    Not thread-safe; intended for use from a single event loop.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[dict[str, dict[str, float]]] = None,
+        default_rpm: float = 0.0,
+        default_tpm: float = 0.0,
+        initial_concurrency: int = 32,
+        min_concurrency: int = 1,
+        max_concurrency: int = 256,
+        latency_tolerance: float = 2.0,
+        max_queue: int = 1000,
+        queue_timeout: float = 30.0,
+        max_keys: int = 10000,
+    ):
+        self.limits = {key.lower(): value for key, value in (limits or {}).items()}
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_tolerance = latency_tolerance
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_keys = max_keys
+        self._limiters: OrderedDict[tuple[str, str, str], ProviderLimiter] = (
+            OrderedDict()
+        )
+
+    def budget(self, service: str, model: str) -> dict[str, float]:
+        """Configured budget for a model: defaults, then service, then model."""
+        budget = {
+            "rpm": self.default_rpm,
+            "tpm": self.default_tpm,
+            "max_concurrency": self.max_concurrency,
+        }
+        budget.update(self.limits.get(service.lower(), {}))
+        budget.update(self.limits.get(f"{service}/{model}".lower(), {}))
+        return budget
+
+    def limiter_for(self, service: str, model: str, api_key: str) -> ProviderLimiter:
+        key = (service.lower(), model, key_fingerprint(api_key))
+        limiter = self._limiters.get(key)
+        if limiter is not None:
+            self._limiters.move_to_end(key)
+            return limiter
+        budget = self.budget(service, model)
+        max_concurrency = int(budget["max_concurrency"])
+        limiter = self._limiters[key] = ProviderLimiter(
+            rpm=budget["rpm"],
+            tpm=budget["tpm"],
+            initial_concurrency=min(self.initial_concurrency, max_concurrency),
+            min_concurrency=self.min_concurrency,
+            max_concurrency=max_concurrency,
+            latency_tolerance=self.latency_tolerance,
+            max_queue=self.max_queue,
+        )
+        self._evict_idle()
+        return limiter
+
+    def _evict_idle(self) -> None:
+        excess = len(self._limiters) - self.max_keys
+        for key in list(self._limiters):
+            if excess <= 0:
+                break
+            limiter = self._limiters[key]
+            if limiter.in_flight == 0 and limiter.queued == 0:
+                del self._limiters[key]
+                excess -= 1
+
+    async def _acquire(
+        self,
+        limiter: ProviderLimiter,
+        estimate: Optional[Callable[[], int]],
+        timeout: Optional[float],
+    ) -> Lease:
+        # Prompts are only tokenized when a TPM budget applies
+        tokens = estimate() if estimate is not None and limiter.tokens else 0
+        return await limiter.acquire(
+            tokens, self.queue_timeout if timeout is None else timeout
+        )
+
+    async def run(
+        self,
+        service: str,
+        model: str,
+        api_key: str,
+        call: Callable[[], Awaitable[Any]],
+        estimate: Optional[Callable[[], int]] = None,
+        used_tokens: Callable[[Any], Optional[int]] = usage_tokens,
+        work: Callable[[Any], Optional[int]] = completion_tokens,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Await call() once admitted. `estimate` gives the tokens to reserve
+        against the TPM budget; `used_tokens` reads the actual count from the
+        result to settle the reservation, and `work` the tokens the call's
+        latency is normalised by (no latency sample if it returns None).
+        """
+        limiter = self.limiter_for(service, model, api_key)
+        lease = await self._acquire(limiter, estimate, timeout)
+        try:
+            result = await call()
+        except BaseException as e:
+            limiter.release(lease, error=e)
+            raise
+        limiter.release(lease, used_tokens=used_tokens(result), work=work(result))
+        return result
+
+    @asynccontextmanager
+    async def hold(
+        self,
+        service: str,
+        model: str,
+        api_key: str,
+        estimate: Optional[Callable[[], int]] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[Lease]:
+        """
+        Hold a slot for the duration of a stream. Stream duration depends on
+        the reply's length, so it is not used as a latency signal.
+        """
+        limiter = self.limiter_for(service, model, api_key)
+        lease = await self._acquire(limiter, estimate, timeout)
+        try:
+            yield lease
+        except BaseException as e:
+            limiter.release(lease, error=e)
+            raise
+        limiter.release(lease)
+
+    def stats(self) -> dict:
+        """Return per-limiter concurrency, queue depth and budget state."""
+        limiters = {
+            f"{service}/{model}/{fingerprint[:8]}": limiter.stats()
+            for (service, model, fingerprint), limiter in self._limiters.items()
+        }
+        return {
+            "limiters": len(limiters),
+            "queued": sum(s["queued"] for s in limiters.values()),
+            "in_flight": sum(s["in_flight"] for s in limiters.values()),
+            "by_key": limiters,
+        }
+
+
+# Singleton limiter for app-wide usage
+rate_limiter = RateLimiter(
+    limits=get_settings().RATE_LIMITS,
+    default_rpm=get_settings().RATE_LIMIT_DEFAULT_RPM,
+    default_tpm=get_settings().RATE_LIMIT_DEFAULT_TPM,
+    initial_concurrency=get_settings().RATE_LIMIT_INITIAL_CONCURRENCY,
+    min_concurrency=get_settings().RATE_LIMIT_MIN_CONCURRENCY,
+    max_concurrency=get_settings().RATE_LIMIT_MAX_CONCURRENCY,
+    latency_tolerance=get_settings().RATE_LIMIT_LATENCY_TOLERANCE,
+    max_queue=get_settings().RATE_LIMIT_MAX_QUEUE,
+    queue_timeout=get_settings().RATE_LIMIT_QUEUE_TIMEOUT_SECONDS,
+    max_keys=get_settings().RATE_LIMIT_MAX_KEYS,
+)
+register_metrics("rate_limits", rate_limiter.stats)
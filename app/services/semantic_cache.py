@@ -0,0 +1,216 @@
+"""Semantic similarity cache for agent replies.
+
+The final user turn is embedded and compared against earlier turns of the
+same agent; a reply is reused when the cosine similarity clears the agent's
+threshold. Each agent has its own in-process index (brute-force cosine over
+normalized vectors), bounded in entries, evicted LRU and expired by TTL. The
+scan over an index takes tens of milliseconds at the default size, so it runs
+on a worker thread over a snapshot of the entries instead of on the event
+loop. Agents opt in with ``config.semantic_cache``.
+"""
+
+import asyncio
+import math
+import operator
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.metrics import register_metrics
+from app.services.embedding_batcher import embed_texts
+
+
+@dataclass
+class SemanticCacheConfig:
+    threshold: float
+    embedding_service: str
+    embedding_model: str
+
+
+@dataclass
+class _Entry:
+    vector: array
+    answer: str
+    expires_at: float
+
+
+def _normalize(vector: list[float]) -> array:
+    norm = math.sqrt(math.fsum(x * x for x in vector))
+    return array("d", (x / norm for x in vector) if norm else vector)
+
+
+if hasattr(math, "sumprod"):
+    _dot = math.sumprod
+else:
+
+    def _dot(a: array, b: array) -> float:
+        return sum(map(operator.mul, a, b))
+
+
+def _best_match(
+    query: array, candidates: list[tuple[int, array]], threshold: float
+) -> tuple[Optional[int], float]:
+    best_id, best_score = None, threshold
+    for entry_id, vector in candidates:
+        score = _dot(query, vector)
+        if score >= best_score:
+            best_id, best_score = entry_id, score
+    return best_id, best_score
+
+
+def semantic_cache_config(
+    agent_config: Optional[dict],
+) -> Optional[SemanticCacheConfig]:
+    """
+    Resolve an agent's semantic cache settings, or None when not enabled.
+    `semantic_cache` may be true, or a dict overriding "threshold",
+    "embedding_service" and "embedding_model".
+    """
+    option = (agent_config or {}).get("semantic_cache")
+    if not option:
+        return None
+    overrides = option if isinstance(option, dict) else {}
+    settings = get_settings()
+    return SemanticCacheConfig(
+        threshold=float(
+            overrides.get("threshold", settings.SEMANTIC_CACHE_THRESHOLD)
+        ),
+        embedding_service=overrides.get(
+            "embedding_service", settings.SEMANTIC_CACHE_EMBEDDING_SERVICE
+        ),
+        embedding_model=overrides.get(
+            "embedding_model", settings.SEMANTIC_CACHE_EMBEDDING_MODEL
+        ),
+    )
+
+
+class SemanticCache:
+    """
+    Per-agent vector indexes of (embedding, answer) pairs.
+    Not thread-safe; intended for use from a single event loop.
+    """
+
+    def __init__(self, max_entries_per_agent: int, max_agents: int, ttl: float):
+        self.max_entries_per_agent = max_entries_per_agent
+        self.max_agents = max_agents
+        self.ttl = ttl
+        self._indexes: OrderedDict[str, OrderedDict[int, _Entry]] = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Invalidation stamps, as in TTLCache: answers generated from an
+        # agent's config loaded before its last invalidation are not added
+        self._generation = 0
+        self._invalidated: OrderedDict[str, int] = OrderedDict()
+        self._forgotten = 0
+
+    def version(self, agent_id: str) -> int:
+        """Return the agent's current version; it changes on invalidate()."""
+        return self._invalidated.get(agent_id, self._forgotten)
+
+    async def lookup(
+        self, agent_id: str, vector: list[float], threshold: float
+    ) -> Optional[tuple[str, float]]:
+        """Return (answer, similarity) of the closest fresh entry above threshold."""
+        index = self._indexes.get(agent_id)
+        best_id, best_score = None, threshold
+        if index is not None:
+            self._indexes.move_to_end(agent_id)
+            query = _normalize(vector)
+            now = time.monotonic()
+            candidates = []
+            for entry_id, entry in list(index.items()):
+                if entry.expires_at <= now:
+                    del index[entry_id]
+                elif len(entry.vector) == len(query):  # else another model's
+                    candidates.append((entry_id, entry.vector))
+            if candidates:
+                best_id, best_score = await asyncio.to_thread(
+                    _best_match, query, candidates, threshold
+                )
+        # The entry may have been evicted while the scan ran
+        if best_id is None or best_id not in index:
+            self.misses += 1
+            return None
+        index.move_to_end(best_id)
+        self.hits += 1
+        return index[best_id].answer, best_score
+
+    def add(
+        self,
+        agent_id: str,
+        vector: list[float],
+        answer: str,
+        version: Optional[int] = None,
+    ) -> None:
+        """
+        Index an answer for the agent, evicting the least recently used. With
+        `version` (from version(agent_id) before the agent was loaded), the
+        answer is dropped if the agent has been invalidated since.
+        """
+        if self.max_entries_per_agent <= 0:
+            return
+        if version is not None and version != self.version(agent_id):
+            return
+        index = self._indexes.setdefault(agent_id, OrderedDict())
+        self._indexes.move_to_end(agent_id)
+        self._next_id += 1
+        index[self._next_id] = _Entry(
+            _normalize(vector), answer, time.monotonic() + self.ttl
+        )
+        while len(index) > self.max_entries_per_agent:
+            index.popitem(last=False)
+            self.evictions += 1
+        while len(self._indexes) > self.max_agents:
+            _, dropped = self._indexes.popitem(last=False)
+            self.evictions += len(dropped)
+
+    def invalidate(self, agent_id: str) -> None:
+        """Forget every cached answer of an agent (e.g. after its prompt changed)."""
+        self._indexes.pop(agent_id, None)
+        self._generation += 1
+        self._invalidated[agent_id] = self._generation
+        self._invalidated.move_to_end(agent_id)
+        while len(self._invalidated) > max(self.max_agents, 1):
+            _, self._forgotten = self._invalidated.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and index occupancy."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "agents": len(self._indexes),
+            "entries": sum(len(index) for index in self._indexes.values()),
+        }
+
+
+async def embed_for_cache(
+    user_id: str, text: str, config: SemanticCacheConfig
+) -> Optional[list]:
+    """Embed text with the agent's model; on failure log and skip the cache."""
+    try:
+        response = await embed_texts(
+            user_id, config.embedding_service, config.embedding_model, [text]
+        )
+        return response["data"][0]["embedding"]
+    except Exception as e:
+        logger.warning(f"Semantic cache embedding failed, skipping cache: {e}")
+        return None
+
+
+# Singleton cache for app-wide usage
+semantic_cache = SemanticCache(
+    max_entries_per_agent=get_settings().SEMANTIC_CACHE_MAX_ENTRIES_PER_AGENT,
+    max_agents=get_settings().SEMANTIC_CACHE_MAX_AGENTS,
+    ttl=get_settings().SEMANTIC_CACHE_TTL_SECONDS,
+)
+register_metrics("semantic_cache", semantic_cache.stats)
@@ -0,0 +1,225 @@
+"""Server-Sent Events framing for streamed LLM completions.
+
+Upstream chunks are read by a separate task, so the response can send
+keep-alive comments while the provider is silent and can notice a client that
+has gone away. When the client disconnects, or the response is cancelled, the
+upstream stream is cancelled too, so an abandoned request stops consuming
+provider tokens. Every stream ends with a usage event (token counts, time to
+first token, tokens per second) and a ``[DONE]`` sentinel, unless the client
+went away first.
+"""
+
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from typing import Any, Optional
+
+from loguru import logger
+
+from app.core.metrics import register_metrics
+from app.services.context_builder import count_message_tokens, count_tokens
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+KEEPALIVE = ": keep-alive\n\n"
+DONE = "data: [DONE]\n\n"
+
+_END = object()
+
+
+def format_sse(
+    data: Any, event: Optional[str] = None, event_id: Optional[int] = None
+) -> str:
+    """Frame one SSE event; non-string data is sent as JSON."""
+    if not isinstance(data, str):
+        data = json.dumps(data, default=str)
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class StreamMetrics:
+    """Process-wide counters and latency totals for streamed completions."""
+
+    def __init__(self):
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.ttft_ms_total = 0.0
+        self.ttft_samples = 0
+        self.tokens_per_second_total = 0.0
+        self.throughput_samples = 0
+
+    def record(self, usage: dict) -> None:
+        if usage.get("ttft_ms") is not None:
+            self.ttft_ms_total += usage["ttft_ms"]
+            self.ttft_samples += 1
+        if usage.get("tokens_per_second") is not None:
+            self.tokens_per_second_total += usage["tokens_per_second"]
+            self.throughput_samples += 1
+
+    def stats(self) -> dict:
+        """Return stream outcomes with average TTFT and throughput."""
+        return {
+            "started": self.started,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "avg_ttft_ms": (
+                round(self.ttft_ms_total / self.ttft_samples, 1)
+                if self.ttft_samples
+                else None
+            ),
+            "avg_tokens_per_second": (
+                round(self.tokens_per_second_total / self.throughput_samples, 1)
+                if self.throughput_samples
+                else None
+            ),
+        }
+
+
+stream_metrics = StreamMetrics()
+register_metrics("streams", stream_metrics.stats)
+
+
+def _as_dict(chunk: Any) -> dict:
+    if isinstance(chunk, dict):
+        return chunk
+    if hasattr(chunk, "model_dump"):
+        return chunk.model_dump()
+    return dict(chunk)
+
+
+async def text_chunks(texts: AsyncIterator[str]) -> AsyncIterator[dict]:
+    """Adapt a stream of text deltas to completion chunks."""
+    try:
+        async for text in texts:
+            yield {"choices": [{"delta": {"content": text}, "finish_reason": None}]}
+    finally:
+        await texts.aclose()
+
+
+async def _pump(chunks: AsyncIterator, queue: asyncio.Queue) -> None:
+    try:
+        async for chunk in chunks:
+            await queue.put(chunk)
+    except Exception as e:
+        await queue.put(e)
+    else:
+        await queue.put(_END)
+
+
+class _StreamState:
+    """Event ids, generated text and timings of one SSE response."""
+
+    def __init__(self, model: str, messages: list):
+        self.model = model
+        self.messages = messages
+        self.started = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.event_id = 0
+        self.content: list[str] = []
+        self.reported_usage: Optional[dict] = None
+
+    def event(self, data: Any, event: str) -> str:
+        self.event_id += 1
+        return format_sse(data, event, self.event_id)
+
+    def delta_events(self, item: Any) -> Iterator[str]:
+        """Frame a "delta" event per content or finish chunk of a completion."""
+        chunk = _as_dict(item)
+        if chunk.get("usage"):
+            self.reported_usage = _as_dict(chunk["usage"])
+        for choice in chunk.get("choices") or []:
+            delta = (choice.get("delta") or {}).get("content")
+            finish_reason = choice.get("finish_reason")
+            if not delta and not finish_reason:
+                continue
+            if delta:
+                self.first_token_at = self.first_token_at or time.monotonic()
+                self.content.append(delta)
+            yield self.event(
+                {"content": delta or "", "finish_reason": finish_reason}, "delta"
+            )
+
+    def usage(self) -> dict:
+        """Token counts (local counts if not reported) and stream timings."""
+        ended = time.monotonic()
+        reported = self.reported_usage or {}
+        completion_tokens = reported.get("completion_tokens") or count_tokens(
+            self.model, "".join(self.content)
+        )
+        prompt_tokens = reported.get("prompt_tokens") or count_message_tokens(
+            self.model, self.messages
+        )
+        first = self.first_token_at
+        generating = ended - first if first else 0.0
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "ttft_ms": round((first - self.started) * 1000, 1) if first else None,
+            "duration_ms": round((ended - self.started) * 1000, 1),
+            "tokens_per_second": (
+                round(completion_tokens / generating, 1) if generating > 0 else None
+            ),
+        }
+
+
+async def sse_completion_stream(
+    chunks: AsyncIterator,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    model: str,
+    messages: list,
+    keepalive: float = 15.0,
+) -> AsyncIterator[str]:
+    """
+    Turn completion chunks into SSE events: one "delta" event per content
+    chunk, then a "usage" event and the [DONE] sentinel (an "error" event
+    replaces "usage" if the provider fails). Usage falls back to local token
+    counts when the provider does not report it.
+    """
+    stream_metrics.started += 1
+    state = _StreamState(model, messages)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+    pump = asyncio.ensure_future(_pump(chunks, queue))
+    finished = False
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    logger.info("Stream client disconnected, cancelling upstream")
+                    stream_metrics.cancelled += 1
+                    finished = True
+                    return
+                yield KEEPALIVE
+                continue
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                stream_metrics.failed += 1
+                finished = True
+                yield state.event({"error": str(item)}, "error")
+                yield DONE
+                return
+            for event in state.delta_events(item):
+                yield event
+
+        usage = state.usage()
+        stream_metrics.record(usage)
+        stream_metrics.completed += 1
+        finished = True
+        yield state.event(usage, "usage")
+        yield DONE
+    finally:
+        if not finished:
+            # The response was cancelled (client gone) mid-stream
+            stream_metrics.cancelled += 1
+        pump.cancel()
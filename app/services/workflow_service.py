@@ -2,8 +2,11 @@ from typing import Optional
 
 from loguru import logger
 
-from app.db.supabase_client import SupabaseClientError, get_supabase_client
+from app.db.repository import Repository, select_columns
+from app.db.supabase_client import SupabaseClientError
+from app.models.bulk import BulkResponse
 from app.models.workflow import (
+    WorkflowBulkUpdate,
     WorkflowCreate,
     WorkflowRunRequest,
     WorkflowRunResult,
@@ -12,6 +15,8 @@ from app.models.workflow import (
 
 WORKFLOW_TABLE = "workflows"
 
+workflow_repo = Repository(WORKFLOW_TABLE)
+
 class WorkflowServiceError(Exception):
     """Custom exception for WorkflowService errors."""
     pass
@@ -25,8 +30,8 @@ class WorkflowService:
         try:
             data = workflow.dict()
             data["user_id"] = user_id
-            supabase = get_supabase_client()
-            res = supabase.table(WORKFLOW_TABLE).insert(data).execute()
+            query = workflow_repo.query().insert(data)
+            res = await workflow_repo.execute(query, "insert")
             if res.data:
                 return res.data[0]
             logger.error(f"Supabase insert error: {res.error}")
@@ -36,16 +41,17 @@ class WorkflowService:
             raise WorkflowServiceError("Failed to create workflow") from e
 
     @staticmethod
-    async def list_workflows(user_id: str) -> list[dict]:
-        """List all workflows for a user."""
+    async def list_workflows(
+        user_id: str, columns: Optional[list[str]] = None
+    ) -> list[dict]:
+        """List all workflows for a user, optionally projecting `columns`."""
         try:
-            supabase = get_supabase_client()
-            res = (
-                supabase.table(WORKFLOW_TABLE)
-                .select("*")
+            query = (
+                workflow_repo.query()
+                .select(select_columns(columns))
                 .eq("user_id", user_id)
-                .execute()
             )
+            res = await workflow_repo.execute(query, "select")
             return res.data or []
         except Exception as e:
             logger.error(f"Error listing workflows: {e}")
@@ -55,14 +61,13 @@ class WorkflowService:
     async def delete_workflow(workflow_id: str, user_id: str) -> bool:
         """Delete a workflow for a user. Returns True if deleted."""
         try:
-            supabase = get_supabase_client()
-            res = (
-                supabase.table(WORKFLOW_TABLE)
+            query = (
+                workflow_repo.query()
                 .delete()
                 .eq("id", workflow_id)
                 .eq("user_id", user_id)
-                .execute()
             )
+            res = await workflow_repo.execute(query, "delete")
             return bool(res.data)
         except Exception as e:
             logger.error(f"Error deleting workflow: {e}")
@@ -75,14 +80,13 @@ class WorkflowService:
         """Update a workflow for a user. Returns updated workflow or None."""
         try:
             data = workflow.dict(exclude_unset=True)
-            supabase = get_supabase_client()
-            res = (
-                supabase.table(WORKFLOW_TABLE)
+            query = (
+                workflow_repo.query()
                 .update(data)
                 .eq("id", workflow_id)
                 .eq("user_id", user_id)
-                .execute()
             )
+            res = await workflow_repo.execute(query, "update")
             return res.data[0] if res.data else None
         except Exception as e:
             logger.error(f"Error updating workflow: {e}")
@@ -92,20 +96,65 @@ class WorkflowService:
     async def get_workflow(workflow_id: str, user_id: str) -> Optional[dict]:
         """Retrieve a workflow by ID for a user. Returns None if not found."""
         try:
-            supabase = get_supabase_client()
-            res = (
-                supabase.table(WORKFLOW_TABLE)
+            query = (
+                workflow_repo.query()
                 .select("*")
                 .eq("id", workflow_id)
                 .eq("user_id", user_id)
                 .single()
-                .execute()
             )
-            return res.data if res.data else None
+            res = await workflow_repo.execute_shared(
+                ("id", user_id, workflow_id), query
+            )
+            return dict(res.data) if res.data else None
         except Exception as e:
             logger.error(f"Error fetching workflow: {e}")
             raise WorkflowServiceError("Failed to fetch workflow") from e
 
+    @staticmethod
+    async def create_workflows_bulk(
+        user_id: str, workflows: list[WorkflowCreate]
+    ) -> BulkResponse:
+        """Create many workflows for a user with one multi-row insert."""
+        try:
+            rows = [
+                {**workflow.model_dump(mode="json"), "user_id": user_id}
+                for workflow in workflows
+            ]
+            created = await workflow_repo.insert_many(rows)
+            return BulkResponse.from_created(created)
+        except Exception as e:
+            logger.error(f"Error bulk creating workflows: {e}")
+            raise WorkflowServiceError("Failed to create workflows") from e
+
+    @staticmethod
+    async def update_workflows_bulk(
+        user_id: str, workflows: list[WorkflowBulkUpdate]
+    ) -> BulkResponse:
+        """Update many workflows owned by a user (one concurrent update per row)."""
+        try:
+            updates = {
+                w.id: w.model_dump(exclude_unset=True, exclude={"id"}, mode="json")
+                for w in workflows
+            }
+            updated = await workflow_repo.update_many(user_id, updates)
+            return BulkResponse.from_ids([w.id for w in workflows], updated, "updated")
+        except Exception as e:
+            logger.error(f"Error bulk updating workflows: {e}")
+            raise WorkflowServiceError("Failed to update workflows") from e
+
+    @staticmethod
+    async def delete_workflows_bulk(
+        user_id: str, workflow_ids: list[str]
+    ) -> BulkResponse:
+        """Delete many workflows owned by a user in one statement."""
+        try:
+            deleted = await workflow_repo.delete_many(user_id, workflow_ids)
+            return BulkResponse.from_ids(workflow_ids, deleted, "deleted")
+        except Exception as e:
+            logger.error(f"Error bulk deleting workflows: {e}")
+            raise WorkflowServiceError("Failed to delete workflows") from e
+
     @staticmethod
     async def run_workflow(
         workflow_id: str, user_id: str, run_request: WorkflowRunRequest
@@ -123,6 +172,16 @@ class WorkflowService:
             output = {}
             status = "success"
 
+            # Load every plugin config the workflow uses in one query rather
+            # than one lookup per step.
+            from app.services.plugin_service import PluginService
+            plugin_ids = [
+                step.get("config_id")
+                for step in steps
+                if step.get("type") == "plugin" and step.get("config_id")
+            ]
+            plugin_configs = await PluginService.get_plugin_configs(plugin_ids, user_id)
+
             for idx, step in enumerate(steps):
                 step_type = step.get("type")
                 config_id = step.get("config_id")
@@ -131,8 +190,7 @@ class WorkflowService:
                 logs.append(f"Running step {step_id} of type {step_type}")
                 try:
                     if step_type == "plugin":
-                        from app.services.plugin_service import PluginService
-                        result = await PluginService.execute(config_id, {**parameters, **context, "user_id": user_id})
+                        result = await PluginService.execute(config_id, {**parameters, **context, "user_id": user_id}, config=plugin_configs.get(config_id))
                         output[step_id] = result
                         logs.append(f"Step {step_id} plugin result: {result}")
                     elif step_type == "agent":
@@ -5,6 +5,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
 from app.api.endpoints.agents import router as agents_router
+from app.api.endpoints.chat import CURSOR_HEADERS
 from app.api.endpoints.chat import router as chat_router
 from app.api.endpoints.litellm import router as litellm_router
 from app.api.endpoints.openai import router as openai_router
@@ -19,8 +20,9 @@ from app.core.error_handlers import (
     validation_exception_handler,
 )
 from app.db.supabase_client import SupabaseClientError
+from app.lifecycle import install, lifespan
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_exception_handler(HTTPException, http_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -37,8 +39,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=CURSOR_HEADERS,
 )
 
+# Query instrumentation and /metrics; the lifespan flushes write-behind
+# buffers and closes pools on shutdown
+install(app)
+
 # Logging
 logger.add("backend.log", rotation="1 week")
 
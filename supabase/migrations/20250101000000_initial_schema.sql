@@ -0,0 +1,84 @@
+-- Core tables used by the CRUD modules in app/db/crud and app/services.
+-- Column shapes follow the Pydantic models in app/models.
+
+create extension if not exists pgcrypto;
+
+create table if not exists plugin_configurations (
+    id uuid primary key default gen_random_uuid(),
+    user_id text not null,
+    plugin_type text not null,
+    name text not null,
+    encrypted_config_blob text not null,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create table if not exists agents (
+    id uuid primary key default gen_random_uuid(),
+    user_id text not null,
+    name text not null,
+    description text,
+    avatar_url text,
+    color_theme text,
+    tags text[] not null default '{}',
+    provider text,
+    model text,
+    system_prompt text,
+    config jsonb,
+    plugin_config jsonb,
+    archived boolean not null default false,
+    config_path text,
+    status text,
+    agent_type text,
+    graph_id text,
+    memory_config jsonb,
+    a2a_config jsonb,
+    plugin_config_id uuid references plugin_configurations (id) on delete set null,
+    output_schema jsonb,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create table if not exists chat_sessions (
+    id uuid primary key default gen_random_uuid(),
+    user_id text not null,
+    name text,
+    agent_id uuid references agents (id) on delete set null,
+    participants jsonb not null default '[]',
+    archived boolean not null default false,
+    graph_id text,
+    memory_config jsonb,
+    plugin_config_id uuid references plugin_configurations (id) on delete set null,
+    a2a_config jsonb,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create table if not exists chat_messages (
+    id uuid primary key default gen_random_uuid(),
+    chat_session_id uuid not null references chat_sessions (id) on delete cascade,
+    content text not null,
+    sender_id text not null,
+    sender_type text not null check (sender_type in ('user', 'agent', 'system')),
+    metadata jsonb,
+    timestamp timestamptz not null default now()
+);
+
+create table if not exists workflows (
+    id uuid primary key default gen_random_uuid(),
+    user_id text not null,
+    name text not null,
+    description text,
+    steps jsonb not null default '[]',
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create table if not exists user_api_keys (
+    id uuid primary key default gen_random_uuid(),
+    user_id text not null,
+    service text not null,
+    encrypted_key text,
+    created_at timestamptz not null default now(),
+    last_used_at timestamptz
+);
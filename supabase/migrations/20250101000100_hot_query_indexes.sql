@@ -0,0 +1,25 @@
+-- Composite indexes matching the filters and orderings of the hot queries.
+-- Verify with: python -m tools.check_query_plans
+
+-- get_agents_by_user: user_id = ? and archived = false
+create index if not exists agents_user_id_archived_idx
+    on agents (user_id, archived);
+
+-- list_sessions: user_id = ? and archived = false order by created_at desc
+create index if not exists chat_sessions_user_id_archived_created_at_idx
+    on chat_sessions (user_id, archived, created_at desc);
+
+-- get_messages / get_latest_messages: keyset over (timestamp, id) per session
+create index if not exists chat_messages_session_timestamp_id_idx
+    on chat_messages (chat_session_id, timestamp, id);
+
+-- plugin and workflow list views: user_id = ?
+create index if not exists plugin_configurations_user_id_idx
+    on plugin_configurations (user_id);
+
+create index if not exists workflows_user_id_idx
+    on workflows (user_id);
+
+-- store_api_key upserts on (user_id, service); also serves list_api_keys
+create unique index if not exists user_api_keys_user_id_service_key
+    on user_api_keys (user_id, service);
@@ -0,0 +1,20 @@
+-- Bulk last_used_at update for provider API keys: one statement per flush of
+-- the in-memory usage buffer (app.services.key_service.api_key_usage).
+-- p_keys is a JSON array of {"user_id", "service", "used_at"} objects.
+-- Never moves last_used_at backwards and never creates rows for keys that
+-- were deleted in the meantime. Returns the number of keys updated.
+
+create or replace function touch_api_keys(p_keys jsonb)
+returns integer
+language sql
+as $$
+    with updated as (
+        update user_api_keys k
+        set last_used_at = greatest(k.last_used_at, u.used_at)
+        from jsonb_to_recordset(p_keys)
+            as u(user_id text, service text, used_at timestamptz)
+        where k.user_id = u.user_id and k.service = u.service
+        returning 1
+    )
+    select count(*)::integer from updated;
+$$;
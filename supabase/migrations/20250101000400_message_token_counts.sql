@@ -0,0 +1,63 @@
+-- Per-message token counts, stored when a message is written so the context
+-- builder (app.services.context_builder) never re-tokenizes history. Keyed by
+-- tokenizer encoding name, e.g. {"o200k_base": 12}, since counts differ
+-- between model families.
+
+alter table chat_messages add column if not exists token_counts jsonb;
+
+-- agent_turn_context now also stores the incoming message's token counts
+create or replace function agent_turn_context(
+    p_user_id text,
+    p_agent_id uuid,
+    p_chat_session_id uuid,
+    p_message jsonb,
+    p_history_limit integer default 20
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_agent jsonb;
+    v_history jsonb;
+    v_message jsonb;
+begin
+    select to_jsonb(a) into v_agent
+    from agents a
+    where a.id = p_agent_id and a.user_id = p_user_id;
+
+    if v_agent is null then
+        return jsonb_build_object(
+            'agent', null, 'history', '[]'::jsonb, 'message', null
+        );
+    end if;
+
+    -- History is read before the insert so it excludes the new message
+    select coalesce(jsonb_agg(to_jsonb(m) order by m.timestamp, m.id), '[]'::jsonb)
+    into v_history
+    from (
+        select *
+        from chat_messages
+        where chat_session_id = p_chat_session_id
+        order by timestamp desc, id desc
+        limit p_history_limit
+    ) m;
+
+    if p_message is not null then
+        insert into chat_messages (
+            chat_session_id, content, sender_id, sender_type, metadata, token_counts
+        )
+        values (
+            p_chat_session_id,
+            p_message ->> 'content',
+            p_message ->> 'sender_id',
+            p_message ->> 'sender_type',
+            p_message -> 'metadata',
+            p_message -> 'token_counts'
+        )
+        returning to_jsonb(chat_messages.*) into v_message;
+    end if;
+
+    return jsonb_build_object(
+        'agent', v_agent, 'history', v_history, 'message', v_message
+    );
+end;
+$$;
@@ -0,0 +1,66 @@
+-- agent_turn_context runs with the service-role key, so it must check that
+-- the chat session belongs to p_user_id as well as the agent: otherwise any
+-- user could read and append to another user's session by id. Either check
+-- failing returns no context and stores nothing.
+
+create or replace function agent_turn_context(
+    p_user_id text,
+    p_agent_id uuid,
+    p_chat_session_id uuid,
+    p_message jsonb,
+    p_history_limit integer default 20
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_agent jsonb;
+    v_history jsonb;
+    v_message jsonb;
+begin
+    select to_jsonb(a) into v_agent
+    from agents a
+    where a.id = p_agent_id
+      and a.user_id = p_user_id
+      and exists (
+          select 1
+          from chat_sessions s
+          where s.id = p_chat_session_id and s.user_id = p_user_id
+      );
+
+    if v_agent is null then
+        return jsonb_build_object(
+            'agent', null, 'history', '[]'::jsonb, 'message', null
+        );
+    end if;
+
+    -- History is read before the insert so it excludes the new message
+    select coalesce(jsonb_agg(to_jsonb(m) order by m.timestamp, m.id), '[]'::jsonb)
+    into v_history
+    from (
+        select *
+        from chat_messages
+        where chat_session_id = p_chat_session_id
+        order by timestamp desc, id desc
+        limit p_history_limit
+    ) m;
+
+    if p_message is not null then
+        insert into chat_messages (
+            chat_session_id, content, sender_id, sender_type, metadata, token_counts
+        )
+        values (
+            p_chat_session_id,
+            p_message ->> 'content',
+            p_message ->> 'sender_id',
+            p_message ->> 'sender_type',
+            p_message -> 'metadata',
+            p_message -> 'token_counts'
+        )
+        returning to_jsonb(chat_messages.*) into v_message;
+    end if;
+
+    return jsonb_build_object(
+        'agent', v_agent, 'history', v_history, 'message', v_message
+    );
+end;
+$$;
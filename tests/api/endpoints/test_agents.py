@@ -0,0 +1,100 @@
+"""Tests for the /api/v1/agents list endpoint sparse fieldsets."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.models.bulk import BulkResponse
+
+FULL_AGENT = {
+    "id": "agent-1",
+    "user_id": "test-user-123",
+    "name": "Agent",
+    "system_prompt": "long prompt",
+    "created_at": None,
+    "updated_at": None,
+}
+AGENTS_URL = "/api/v1/agents/agents/"
+
+
+@pytest.mark.asyncio
+async def test_list_agents_with_fields_returns_projection(client):
+    with patch(
+        "app.api.endpoints.agents.get_agents_by_user", new_callable=AsyncMock
+    ) as mock_list:
+        mock_list.return_value = [{"id": "agent-1", "name": "Agent"}]
+        response = await client.get(AGENTS_URL, params={"fields": "name"})
+    assert response.status_code == 200
+    assert response.json() == [{"id": "agent-1", "name": "Agent"}]
+    assert mock_list.call_args.kwargs["columns"] == ["id", "name"]
+
+
+@pytest.mark.asyncio
+async def test_list_agents_without_fields_returns_full_rows(client):
+    with patch(
+        "app.api.endpoints.agents.get_agents_by_user", new_callable=AsyncMock
+    ) as mock_list:
+        mock_list.return_value = [FULL_AGENT]
+        response = await client.get(AGENTS_URL)
+    assert response.status_code == 200
+    assert response.json()[0]["system_prompt"] == "long prompt"
+    assert mock_list.call_args.kwargs["columns"] is None
+
+
+@pytest.mark.asyncio
+async def test_list_agents_rejects_unknown_fields(client):
+    response = await client.get(AGENTS_URL, params={"fields": "name,config"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_agents_uses_single_call(client):
+    with patch(
+        "app.db.crud.crud_agent.agent_repo.insert_many", new_callable=AsyncMock
+    ) as mock_insert:
+        mock_insert.return_value = [
+            {"id": "a1", "name": "One"},
+            {"id": "a2", "name": "Two"},
+        ]
+        response = await client.post(
+            AGENTS_URL + "bulk", json=[{"name": "One"}, {"name": "Two"}]
+        )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["succeeded"] == 2
+    assert [r["id"] for r in body["results"]] == ["a1", "a2"]
+    mock_insert.assert_awaited_once()
+    rows = mock_insert.await_args.args[0]
+    assert all(row["user_id"] == "test-user-123" for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_invalidates_semantic_cache_after_the_write(client):
+    order = []
+
+    async def write(user_id, agents):
+        order.append("write")
+        return BulkResponse.from_ids([a.id for a in agents], [{"id": "a1"}], "updated")
+
+    with patch(
+        "app.api.endpoints.agents.update_agents_bulk", side_effect=write
+    ), patch(
+        "app.api.endpoints.agents.semantic_cache.invalidate",
+        side_effect=order.append,
+    ):
+        response = await client.put(
+            AGENTS_URL + "bulk", json=[{"id": "a1", "name": "New"}]
+        )
+    assert response.status_code == 200
+    assert order == ["write", "a1"]
+
+
+@pytest.mark.asyncio
+async def test_list_agents_without_fields_keeps_default_fields(client):
+    with patch(
+        "app.api.endpoints.agents.get_agents_by_user", new_callable=AsyncMock
+    ) as mock_list:
+        mock_list.return_value = [FULL_AGENT]
+        response = await client.get(AGENTS_URL)
+    # Defaults the row did not carry are still serialized for full responses
+    assert "tags" in response.json()[0]
@@ -0,0 +1,63 @@
+"""Tests for the /api/v1/chat message history endpoint."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.db.crud.crud_chat import TurnContext
+
+SESSION_ID = "00000000-0000-0000-0000-0000000000aa"
+MESSAGES_URL = f"/api/v1/chat/chat/sessions/{SESSION_ID}/messages"
+
+
+@pytest.mark.asyncio
+async def test_messages_of_another_users_session_are_not_found(client):
+    with patch(
+        "app.api.endpoints.chat.get_session", new_callable=AsyncMock
+    ) as mock_session, patch(
+        "app.api.endpoints.chat.get_messages", new_callable=AsyncMock
+    ) as mock_messages:
+        mock_session.return_value = None
+        response = await client.get(MESSAGES_URL)
+    assert response.status_code == 404
+    assert mock_session.call_args.args == (SESSION_ID, "test-user-123")
+    mock_messages.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_malformed_cursor_is_a_bad_request(client):
+    with patch(
+        "app.api.endpoints.chat.get_session", new_callable=AsyncMock
+    ) as mock_session:
+        mock_session.return_value = {"id": SESSION_ID}
+        response = await client.get(MESSAGES_URL, params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_streaming_a_turn_for_an_unowned_agent_or_session_is_not_found(client):
+    with patch(
+        "app.services.agent_runner.get_turn_context", new_callable=AsyncMock
+    ) as mock_context:
+        mock_context.return_value = TurnContext(None, [], None)
+        response = await client.post(
+            f"/api/v1/chat/chat/sessions/{SESSION_ID}/stream",
+            json={"agent_id": "agent-1", "message": "hi"},
+        )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_cursor_headers_are_exposed_to_browsers(client):
+    with patch(
+        "app.api.endpoints.chat.get_session", new_callable=AsyncMock
+    ) as mock_session, patch(
+        "app.api.endpoints.chat.get_messages", new_callable=AsyncMock
+    ) as mock_messages:
+        mock_session.return_value = {"id": SESSION_ID}
+        mock_messages.return_value = []
+        response = await client.get(
+            MESSAGES_URL, headers={"Origin": "http://localhost:3000"}
+        )
+    exposed = response.headers["access-control-expose-headers"]
+    assert {"X-Prev-Cursor", "X-Next-Cursor"} <= set(exposed.split(", "))
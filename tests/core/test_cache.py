@@ -0,0 +1,31 @@
+from app.core.cache import TTLCache
+
+
+def test_set_with_stale_version_is_dropped():
+    cache = TTLCache(maxsize=4, ttl=60)
+    version = cache.version("a")
+    cache.invalidate("a")
+    cache.set("a", "stale", version=version)
+    assert cache.peek("a") is None
+    cache.set("a", "fresh", version=cache.version("a"))
+    assert cache.peek("a") == "fresh"
+
+
+def test_versions_stay_conservative_once_stamps_are_forgotten():
+    cache = TTLCache(maxsize=1, ttl=60)
+    version = cache.version("a")
+    cache.invalidate("a")
+    cache.invalidate("b")  # pushes "a" out of the tracked invalidations
+    cache.set("a", "stale", version=version)
+    assert cache.peek("a") is None
+
+
+def test_peek_does_not_count_or_reorder():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.peek("a") == 1
+    assert cache.peek("missing") is None
+    cache.set("c", 3)
+    assert cache.peek("a") is None
+    assert (cache.hits, cache.misses) == (0, 0)
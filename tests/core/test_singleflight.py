@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def query():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"id": "wf-1"}
+
+    results = await asyncio.gather(*(flight.do("wf-1", query) for _ in range(10)))
+    assert calls == 1
+    assert all(r == {"id": "wf-1"} for r in results)
+    assert flight.stats()["collapsed"] == 9
+    assert flight.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_cached():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        flight.do("k", failing), flight.do("k", failing), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.stats()["executed"] == 1
+
+    async def ok():
+        return 1
+
+    assert await flight.do("k", ok) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    flight = SingleFlight()
+
+    async def query():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.create_task(flight.do("k", query))
+    second = asyncio.create_task(flight.do("k", query))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "done"
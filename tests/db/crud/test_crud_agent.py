@@ -0,0 +1,92 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.db.crud import crud_agent
+from app.models.agent import AgentBulkUpdate, AgentUpdate
+
+AGENT_ROW = {"id": "agent-1", "user_id": "user-1", "name": "Agent"}
+
+
+@pytest.fixture
+def mock_db():
+    crud_agent.agent_cache.clear()
+    client = MagicMock()
+    select = client.table.return_value.select.return_value.eq.return_value
+    select.eq.return_value.single.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=dict(AGENT_ROW))
+    )
+    update = client.table.return_value.update.return_value.eq.return_value
+    update.eq.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[dict(AGENT_ROW, name="Renamed")])
+    )
+    with patch("app.db.repository.get_async_supabase_client", return_value=client):
+        yield select.eq.return_value.single.return_value.execute
+    crud_agent.agent_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_get_agent_by_id_is_cached(mock_db):
+    first = await crud_agent.get_agent_by_id("agent-1", "user-1")
+    second = await crud_agent.get_agent_by_id("agent-1", "user-1")
+    assert first == second == AGENT_ROW
+    assert mock_db.await_count == 1
+    stats = crud_agent.get_agent_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_update_and_archive_invalidate_cache(mock_db):
+    await crud_agent.get_agent_by_id("agent-1", "user-1")
+    await crud_agent.update_agent("agent-1", "user-1", AgentUpdate(name="Renamed"))
+    await crud_agent.get_agent_by_id("agent-1", "user-1")
+    assert mock_db.await_count == 2
+    await crud_agent.archive_agent("agent-1", "user-1")
+    await crud_agent.get_agent_by_id("agent-1", "user-1")
+    assert mock_db.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_cache_is_scoped_per_user(mock_db):
+    await crud_agent.get_agent_by_id("agent-1", "user-1")
+    await crud_agent.get_agent_by_id("agent-1", "user-2")
+    assert mock_db.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_read_racing_an_update_is_not_cached(mock_db):
+    release = asyncio.Event()
+
+    async def slow_read():
+        await release.wait()
+        return MagicMock(data=dict(AGENT_ROW))
+
+    mock_db.side_effect = slow_read
+    stale = asyncio.create_task(crud_agent.get_agent_by_id("agent-1", "user-1"))
+    await asyncio.sleep(0)
+    await crud_agent.update_agent("agent-1", "user-1", AgentUpdate(name="Renamed"))
+    # A read after the update must not join the flight that started before it
+    fresh = asyncio.create_task(crud_agent.get_agent_by_id("agent-1", "user-1"))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(stale, fresh)
+    assert mock_db.await_count == 2
+    assert crud_agent.agent_cache.peek(("user-1", "agent-1")) is not None
+    crud_agent.agent_cache.invalidate(("user-1", "agent-1"))
+    assert crud_agent.agent_cache.peek(("user-1", "agent-1")) is None
+
+
+@pytest.mark.asyncio
+async def test_failed_bulk_update_still_invalidates(mock_db):
+    crud_agent.agent_cache.set(("user-1", "agent-1"), dict(AGENT_ROW))
+    with patch.object(
+        crud_agent.agent_repo,
+        "update_many",
+        AsyncMock(side_effect=Exception("second row failed")),
+    ), pytest.raises(crud_agent.SupabaseClientError):
+        await crud_agent.update_agents_bulk(
+            "user-1", [AgentBulkUpdate(id="agent-1", name="Renamed")]
+        )
+    assert crud_agent.agent_cache.peek(("user-1", "agent-1")) is None
@@ -0,0 +1,151 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.db.crud import crud_chat
+from app.models.chat import ChatMessageCreate
+
+M1 = "00000000-0000-0000-0000-000000000001"
+M2 = "00000000-0000-0000-0000-000000000002"
+MESSAGES = [
+    {"id": M1, "timestamp": "2024-01-01T00:00:00+00:00", "content": "a"},
+    {"id": M2, "timestamp": "2024-01-01T00:00:01+00:00", "content": "b"},
+]
+
+
+@pytest.fixture
+def mock_query():
+    """A chainable query builder mock; every filter returns the same builder."""
+    query = MagicMock()
+    for method in ("select", "eq", "or_", "order", "limit", "range"):
+        getattr(query, method).return_value = query
+    query.execute = AsyncMock(return_value=MagicMock(data=[]))
+    client = MagicMock()
+    client.table.return_value = query
+    with patch("app.db.repository.get_async_supabase_client", return_value=client):
+        yield query
+
+
+def test_cursor_round_trip():
+    cursor = crud_chat.encode_message_cursor(MESSAGES[0])
+    assert crud_chat.decode_message_cursor(cursor) == (
+        MESSAGES[0]["timestamp"],
+        M1,
+    )
+
+
+def test_invalid_cursor_raises_value_error():
+    with pytest.raises(ValueError):
+        crud_chat.decode_message_cursor("not-a-cursor")
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        {"id": M1, "timestamp": 'x",id.gt."0'},
+        {"id": 'm1"),or(user_id.neq."', "timestamp": MESSAGES[0]["timestamp"]},
+    ],
+)
+def test_cursor_fields_that_are_not_timestamp_and_uuid_are_rejected(message):
+    cursor = crud_chat.encode_message_cursor(message)
+    with pytest.raises(ValueError):
+        crud_chat.decode_message_cursor(cursor)
+
+
+@pytest.mark.asyncio
+async def test_forward_page_uses_keyset_filter(mock_query):
+    cursor = crud_chat.encode_message_cursor(MESSAGES[0])
+    await crud_chat.get_messages("s1", limit=10, cursor=cursor)
+    keyset = mock_query.or_.call_args.args[0]
+    assert 'timestamp.gt."2024-01-01T00:00:00+00:00"' in keyset
+    assert f'id.gt."{M1}"' in keyset
+    mock_query.limit.assert_called_once_with(10)
+    mock_query.range.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_latest_messages_are_returned_oldest_first(mock_query):
+    mock_query.execute.return_value = MagicMock(data=list(reversed(MESSAGES)))
+    result = await crud_chat.get_latest_messages("s1", limit=2)
+    assert [m["id"] for m in result] == [M1, M2]
+    mock_query.order.assert_any_call("timestamp", desc=True)
+    mock_query.or_.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_turn_context_is_one_rpc_call():
+    rpc_query = MagicMock()
+    rpc_query.execute = AsyncMock(
+        return_value=MagicMock(
+            data={"agent": {"id": "a1"}, "history": MESSAGES, "message": {"id": "m3"}}
+        )
+    )
+    client = MagicMock()
+    client.rpc.return_value = rpc_query
+    message = ChatMessageCreate(content="hi", sender_id="u1", sender_type="user")
+    with patch("app.db.repository.get_async_supabase_client", return_value=client):
+        context = await crud_chat.get_turn_context("u1", "a1", "s1", message)
+
+    client.rpc.assert_called_once()
+    fn, params = client.rpc.call_args.args
+    assert fn == "agent_turn_context"
+    assert params["p_message"]["content"] == "hi"
+    assert params["p_history_limit"] == 20
+    assert context.agent == {"id": "a1"}
+    assert context.history == MESSAGES
+    assert context.message == {"id": "m3"}
+    client.table.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_turn_context_requires_session_ownership_without_rpc():
+    message = ChatMessageCreate(content="hi", sender_id="u1", sender_type="user")
+    with patch.object(
+        crud_chat, "get_settings", return_value=MagicMock(AGENT_TURN_CONTEXT_RPC=False)
+    ), patch.object(
+        crud_chat, "get_agent_by_id", AsyncMock(return_value={"id": "a1"})
+    ), patch.object(
+        crud_chat, "get_session", AsyncMock(return_value=None)
+    ) as mock_session, patch.object(
+        crud_chat, "get_latest_messages", AsyncMock(return_value=MESSAGES)
+    ), patch.object(
+        crud_chat, "persist_message", new_callable=AsyncMock
+    ) as mock_persist:
+        context = await crud_chat.get_turn_context("u1", "a1", "s1", message)
+
+    mock_session.assert_awaited_once_with("s1", "u1")
+    assert context == crud_chat.TurnContext(None, [], None)
+    mock_persist.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_messages_without_token_counts_omit_the_column():
+    client = MagicMock()
+    insert = client.table.return_value.insert
+    insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[{"id": M1}]))
+    message = ChatMessageCreate(content="hi", sender_id="u1", sender_type="user")
+    with patch("app.db.repository.get_async_supabase_client", return_value=client):
+        await crud_chat.save_message("s1", message)
+    row = insert.call_args.args[0]
+    assert "token_counts" not in row
+    assert row["chat_session_id"] == "s1"
+
+
+@pytest.mark.asyncio
+async def test_turn_context_racing_an_agent_update_is_not_cached():
+    key = ("u1", "a1")
+    crud_chat.agent_cache.invalidate(key)
+
+    async def racing_rpc():
+        # update_agent invalidates while the RPC is in flight
+        crud_chat.agent_cache.invalidate(key)
+        return MagicMock(data={"agent": {"id": "a1"}, "history": [], "message": None})
+
+    client = MagicMock()
+    client.rpc.return_value.execute = AsyncMock(side_effect=racing_rpc)
+    message = ChatMessageCreate(content="hi", sender_id="u1", sender_type="user")
+    with patch("app.db.repository.get_async_supabase_client", return_value=client):
+        context = await crud_chat.get_turn_context("u1", "a1", "s1", message)
+
+    assert context.agent == {"id": "a1"}
+    assert crud_chat.agent_cache.peek(key) is None
@@ -0,0 +1,45 @@
+from unittest.mock import patch
+
+import pytest
+from supabase import AsyncClient
+
+from app.db.instrumentation import query_shape, report_request, track_queries
+from app.db.query_plans import RecordingExecutor
+from app.db.repository import Repository, use_sql_executor
+from app.db.sql_builder import SqlTable
+from app.main import settings
+
+
+def test_shape_ignores_filter_values():
+    client = AsyncClient("http://localhost", "k" * 40)
+    first = client.table("agents").select("*").eq("id", "a1").limit(1)
+    second = client.table("agents").select("*").eq("id", "a2").limit(5)
+    assert query_shape(first) == query_shape(second) == "GET agents?select=*&id=eq&limit"
+
+    sql_first = SqlTable("agents", None).select("*").eq("id", "a1")
+    sql_second = SqlTable("agents", None).select("*").eq("id", "a2")
+    assert query_shape(sql_first) == query_shape(sql_second)
+
+
+@pytest.mark.asyncio
+async def test_repeated_shapes_are_reported():
+    repo = Repository("plugin_configurations")
+    with use_sql_executor(RecordingExecutor()), track_queries() as log:
+        for config_id in ("c1", "c2", "c3"):
+            await repo.execute(repo.query().select("*").eq("id", config_id))
+        await repo.execute(repo.query().select("*").eq("user_id", "u1"))
+
+    assert log.count == 4
+    assert [r.table for r in log.records] == ["plugin_configurations"] * 4
+    with patch("app.db.instrumentation.logger") as mock_logger:
+        repeated = report_request(log, "POST /run", repeat_threshold=3)
+    assert list(repeated.values()) == [3]
+    mock_logger.warning.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_debug_headers_report_query_count(client, monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_DEBUG_HEADERS", True)
+    response = await client.get("/health")
+    assert response.headers["X-DB-Queries"] == "0"
+    assert response.headers["Server-Timing"].startswith("db;dur=")
@@ -0,0 +1,44 @@
+import pytest
+
+from app.db.crud import crud_chat
+from app.db.migrations import list_migrations
+from app.db.query_plans import capture_queries, find_seq_scans
+from tools.check_query_plans import crud_probes
+
+
+def test_find_seq_scans_walks_nested_plans():
+    plan = [
+        {
+            "Plan": {
+                "Node Type": "Limit",
+                "Plans": [
+                    {"Node Type": "Index Scan", "Relation Name": "chat_messages"},
+                    {"Node Type": "Seq Scan", "Relation Name": "agents"},
+                ],
+            }
+        }
+    ]
+    assert find_seq_scans(plan) == ["agents"]
+
+
+@pytest.mark.asyncio
+async def test_capture_records_statement_without_a_database():
+    queries = await capture_queries(
+        [("latest", lambda: crud_chat.get_latest_messages("s1", limit=5))]
+    )
+    assert len(queries) == 1
+    assert queries[0].sql.startswith('SELECT * FROM "chat_messages"')
+    assert queries[0].args == ["s1"]
+
+
+@pytest.mark.asyncio
+async def test_every_probe_issues_sql():
+    for label, probe in crud_probes():
+        queries = await capture_queries([(label, probe)])
+        assert queries, f"{label} issued no statement"
+
+
+def test_migrations_are_ordered_and_versioned():
+    versions = [m.version for m in list_migrations()]
+    assert versions == sorted(versions)
+    assert len(set(versions)) == len(versions) >= 2
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.db.crud.crud_agent import get_agent_by_id
+from app.db.repository import Repository
+from app.models.bulk import BulkResponse
+
+QUERY_DELAY = 0.2
+
+
+def slow_async_client():
+    """Build a mock async client whose queries take QUERY_DELAY seconds."""
+
+    async def slow_execute():
+        await asyncio.sleep(QUERY_DELAY)
+        return MagicMock(data={"id": "agent-1", "user_id": "user-1"})
+
+    client = MagicMock()
+    query = client.table.return_value.select.return_value.eq.return_value
+    query.eq.return_value.single.return_value.execute = slow_execute
+    return client
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_overlap():
+    with patch(
+        "app.db.repository.get_async_supabase_client",
+        return_value=slow_async_client(),
+    ):
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(get_agent_by_id(f"agent-{i}", "user-overlap") for i in range(5))
+        )
+        elapsed = time.perf_counter() - start
+    assert all(r["id"] == "agent-1" for r in results)
+    # Serialised queries would take 5 * QUERY_DELAY
+    assert elapsed < QUERY_DELAY * 2
+
+
+@pytest.mark.asyncio
+async def test_repository_does_not_block_event_loop():
+    repo = Repository("agents")
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    with patch(
+        "app.db.repository.get_async_supabase_client",
+        return_value=slow_async_client(),
+    ):
+        task = asyncio.create_task(ticker())
+        query = repo.query().select("*").eq("id", "a").eq("user_id", "u").single()
+        await repo.execute(query)
+        task.cancel()
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_update_many_updates_only_changed_columns_of_owned_rows():
+    stored = {"a1": {"id": "a1", "user_id": "u1", "name": "old", "model": "m"}}
+    queries = []
+
+    def update(data):
+        query = MagicMock()
+        query.eq.return_value = query
+
+        async def execute():
+            row = stored.get(query.eq.call_args_list[0].args[1])
+            return MagicMock(data=[{**row, **data}] if row else [])
+
+        query.execute = execute
+        queries.append(query)
+        return query
+
+    client = MagicMock()
+    table = client.table.return_value
+    table.update.side_effect = update
+    with patch(
+        "app.db.repository.get_async_supabase_client", return_value=client
+    ):
+        repo = Repository("agents")
+        updates = {"a1": {"name": "new"}, "a2": {"name": "other"}}
+        updated = await repo.update_many("u1", updates)
+    table.upsert.assert_not_called()
+    table.select.assert_not_called()
+    assert [c.args[0] for c in table.update.call_args_list] == [
+        {"name": "new"},
+        {"name": "other"},
+    ]
+    assert [[c.args for c in q.eq.call_args_list] for q in queries] == [
+        [("id", "a1"), ("user_id", "u1")],
+        [("id", "a2"), ("user_id", "u1")],
+    ]
+    assert updated == [{"id": "a1", "user_id": "u1", "name": "new", "model": "m"}]
+    result = BulkResponse.from_ids(["a1", "a2"], updated, "updated")
+    assert [r.status for r in result.results] == ["updated", "not_found"]
+    assert (result.succeeded, result.failed) == (1, 1)
@@ -0,0 +1,61 @@
+"""Create payloads checked against the NOT NULL columns of the migrated schema."""
+
+import re
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.db.crud import crud_agent, crud_chat
+from app.db.migrations import list_migrations
+from app.models.agent import AgentCreate
+from app.models.chat import ChatSessionCreate
+
+
+def not_null_columns(table: str) -> set[str]:
+    """Columns declared NOT NULL for `table` across the migrations."""
+    columns = set()
+    for migration in list_migrations():
+        sql = migration.path.read_text()
+        for block in re.findall(
+            rf"create table if not exists {table} \((.*?)\n\);", sql, re.S
+        ):
+            for line in block.splitlines():
+                match = re.match(r"\s+(\w+) .*\bnot null\b", line)
+                if match:
+                    columns.add(match.group(1))
+    return columns
+
+
+@pytest.fixture
+def inserted():
+    client = MagicMock()
+    insert = client.table.return_value.insert
+    insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[{"id": "x"}]))
+    with patch("app.db.repository.get_async_supabase_client", return_value=client):
+        yield insert
+
+
+def _rows(insert) -> list[dict]:
+    payload = insert.call_args.args[0]
+    return payload if isinstance(payload, list) else [payload]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "table, create",
+    [
+        ("agents", lambda: crud_agent.create_agent("u1", AgentCreate(name="a"))),
+        (
+            "agents",
+            lambda: crud_agent.create_agents_bulk("u1", [AgentCreate(name="a")]),
+        ),
+        ("chat_sessions", lambda: crud_chat.create_session("u1", ChatSessionCreate())),
+    ],
+)
+async def test_plain_creates_send_no_null_for_not_null_columns(inserted, table, create):
+    required = not_null_columns(table)
+    assert {"tags", "participants"} & required
+    await create()
+    for row in _rows(inserted):
+        nulls = sorted(c for c in required if c in row and row[c] is None)
+        assert not nulls, f"{table} insert sends NULL for {nulls}"
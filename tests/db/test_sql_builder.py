@@ -0,0 +1,142 @@
+import json
+import re
+import sqlite3
+from unittest.mock import MagicMock, patch
+
+import pytest
+from postgrest import APIError
+
+from app.db.postgres import _iso_timestamp
+from app.db.repository import Repository
+from app.db.sql_builder import SqlRpc, SqlTable, quote_identifier
+
+
+class SqliteExecutor:
+    """Stand-in for the asyncpg pool: runs compiled statements on sqlite."""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(
+            "CREATE TABLE items (id TEXT PRIMARY KEY, user_id TEXT, name TEXT,"
+            " config TEXT, timestamp TEXT)"
+        )
+        self.statements = []
+
+    async def fetch(self, sql, args):
+        self.statements.append(sql)
+        sql = re.sub(r"\$(\d+)", r"?\1", sql)
+        args = [json.dumps(a) if isinstance(a, (dict, list)) else a for a in args]
+        rows = self.conn.execute(sql, args).fetchall()
+        return [dict(row) for row in rows]
+
+
+@pytest.fixture
+def executor():
+    executor = SqliteExecutor()
+    settings = MagicMock(DB_BACKEND="postgres")
+    with patch("app.db.repository.get_settings", return_value=settings), patch(
+        "app.db.repository.get_sql_executor", return_value=executor
+    ):
+        yield executor
+
+
+def _row(idx, user_id="u1"):
+    return {
+        "id": f"i{idx}",
+        "user_id": user_id,
+        "name": f"item {idx}",
+        "config": None,
+        "timestamp": f"2024-01-01T00:00:0{idx}",
+    }
+
+
+def test_update_renumbers_filter_placeholders():
+    query = SqlTable("items", None).update({"name": "x"}).eq("id", "i1").in_(
+        "user_id", ["u1", "u2"]
+    )
+    sql, args = query.compile()
+    assert sql == (
+        'UPDATE "items" SET "name" = $1 WHERE "id" = $2 AND "user_id" IN ($3, $4)'
+        " RETURNING *"
+    )
+    assert args == ["x", "i1", "u1", "u2"]
+
+
+def test_identifiers_are_validated():
+    with pytest.raises(ValueError):
+        quote_identifier('name"; DROP TABLE items; --')
+
+
+@pytest.mark.asyncio
+async def test_repository_round_trip_on_sql_backend(executor):
+    repo = Repository("items")
+    stored = await repo.insert_many([_row(1), _row(2), _row(3, user_id="u2")])
+    assert [r["id"] for r in stored] == ["i1", "i2", "i3"]
+
+    res = await repo.execute(repo.query().select("id,name").eq("id", "i2").single())
+    assert res.data == {"id": "i2", "name": "item 2"}
+
+    updated = await repo.update_many("u1", {"i1": {"name": "one"}, "i3": {"name": "x"}})
+    assert [(r["id"], r["name"]) for r in updated] == [("i1", "one")]
+    assert all(
+        sql.startswith('UPDATE "items"') for sql in executor.statements[-2:]
+    )
+
+    deleted = await repo.delete_many("u1", ["i2", "i3"])
+    assert [r["id"] for r in deleted] == ["i2"]
+
+
+@pytest.mark.asyncio
+async def test_single_raises_unless_exactly_one_row(executor):
+    repo = Repository("items")
+    await repo.insert_many([_row(1), _row(2)])
+
+    with pytest.raises(APIError) as missing:
+        await repo.execute(repo.query().select("id").eq("id", "nope").single())
+    assert missing.value.code == "PGRST116"
+    with pytest.raises(APIError):
+        await repo.execute(repo.query().select("id").eq("user_id", "u1").single())
+
+    res = await repo.execute(repo.query().select("id").eq("id", "nope").maybe_single())
+    assert res.data is None
+    with pytest.raises(APIError):
+        await repo.execute(
+            repo.query().select("id").eq("user_id", "u1").maybe_single()
+        )
+
+
+def test_timestamps_decode_as_iso_8601():
+    assert _iso_timestamp("2024-01-01 00:00:00+00") == "2024-01-01T00:00:00+00:00"
+    assert (
+        _iso_timestamp("2024-01-01 12:30:00.25+05:30")
+        == "2024-01-01T12:30:00.25+05:30"
+    )
+    assert _iso_timestamp("2024-01-01 00:00:00") == "2024-01-01T00:00:00"
+    assert _iso_timestamp("infinity") == "infinity"
+
+
+@pytest.mark.asyncio
+async def test_keyset_logic_filter(executor):
+    repo = Repository("items")
+    await repo.insert_many([_row(1), _row(2), _row(3)])
+    ts = "2024-01-01T00:00:02"
+    query = (
+        repo.query()
+        .select("id")
+        .or_(f'timestamp.gt."{ts}",and(timestamp.eq."{ts}",id.gt."i1")')
+        .order("timestamp")
+        .order("id")
+        .limit(10)
+    )
+    res = await repo.execute(query)
+    assert [r["id"] for r in res.data] == ["i2", "i3"]
+
+
+def test_rpc_compiles_to_named_function_call():
+    rpc = SqlRpc("agent_turn_context", {"p_user_id": "u1", "p_limit": 5}, None)
+    sql, args = rpc.compile()
+    assert sql == (
+        'SELECT "agent_turn_context"("p_user_id" => $1, "p_limit" => $2) AS "result"'
+    )
+    assert args == ["u1", 5]
@@ -0,0 +1,46 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.db.supabase_client import SupabaseClientRegistry
+
+
+@patch("app.db.supabase_client.create_client")
+def test_registry_reuses_single_client(mock_create_client):
+    mock_create_client.return_value = MagicMock()
+    registry = SupabaseClientRegistry()
+    first = registry.get_client()
+    second = registry.get_client()
+    assert first is second
+    assert mock_create_client.call_count == 1
+    options = mock_create_client.call_args.kwargs["options"]
+    assert options.httpx_client is not None
+
+
+@pytest.mark.asyncio
+@patch("app.db.supabase_client.create_client")
+async def test_registry_close_releases_transport(mock_create_client):
+    mock_create_client.return_value = MagicMock()
+    registry = SupabaseClientRegistry()
+    registry.get_client()
+    http_client = registry._http_client
+    await registry.close()
+    assert http_client.is_closed
+    registry.get_client()
+    assert mock_create_client.call_count == 2
+
+
+@pytest.mark.asyncio
+@patch("app.db.supabase_client.AsyncClient")
+async def test_health_check_uses_the_async_transport(mock_async_client):
+    registry = SupabaseClientRegistry()
+    registry.get_async_client()
+    with patch.object(
+        registry._async_http_client,
+        "get",
+        AsyncMock(return_value=MagicMock(status_code=200)),
+    ) as mock_get:
+        assert await registry.health_check() is True
+    mock_get.assert_awaited_once()
+    assert registry._http_client is None
+    await registry.close()
@@ -0,0 +1,90 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.db.write_behind import CoalescingBuffer, WriteBehindBuffer
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submits_are_group_committed_in_order():
+    flush = AsyncMock(
+        side_effect=lambda rows: [dict(r, id=i) for i, r in enumerate(rows)]
+    )
+    buffer = WriteBehindBuffer("test", flush, flush_interval=0.01)
+    futures = await asyncio.gather(*(buffer.submit({"n": n}) for n in range(5)))
+    results = await asyncio.gather(*futures)
+    await buffer.close()
+    assert flush.await_count == 1
+    assert [r["n"] for r in flush.await_args.args[0]] == [0, 1, 2, 3, 4]
+    assert [r["id"] for r in results] == [0, 1, 2, 3, 4]
+    assert buffer.stats()["flushed"] == 5
+
+
+@pytest.mark.asyncio
+async def test_batches_respect_max_batch_size():
+    flush = AsyncMock(return_value=[])
+    buffer = WriteBehindBuffer("test", flush, max_batch_size=2, flush_interval=0.01)
+    futures = [await buffer.submit({"n": n}) for n in range(5)]
+    await asyncio.gather(*futures)
+    await buffer.close()
+    assert [len(call.args[0]) for call in flush.await_args_list] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_flush_failure_is_surfaced_on_futures():
+    flush = AsyncMock(side_effect=RuntimeError("db down"))
+    buffer = WriteBehindBuffer("test", flush, flush_interval=0.01)
+    future = await buffer.submit({"n": 1})
+    with pytest.raises(RuntimeError):
+        await future
+    await buffer.close()
+    assert buffer.stats()["failed"] == 1
+    assert buffer.stats()["last_error"] == "db down"
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_pending_rows():
+    flush = AsyncMock(return_value=[])
+    buffer = WriteBehindBuffer("test", flush, flush_interval=10)
+    future = await buffer.submit({"n": 1})
+    await buffer.close()
+    assert future.done()
+    flush.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_coalescing_buffer_keeps_latest_value_per_key():
+    flush = AsyncMock()
+    buffer = CoalescingBuffer("test", flush, flush_interval=0.01)
+    for n in range(3):
+        buffer.record("a", n)
+    buffer.record("b", 9)
+    await asyncio.sleep(0.03)
+    flush.assert_awaited_once_with({"a": 2, "b": 9})
+    buffer.record("a", 3)
+    await buffer.close()
+    assert flush.await_args.args[0] == {"a": 3}
+    assert buffer.stats()["flushed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_coalescing_buffer_is_bounded():
+    release = asyncio.Event()
+
+    async def slow_flush(batch):
+        await release.wait()
+
+    buffer = CoalescingBuffer("test", slow_flush, flush_interval=60, max_pending=2)
+    buffer.record("a", 1)
+    buffer.record("b", 1)
+    await asyncio.sleep(0.01)
+    assert buffer.stats()["batches"] == 1
+    buffer.record("c", 1)
+    buffer.record("d", 1)
+    buffer.record("e", 1)
+    buffer.record("c", 2)
+    assert buffer.stats()["dropped"] == 1
+    release.set()
+    await buffer.close()
+    assert buffer.stats()["flushed"] == 4
@@ -0,0 +1,106 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.db.crud.crud_chat import TurnContext
+from app.services.agent_runner import prepare_turn, run_agent, stream_agent_reply
+
+AGENT = {
+    "id": "a1",
+    "user_id": "u1",
+    "name": "Helper",
+    "provider": "openai",
+    "model": "gpt-4o",
+    "created_at": None,
+    "updated_at": None,
+}
+HISTORY = [
+    {"content": "hi", "sender_type": "user"},
+    {"content": "hello!", "sender_type": "agent"},
+]
+
+
+@pytest.mark.asyncio
+@patch("app.services.agent_runner.persist_message", new_callable=AsyncMock)
+@patch("app.services.agent_runner.call_litellm_completion", new_callable=AsyncMock)
+@patch("app.services.agent_runner.get_turn_context", new_callable=AsyncMock)
+async def test_run_agent_loads_context_in_one_call(
+    mock_context, mock_completion, mock_persist
+):
+    mock_context.return_value = TurnContext(dict(AGENT), HISTORY, None)
+    mock_completion.return_value = {"choices": [{"message": {"content": "sure"}}]}
+
+    result = await run_agent("u1", "a1", "s1", "help me")
+
+    assert result.response == "sure"
+    mock_context.assert_awaited_once()
+    stored = mock_context.call_args.args[3]
+    assert (stored.content, stored.sender_type) == ("help me", "user")
+    messages = mock_completion.call_args.args[3]
+    assert messages == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello!"},
+        {"role": "user", "content": "help me"},
+    ]
+    mock_persist.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("app.services.agent_runner.get_turn_context", new_callable=AsyncMock)
+async def test_run_agent_rejects_unknown_agent(mock_context):
+    mock_context.return_value = TurnContext(None, [], None)
+    with pytest.raises(Exception, match="Agent not found"):
+        await run_agent("u1", "missing", "s1", "hello")
+
+
+def _stream(*texts):
+    async def stream(*args, **kwargs):
+        for text in texts:
+            yield {"choices": [{"delta": {"content": text}}]}
+
+    return stream
+
+
+@pytest.mark.asyncio
+@patch("app.services.agent_runner.persist_message", new_callable=AsyncMock)
+@patch("app.services.agent_runner.get_turn_context", new_callable=AsyncMock)
+async def test_stream_agent_reply_yields_tokens_and_saves_once(
+    mock_context, mock_persist
+):
+    mock_context.return_value = TurnContext(dict(AGENT), HISTORY, None)
+    turn = await prepare_turn("u1", "a1", "s1", "help me")
+
+    with patch(
+        "app.services.agent_runner.call_litellm_stream", _stream("su", "re", "!")
+    ):
+        texts = [text async for text in stream_agent_reply(turn)]
+
+    assert texts == ["su", "re", "!"]
+    mock_persist.assert_awaited_once()
+    saved = mock_persist.call_args.args[1]
+    assert (saved.content, saved.sender_type, saved.metadata) == (
+        "sure!",
+        "agent",
+        None,
+    )
+
+
+@pytest.mark.asyncio
+@patch("app.services.agent_runner.persist_message", new_callable=AsyncMock)
+@patch("app.services.agent_runner.get_turn_context", new_callable=AsyncMock)
+async def test_stream_agent_reply_saves_partial_reply_when_dropped(
+    mock_context, mock_persist
+):
+    mock_context.return_value = TurnContext(dict(AGENT), HISTORY, None)
+    turn = await prepare_turn("u1", "a1", "s1", "help me")
+
+    with patch(
+        "app.services.agent_runner.call_litellm_stream", _stream("par", "tial", "...")
+    ):
+        stream = stream_agent_reply(turn)
+        assert await stream.__anext__() == "par"
+        assert await stream.__anext__() == "tial"
+        await stream.aclose()
+
+    saved = mock_persist.call_args.args[1]
+    assert (saved.content, saved.metadata) == ("partial", {"partial": True})
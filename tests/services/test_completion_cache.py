@@ -0,0 +1,87 @@
+from unittest.mock import AsyncMock, patch
+
+import litellm
+import pytest
+
+from app.services.completion_cache import (
+    CompletionCache,
+    DiskTier,
+    MemoryTier,
+    completion_cache_key,
+)
+from app.services.litellm_service import call_litellm_completion
+
+MESSAGES = [{"role": "user", "content": "What are your opening hours?"}]
+
+
+def test_key_is_canonical_and_ignores_transport_options():
+    first = completion_cache_key(
+        "u1",
+        "openai",
+        "gpt-4o",
+        MESSAGES,
+        {"temperature": 0, "max_tokens": 5, "timeout": 1},
+    )
+    second = completion_cache_key(
+        "u1", "OpenAI", "gpt-4o", MESSAGES, {"max_tokens": 5, "temperature": 0}
+    )
+    assert first == second
+    assert first != completion_cache_key(
+        "u1", "openai", "gpt-4o", MESSAGES, {"temperature": 1}
+    )
+
+
+def test_key_is_scoped_per_user():
+    assert completion_cache_key("u1", "openai", "gpt-4o", MESSAGES) != (
+        completion_cache_key("u2", "openai", "gpt-4o", MESSAGES)
+    )
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_evicts_to_byte_budget():
+    tier = MemoryTier(max_bytes=10)
+    await tier.set("a", b"12345", ttl=60)
+    await tier.set("b", b"12345", ttl=60)
+    await tier.get("a")
+    await tier.set("c", b"12345", ttl=60)
+    assert await tier.get("b") is None
+    assert await tier.get("a") == b"12345"
+    assert tier.bytes == 10
+    assert tier.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_a_new_memory_tier(tmp_path):
+    first = CompletionCache(MemoryTier(1024), DiskTier(str(tmp_path)))
+    await first.set("k", {"answer": 42})
+    second = CompletionCache(MemoryTier(1024), DiskTier(str(tmp_path)))
+    assert await second.get("k") == {"answer": 42}
+    assert second.disk_hits == 1
+    await second.set("expired", {"answer": 0}, ttl=-1)
+    assert await CompletionCache(MemoryTier(1024), DiskTier(str(tmp_path))).get(
+        "expired"
+    ) is None
+
+
+@pytest.mark.asyncio
+@patch("app.services.litellm_service.get_api_key", new_callable=AsyncMock)
+@patch("app.services.litellm_service.litellm.acompletion", new_callable=AsyncMock)
+async def test_completion_served_from_cache_when_opted_in(mock_acompletion, mock_key):
+    mock_key.return_value = "sk-test"
+    mock_acompletion.return_value = litellm.ModelResponse(
+        choices=[{"message": {"role": "assistant", "content": "9 to 5"}}]
+    )
+    options = {"temperature": 0, "cache": True}
+    messages = [{"role": "user", "content": "cache-test hours?"}]
+
+    first = await call_litellm_completion("u1", "openai", "gpt-4o", messages, options)
+    second = await call_litellm_completion("u1", "openai", "gpt-4o", messages, options)
+    await call_litellm_completion(
+        "u1", "openai", "gpt-4o", messages, options, cache_bypass=True
+    )
+    await call_litellm_completion("u1", "openai", "gpt-4o", messages, {"temperature": 0})
+
+    assert second["choices"][0]["message"]["content"] == "9 to 5"
+    assert second.id == first.id
+    assert mock_acompletion.await_count == 3
+    assert "cache" not in mock_acompletion.call_args.kwargs
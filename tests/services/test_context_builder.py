@@ -0,0 +1,113 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.db.crud.crud_agent import agent_cache
+from app.db.crud.crud_chat import TurnContext
+from app.services.agent_runner import prepare_turn, run_agent
+from app.services.context_builder import (
+    MESSAGE_OVERHEAD_TOKENS,
+    build_context,
+    context_window,
+    count_tokens,
+    message_tokens,
+    token_counts_for,
+    tokenizer_for,
+)
+
+
+def _msg(idx, content, sender_type="user", tokens=None):
+    message = {"id": f"m{idx}", "content": content, "sender_type": sender_type}
+    if tokens is not None:
+        message["token_counts"] = {"o200k_base": tokens}
+    return message
+
+
+def test_tokenizer_and_window_are_per_model():
+    assert tokenizer_for("gpt-4o").name == "o200k_base"
+    assert tokenizer_for("openai/gpt-4o") is tokenizer_for("gpt-4o")
+    assert tokenizer_for("some-local-model").name == "cl100k_base"
+    assert context_window("gpt-4o") == 128000
+    assert context_window("some-local-model") == 8192
+    assert count_tokens("gpt-4o", "hello world") == 2
+    assert token_counts_for("gpt-4o", "hello world") == {"o200k_base": 2}
+
+
+def test_stored_counts_are_used_instead_of_tokenizing():
+    assert message_tokens("gpt-4o", _msg(1, "hello world", tokens=50)) == 50
+    # A count stored for another encoding does not apply to this model
+    assert message_tokens("some-local-model", _msg(1, "hello world", tokens=50)) == 2
+
+
+def test_newest_turns_are_packed_into_the_budget():
+    history = [
+        _msg(1, "oldest", tokens=100),
+        _msg(2, "older", "agent", tokens=10),
+        _msg(3, "old", tokens=300),
+        _msg(4, "recent", "agent", tokens=20),
+        _msg(5, "newest", tokens=30),
+    ]
+    packed = build_context("gpt-4o", history, "question", max_tokens=100)
+
+    assert [m["id"] for m in packed.history] == ["m4", "m5"]
+    assert packed.dropped == 3
+    assert packed.messages == [
+        {"role": "assistant", "content": "recent"},
+        {"role": "user", "content": "newest"},
+        {"role": "user", "content": "question"},
+    ]
+    assert packed.tokens <= packed.budget == 100
+    assert packed.tokens >= 50 + 3 * MESSAGE_OVERHEAD_TOKENS
+
+
+def test_reserved_tokens_shrink_the_window():
+    history = [{"id": "m1", "content": "a", "token_counts": {"cl100k_base": 7000}}]
+    assert build_context("some-local-model", history, "q").history == history
+    packed = build_context("some-local-model", history, "q", reserved_tokens=2000)
+    assert packed.history == []
+    assert packed.budget == 8192 - 2000
+
+
+@pytest.mark.asyncio
+@patch("app.services.agent_runner.persist_message", new_callable=AsyncMock)
+@patch("app.services.agent_runner.call_litellm_completion", new_callable=AsyncMock)
+@patch("app.services.agent_runner.get_turn_context", new_callable=AsyncMock)
+async def test_run_agent_packs_history_and_stores_reply_tokens(
+    mock_context, mock_completion, mock_persist
+):
+    agent = {
+        "id": "a1",
+        "user_id": "u1",
+        "name": "Helper",
+        "provider": "openai",
+        "model": "gpt-4o",
+        "config": {"context_tokens": 60},
+        "created_at": None,
+        "updated_at": None,
+    }
+    history = [_msg(1, "long ago", tokens=1000), _msg(2, "just now", tokens=5)]
+    mock_context.return_value = TurnContext(agent, history, None)
+    mock_completion.return_value = {"choices": [{"message": {"content": "ok"}}]}
+
+    await run_agent("u1", "a1", "s1", "and now?")
+
+    assert mock_completion.call_args.args[3] == [
+        {"role": "user", "content": "just now"},
+        {"role": "user", "content": "and now?"},
+    ]
+    reply = mock_persist.call_args.args[1]
+    assert reply.token_counts == {"o200k_base": 1}
+
+
+@pytest.mark.asyncio
+@patch("app.services.agent_runner.get_turn_context", new_callable=AsyncMock)
+async def test_uncached_agent_turn_stores_counts_for_any_model(mock_context):
+    agent_cache.invalidate(("u1", "a1"))
+    mock_context.return_value = TurnContext(
+        {"id": "a1", "provider": "openai", "model": "gpt-4o"}, [], None
+    )
+    await prepare_turn("u1", "a1", "s1", "hello world")
+    stored = mock_context.call_args.args[3].token_counts
+    assert stored == {"o200k_base": 2, "cl100k_base": 2}
+    for model in ("gpt-4o", "gpt-4-turbo", "some-local-model"):
+        assert tokenizer_for(model).name in stored
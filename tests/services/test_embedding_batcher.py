@@ -0,0 +1,98 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services import embedding_batcher
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+def _fake_response(user_id, service, model, texts, options=None):
+    return {
+        "data": [
+            {"index": idx, "embedding": [float(len(text)), float(idx)]}
+            for idx, text in enumerate(texts)
+        ]
+    }
+
+
+@pytest.fixture
+def mock_embedding():
+    with patch(
+        "app.services.embedding_batcher.call_litellm_embedding", new_callable=AsyncMock
+    ) as mock:
+        mock.side_effect = _fake_response
+        yield mock
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_deduplicated_call(mock_embedding):
+    batcher = EmbeddingBatcher(window=0.01)
+    first, second = await asyncio.gather(
+        batcher.embed("u1", "openai", "emb", ["a", "bb", "a"]),
+        batcher.embed("u1", "openai", "emb", ["bb", "ccc"]),
+    )
+
+    mock_embedding.assert_awaited_once()
+    assert mock_embedding.call_args.args[3] == ["a", "bb", "ccc"]
+    assert [v[0] for v in first] == [1.0, 2.0, 1.0]
+    assert [v[0] for v in second] == [2.0, 3.0]
+    assert batcher.stats()["deduplicated"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_texts_skip_the_provider(mock_embedding):
+    batcher = EmbeddingBatcher(window=0)
+    await batcher.embed("u1", "openai", "emb", ["a", "bb"])
+    vectors = await batcher.embed("u2", "openai", "emb", ["bb", "a"])
+    assert mock_embedding.await_count == 1
+    assert [v[0] for v in vectors] == [2.0, 1.0]
+
+
+@pytest.mark.asyncio
+async def test_users_and_batch_size_split_provider_calls(mock_embedding):
+    batcher = EmbeddingBatcher(window=0.01, max_batch_size=2)
+    await asyncio.gather(
+        batcher.embed("u1", "openai", "emb", ["a", "b", "c"]),
+        batcher.embed("u2", "openai", "emb", ["x"]),
+    )
+    batches = sorted(call.args[3] for call in mock_embedding.await_args_list)
+    assert batches == [["a", "b"], ["c"], ["x"]]
+    assert {call.args[0] for call in mock_embedding.await_args_list} == {"u1", "u2"}
+
+
+@pytest.mark.asyncio
+async def test_provider_errors_reach_every_caller(mock_embedding):
+    mock_embedding.side_effect = Exception("rate limited")
+    batcher = EmbeddingBatcher(window=0.01)
+    results = await asyncio.gather(
+        batcher.embed("u1", "openai", "emb", ["a"]),
+        batcher.embed("u1", "openai", "emb", ["a", "b"]),
+        return_exceptions=True,
+    )
+    assert all(str(r) == "rate limited" for r in results)
+
+
+@pytest.mark.asyncio
+async def test_response_keeps_provider_model_and_per_request_usage(mock_embedding):
+    def provider_response(user_id, service, model, texts, options=None):
+        response = _fake_response(user_id, service, model, texts)
+        response["model"] = "text-embedding-3-small-v2"
+        response["usage"] = {"prompt_tokens": 10 * len(texts), "total_tokens": 0}
+        return response
+
+    mock_embedding.side_effect = provider_response
+    batcher = EmbeddingBatcher(window=0.01)
+    with patch.object(embedding_batcher, "embedding_batcher", batcher):
+        first, second = await asyncio.gather(
+            embedding_batcher.embed_texts("u1", "openai", "emb", ["a", "b"]),
+            embedding_batcher.embed_texts("u1", "openai", "emb", ["b"]),
+        )
+        cached = await embedding_batcher.embed_texts("u1", "openai", "emb", ["a"])
+
+    mock_embedding.assert_awaited_once()
+    assert first["model"] == second["model"] == "text-embedding-3-small-v2"
+    assert first["usage"] == {"prompt_tokens": 20, "total_tokens": 20}
+    assert second["usage"] == {"prompt_tokens": 10, "total_tokens": 10}
+    assert cached["usage"]["prompt_tokens"] == 10
+    assert [item["index"] for item in first["data"]] == [0, 1]
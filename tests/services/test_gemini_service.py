@@ -0,0 +1,92 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+import pytest
+
+from app.services import gemini_service
+from app.services.gemini_service import (
+    gemini_clients,
+    gemini_generate_text,
+    gemini_request,
+    gemini_stream_text,
+)
+
+
+def _response(*texts, generated=None):
+    return glm.GenerateContentResponse(
+        candidates=[{"content": {"parts": [{"text": text} for text in texts]}}]
+        if texts
+        else [],
+        usage_metadata={"candidates_token_count": generated or 0},
+    )
+
+
+def test_request_carries_model_and_options():
+    request = gemini_request(
+        "gemini-pro",
+        "hi",
+        {
+            "generation_config": {"temperature": 0.2},
+            "safety_settings": {"harassment": "block_none"},
+        },
+    )
+    assert request.model == "models/gemini-pro"
+    assert request.contents[0].parts[0].text == "hi"
+    assert request.generation_config.temperature == pytest.approx(0.2)
+    assert len(request.safety_settings) == 1
+    assert gemini_request("models/gemini-pro", "hi").model == "models/gemini-pro"
+
+
+@pytest.mark.asyncio
+@patch.object(gemini_service, "get_api_key", new_callable=AsyncMock)
+async def test_concurrent_users_use_their_own_clients(mock_key):
+    async def key_for(user_id, service):
+        return f"g-{user_id}"
+
+    mock_key.side_effect = key_for
+    seen = {}
+
+    async def fake_generate(self, request):
+        await asyncio.sleep(0.01)
+        prompt = request.contents[0].parts[0].text
+        seen[prompt] = self
+        return _response("re: ", prompt, generated=3)
+
+    client_class = glm.GenerativeServiceAsyncClient
+    with (
+        patch.object(genai, "configure") as mock_configure,
+        patch.object(client_class, "generate_content", fake_generate),
+    ):
+        replies = await asyncio.gather(
+            gemini_generate_text("u1", "from u1"),
+            gemini_generate_text("u2", "from u2"),
+        )
+
+    mock_configure.assert_not_called()
+    assert replies == ["re: from u1", "re: from u2"]
+    assert seen["from u1"] is gemini_clients.get("gemini", "g-u1")
+    assert seen["from u2"] is gemini_clients.get("gemini", "g-u2")
+
+
+@pytest.mark.asyncio
+@patch.object(gemini_service, "get_api_key", new_callable=AsyncMock)
+async def test_stream_yields_text_chunks(mock_key):
+    mock_key.return_value = "g-stream"
+
+    async def chunks():
+        # The last chunk only carries usage
+        for texts in (("Hel",), ("lo",), ()):
+            yield _response(*texts)
+
+    async def fake_stream(self, request):
+        assert request.model == "models/gemini-pro"
+        return chunks()
+
+    with patch.object(
+        glm.GenerativeServiceAsyncClient, "stream_generate_content", fake_stream
+    ):
+        texts = [text async for text in gemini_stream_text("u1", "hi")]
+
+    assert texts == ["Hel", "lo"]
@@ -0,0 +1,136 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.hedging import Hedger
+from app.services.litellm_service import call_litellm_completion
+
+
+def _call(result, delay=0.0, error=None, log=None):
+    async def run():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(f"cancelled {result}")
+            raise
+        if error is not None:
+            raise error
+        return result
+
+    return run
+
+
+def test_delay_tracks_latency_percentile():
+    hedger = Hedger(percentile=90, default_delay=2.0, min_delay=0.05, min_samples=10)
+    assert hedger.delay_for("k") == 2.0
+    for i in range(1, 11):
+        hedger.observe("k", i / 10)
+    assert hedger.delay_for("k") == 0.9
+    for _ in range(10):
+        hedger.observe("fast", 0.001)
+    assert hedger.delay_for("fast") == 0.05
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_cancelled():
+    log = []
+    hedger = Hedger(default_delay=0.01, budget_ratio=1.0)
+    result = await hedger.run(
+        "k", _call("primary", delay=1, log=log), _call("backup", delay=0.01)
+    )
+    assert result == "backup"
+    await asyncio.sleep(0)
+    assert log == ["cancelled primary"]
+    assert (hedger.hedged, hedger.backup_wins) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged():
+    backup = AsyncMock()
+    hedger = Hedger(default_delay=0.5, budget_ratio=1.0)
+    assert await hedger.run("k", _call("primary"), backup) == "primary"
+    backup.assert_not_called()
+    assert hedger.hedged == 0
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget_caps_backups():
+    hedger = Hedger(default_delay=0.001, budget_ratio=0.5)
+    results = [
+        await hedger.run("k", _call("primary", delay=0.02), _call("backup"))
+        for _ in range(4)
+    ]
+    assert results.count("backup") == 2
+    assert hedger.over_budget == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_to_backup_then_raises():
+    hedger = Hedger(default_delay=0.001, budget_ratio=1.0)
+    result = await hedger.run(
+        "k",
+        _call("primary", delay=0.01, error=RuntimeError("boom")),
+        _call("backup", delay=0.02),
+    )
+    assert result == "backup"
+    with pytest.raises(RuntimeError, match="primary down"):
+        await hedger.run(
+            "k",
+            _call("primary", delay=0.01, error=RuntimeError("primary down")),
+            _call("backup", delay=0.01, error=RuntimeError("backup down")),
+        )
+
+
+@pytest.mark.asyncio
+@patch("app.services.litellm_service.hedger", Hedger(default_delay=0.01))
+@patch("app.services.litellm_service.get_api_key", new_callable=AsyncMock)
+@patch("app.services.litellm_service.litellm.acompletion", new_callable=AsyncMock)
+async def test_completion_hedges_to_alternate_model(mock_acompletion, mock_key):
+    mock_key.return_value = "sk-test"
+
+    async def fake(model, messages, **options):
+        await asyncio.sleep(1 if model == "gpt-4o" else 0)
+        return {"model": model, "options": options}
+
+    mock_acompletion.side_effect = fake
+    response = await call_litellm_completion(
+        "u1",
+        "openai",
+        "gpt-4o",
+        [{"role": "user", "content": "hi"}],
+        {"temperature": 0, "hedge": {"model": "gpt-4o-mini"}},
+    )
+    assert response["model"] == "gpt-4o-mini"
+    assert response["options"]["temperature"] == 0
+    assert response["options"]["api_key"] == "sk-test"
+
+
+@pytest.mark.asyncio
+@patch("app.services.litellm_service.hedger", Hedger(default_delay=0.01))
+@patch("app.services.litellm_service.get_api_key", new_callable=AsyncMock)
+@patch("app.services.litellm_service.litellm.acompletion", new_callable=AsyncMock)
+async def test_cross_service_hedge_uses_only_backup_credentials(
+    mock_acompletion, mock_key
+):
+    async def key_for(user_id, service):
+        return f"key-{service}"
+
+    async def fake(model, messages, **options):
+        await asyncio.sleep(1 if model == "gpt-4o" else 0)
+        return {"model": model, "options": options}
+
+    mock_key.side_effect = key_for
+    mock_acompletion.side_effect = fake
+    response = await call_litellm_completion(
+        "u1",
+        "openai",
+        "gpt-4o",
+        [{"role": "user", "content": "hi"}],
+        {"hedge": {"service": "anthropic", "model": "claude-3-haiku"}},
+    )
+    assert response["model"] == "claude-3-haiku"
+    assert response["options"]["api_key"] == "key-anthropic"
+    # The primary's pooled OpenAI client must not leak into the backup
+    assert "client" not in response["options"]
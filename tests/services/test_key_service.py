@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import os
+import re
+import sqlite3
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.config import get_settings
+from app.services import key_service
+
+
+class SqliteExecutor:
+    """Stand-in for the asyncpg pool holding a user_api_keys table."""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(
+            "CREATE TABLE user_api_keys (id TEXT DEFAULT (hex(randomblob(8))),"
+            " user_id TEXT, service TEXT, encrypted_key TEXT, created_at TEXT,"
+            " last_used_at TEXT, UNIQUE (user_id, service))"
+        )
+        self.selects = 0
+
+    async def fetch(self, sql, args):
+        self.selects += sql.startswith("SELECT")
+        await asyncio.sleep(0)
+        rows = self.conn.execute(re.sub(r"\$(\d+)", r"?\1", sql), args).fetchall()
+        return [dict(row) for row in rows]
+
+
+@pytest.fixture
+async def db(monkeypatch):
+    secret = base64.urlsafe_b64encode(os.urandom(32)).decode()
+    monkeypatch.setattr(get_settings(), "API_KEY_ENCRYPTION_KEY", secret)
+    monkeypatch.setattr(key_service.api_key_usage, "flush_fn", AsyncMock())
+    key_service.api_key_cache.clear()
+    executor = SqliteExecutor()
+    settings = MagicMock(DB_BACKEND="postgres")
+    with patch("app.db.repository.get_settings", return_value=settings), patch(
+        "app.db.repository.get_sql_executor", return_value=executor
+    ):
+        yield executor
+    await key_service.api_key_usage.close()
+    key_service.api_key_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_keys_are_stored_encrypted_and_cached(db):
+    await key_service.store_api_key("u1", "openai", "sk-secret")
+    stored = db.conn.execute("SELECT encrypted_key FROM user_api_keys").fetchone()[0]
+    assert "sk-secret" not in stored
+
+    keys = await asyncio.gather(
+        *(key_service.get_api_key("u1", "openai") for _ in range(3))
+    )
+    assert keys == ["sk-secret"] * 3
+    assert await key_service.get_api_key("u1", "openai") == "sk-secret"
+    assert db.selects == 1
+    assert await key_service.get_api_key("u2", "openai") is None
+    assert await key_service.get_api_key("u2", "openai") is None
+    assert db.selects == 2
+
+
+@pytest.mark.asyncio
+async def test_store_and_delete_invalidate_the_cache(db):
+    await key_service.store_api_key("u1", "openai", "sk-old")
+    assert await key_service.get_api_key("u1", "openai") == "sk-old"
+    await key_service.store_api_key("u1", "openai", "sk-new")
+    assert await key_service.get_api_key("u1", "openai") == "sk-new"
+
+    [row] = await key_service.list_api_keys("u1")
+    await key_service.delete_api_key("u1", row["id"])
+    assert await key_service.get_api_key("u1", "openai") is None
+
+
+@pytest.mark.asyncio
+async def test_miss_racing_a_store_is_not_cached(db):
+    fetch, release = db.fetch, asyncio.Event()
+
+    async def slow_select(sql, args):
+        rows = await fetch(sql, args)
+        if sql.startswith("SELECT"):
+            await release.wait()
+        return rows
+
+    db.fetch = slow_select
+    miss = asyncio.create_task(key_service.get_api_key("u1", "openai"))
+    await asyncio.sleep(0.01)
+    await key_service.store_api_key("u1", "openai", "sk-new")
+    release.set()
+    assert await miss is None
+    assert await key_service.get_api_key("u1", "openai") == "sk-new"
+
+
+def test_ciphertext_is_bound_to_user_and_service(db):
+    stored = key_service.encrypt_api_key("sk-secret", "u1", "openai")
+    assert key_service.decrypt_api_key(stored, "u1", "openai") == "sk-secret"
+    with pytest.raises(key_service.KeyServiceError):
+        key_service.decrypt_api_key(stored, "u2", "openai")
+    with pytest.raises(key_service.KeyServiceError):
+        key_service.decrypt_api_key(stored, "u1", "anthropic")
+
+
+def test_storing_requires_an_encryption_key(monkeypatch):
+    monkeypatch.setattr(get_settings(), "API_KEY_ENCRYPTION_KEY", None)
+    with pytest.raises(key_service.KeyServiceError):
+        key_service.encrypt_api_key("sk-secret", "u1", "openai")
+
+
+@pytest.mark.asyncio
+async def test_key_use_is_flushed_as_one_bulk_update(db):
+    await key_service.store_api_key("u1", "openai", "sk-a")
+    await key_service.store_api_key("u1", "anthropic", "sk-b")
+    for _ in range(3):
+        await key_service.get_api_key("u1", "openai")
+    await key_service.get_api_key("u1", "anthropic")
+    await key_service.get_api_key("u1", "gemini")
+
+    await key_service.api_key_usage.close()
+    flush = key_service.api_key_usage.flush_fn
+    flush.assert_awaited_once()
+    assert set(flush.await_args.args[0]) == {("u1", "openai"), ("u1", "anthropic")}
@@ -0,0 +1,52 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.litellm_service import call_litellm_completion
+from app.services.provider_clients import ProviderClientPool
+
+
+def test_pool_reuses_clients_per_service_and_key():
+    pool = ProviderClientPool(max_size=2)
+    first = pool.credentials("openai", "sk-a")
+    assert pool.credentials("OpenAI", "sk-a")["client"] is first["client"]
+    assert pool.credentials("openai", "sk-b")["client"] is not first["client"]
+    assert pool.credentials("anthropic", "sk-c") == {"api_key": "sk-c"}
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["created"] == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_evicts_and_closes_least_recently_used():
+    pool = ProviderClientPool(max_size=1, close_delay=0)
+    first = pool.get("openai", "sk-a")
+    with patch.object(first, "close", new_callable=AsyncMock) as mock_close:
+        pool.get("openai", "sk-b")
+        await asyncio.sleep(0.01)
+        mock_close.assert_awaited_once()
+    assert pool.stats()["evictions"] == 1
+    await pool.close()
+    assert pool.stats()["clients"] == 0
+
+
+@pytest.mark.asyncio
+@patch("app.services.litellm_service.get_api_key", new_callable=AsyncMock)
+@patch("app.services.litellm_service.litellm.acompletion", new_callable=AsyncMock)
+async def test_concurrent_users_keep_their_own_keys(mock_acompletion, mock_key):
+    async def key_for(user_id, service):
+        return f"sk-{user_id}"
+
+    async def fake(model, messages, **options):
+        await asyncio.sleep(0.01)
+        return options["api_key"]
+
+    mock_key.side_effect = key_for
+    mock_acompletion.side_effect = fake
+    keys = await asyncio.gather(
+        *(
+            call_litellm_completion(user, "anthropic", "claude-3", [])
+            for user in ("u1", "u2", "u3")
+        )
+    )
+    assert keys == ["sk-u1", "sk-u2", "sk-u3"]
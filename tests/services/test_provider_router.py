@@ -0,0 +1,103 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.provider_router import (
+    ProviderRouter,
+    ProviderRouterError,
+    ProviderSpec,
+    parse_providers,
+)
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+FAST = ProviderSpec("openai", "gpt-4o")
+SLOW = ProviderSpec("anthropic", "claude-3-sonnet")
+
+
+@pytest.fixture
+def mock_completion():
+    with patch(
+        "app.services.provider_router.call_litellm_completion", new_callable=AsyncMock
+    ) as mock:
+        yield mock
+
+
+def test_parse_providers_accepts_names_and_dicts():
+    specs = parse_providers(
+        {
+            "model": "gpt-4o",
+            "providers": ["openai", {"service": "anthropic", "model": "claude-3"}],
+        }
+    )
+    assert [(s.service, s.model) for s in specs] == [
+        ("openai", "gpt-4o"),
+        ("anthropic", "claude-3"),
+    ]
+    with pytest.raises(ValueError):
+        parse_providers({"providers": ["openai"]})
+    with pytest.raises(ValueError):
+        parse_providers({})
+
+
+def test_rank_prefers_fastest_healthy_provider():
+    router = ProviderRouter()
+    router.record_success(SLOW, 900.0)
+    router.record_success(FAST, 100.0)
+    assert router.rank([SLOW, FAST]) == [FAST, SLOW]
+
+    router.record_failure(FAST, ProviderError(429), 50.0)
+    assert router.rank([SLOW, FAST]) == [SLOW, FAST]
+    assert router.stats()["providers"]["openai/gpt-4o"]["rate_limited"] == 1
+
+
+def test_client_errors_do_not_affect_health():
+    router = ProviderRouter(max_error_rate=0.1)
+    router.record_failure(FAST, ProviderError(400), 10.0)
+    router.record_failure(FAST, Exception("No API key found"), 1.0)
+    assert router.is_healthy(FAST)
+    router.record_failure(FAST, ProviderError(503), 10.0)
+    assert not router.is_healthy(FAST)
+
+
+@pytest.mark.asyncio
+async def test_complete_fails_over_and_reports_provider(mock_completion):
+    async def fake(user_id, service, model, messages, options):
+        if service == "openai":
+            raise ProviderError(500)
+        return {"choices": [{"message": {"content": f"{model} {options}"}}]}
+
+    mock_completion.side_effect = fake
+    router = ProviderRouter()
+    routed = await router.complete(
+        "u1",
+        [FAST, ProviderSpec("anthropic", "claude-3-sonnet", {"temperature": 0})],
+        [{"role": "user", "content": "hi"}],
+        {"max_tokens": 5},
+    )
+    assert (routed.service, routed.model) == ("anthropic", "claude-3-sonnet")
+    assert routed.attempts[0]["error"] == "HTTP 500"
+    content = routed.response["choices"][0]["message"]["content"]
+    assert "'max_tokens': 5" in content and "'temperature': 0" in content
+    assert router.failovers == 1
+
+
+@pytest.mark.asyncio
+async def test_complete_stops_at_deadline(mock_completion):
+    async def hang(*args):
+        await asyncio.sleep(1)
+
+    mock_completion.side_effect = hang
+    router = ProviderRouter()
+    with pytest.raises(ProviderRouterError) as exc:
+        await router.complete("u1", [FAST, SLOW], [], deadline=0.05)
+    assert exc.value.attempts == [
+        {"service": "openai", "model": "gpt-4o", "error": "deadline exceeded"}
+    ]
+    assert router.stats()["exhausted"] == 1
@@ -0,0 +1,196 @@
+import asyncio
+import random
+from unittest.mock import patch
+
+import pytest
+
+from app.services.rate_limiter import (
+    ProviderLimiter,
+    RateLimiter,
+    RateLimiterError,
+    TokenBucket,
+)
+
+
+class RateLimitedError(Exception):
+    status_code = 429
+
+
+def test_token_bucket_delay_and_refill():
+    bucket = TokenBucket(per_minute=60, now=0.0)
+    assert bucket.delay(60, now=0.0) == 0.0
+    bucket.take(60, now=0.0)
+    assert bucket.delay(1, now=0.0) == pytest.approx(1.0)
+    assert bucket.delay(1, now=1.0) == 0.0
+    # Requests above capacity wait for a full bucket instead of forever
+    assert bucket.delay(500, now=1.0) == pytest.approx(59.0)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_queues_callers_in_order():
+    limiter = ProviderLimiter(initial_concurrency=1, max_concurrency=1)
+    order = []
+    first = await limiter.acquire(0, timeout=1.0)
+
+    async def waiter(name):
+        lease = await limiter.acquire(0, timeout=1.0)
+        order.append(name)
+        limiter.release(lease)
+
+    tasks = [asyncio.ensure_future(waiter(n)) for n in ("a", "b")]
+    await asyncio.sleep(0.01)
+    assert (limiter.in_flight, limiter.queued) == (1, 2)
+    limiter.release(first)
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b"]
+    assert limiter.stats()["max_queue_depth"] == 2
+
+
+@pytest.mark.asyncio
+async def test_queue_deadline_and_queue_size_are_enforced():
+    limiter = ProviderLimiter(initial_concurrency=1, max_queue=1)
+    await limiter.acquire(0, timeout=1.0)
+    waiting = asyncio.ensure_future(limiter.acquire(0, timeout=0.05))
+    await asyncio.sleep(0)
+    with pytest.raises(RateLimiterError, match="full"):
+        await limiter.acquire(0, timeout=1.0)
+    with pytest.raises(RateLimiterError, match="within"):
+        await waiting
+    assert (limiter.timeouts, limiter.rejected, limiter.queued) == (1, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_rpm_budget_holds_calls_until_refill():
+    limiter = ProviderLimiter(rpm=1)
+    await limiter.acquire(0, timeout=1.0)
+    with pytest.raises(RateLimiterError):
+        await limiter.acquire(0, timeout=0.05)
+
+
+@pytest.mark.asyncio
+async def test_tpm_reservation_is_settled_with_actual_usage():
+    limiter = ProviderLimiter(tpm=1000)
+    lease = await limiter.acquire(800, timeout=1.0)
+    limiter.release(lease, used_tokens=100)
+    # The unused 700 tokens were refunded, so another 800 fit right away
+    await limiter.acquire(800, timeout=0.05)
+
+
+@pytest.mark.asyncio
+async def test_limit_halves_once_per_overload_and_grows_when_saturated():
+    limiter = ProviderLimiter(initial_concurrency=4, max_concurrency=8)
+    leases = [await limiter.acquire(0, timeout=1.0) for _ in range(4)]
+    # Concurrent 429s from the same burst cut the limit once
+    for lease in leases[:2]:
+        limiter.release(lease, error=RateLimitedError())
+    assert (limiter.limit, limiter.decreases, limiter.throttled) == (2.0, 1, 2)
+    for lease in leases[2:]:
+        limiter.release(lease)
+
+    # Successes while every slot is busy add about one slot per window
+    for _ in range(2):
+        leases = [await limiter.acquire(0, timeout=1.0) for _ in range(2)]
+        for lease in leases:
+            limiter.release(lease)
+    assert limiter.limit > 3.0
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_slow_call_per_token_counts_as_overload():
+    clock = _Clock()
+    with patch("app.services.rate_limiter.time.monotonic", clock):
+        limiter = ProviderLimiter(initial_concurrency=1, min_samples=1)
+        limiter.latency = 0.01  # seconds per generated token
+        limiter.samples = 1
+        lease = await limiter.acquire(0, timeout=1.0)
+        clock.now += 10.0
+        # A long reply at the usual per-token speed is not overload
+        limiter.release(lease, work=1000)
+        assert limiter.decreases == 0
+
+        limiter.limit = 4.0
+        leases = [await limiter.acquire(0, timeout=1.0) for _ in range(4)]
+        clock.now += 10.0
+        limiter.release(leases[0], work=100)
+    assert (limiter.limit, limiter.decreases) == (2.0, 1)
+
+
+@pytest.mark.asyncio
+async def test_short_replies_under_saturation_are_not_overload():
+    clock = _Clock()
+    with patch("app.services.rate_limiter.time.monotonic", clock):
+        limiter = ProviderLimiter(initial_concurrency=4, min_samples=1)
+        limiter.latency = 0.01  # seconds per generated token
+        limiter.samples = 1
+        for _ in range(20):
+            leases = [await limiter.acquire(0, timeout=1.0) for _ in range(4)]
+            # A one-token reply still pays the full time to first token
+            clock.now += 0.5
+            limiter.release(leases[0], work=1)
+            for lease in leases[1:]:
+                limiter.release(lease)
+    assert limiter.decreases == 0
+    assert limiter.latency == 0.01
+
+
+@pytest.mark.asyncio
+async def test_variable_length_calls_keep_the_limit():
+    rng = random.Random(7)
+    clock = _Clock()
+    with patch("app.services.rate_limiter.time.monotonic", clock):
+        limiter = ProviderLimiter(initial_concurrency=8, max_concurrency=32)
+        for _ in range(60):
+            leases = [await limiter.acquire(0, timeout=1.0) for _ in range(8)]
+            for lease in leases:
+                tokens = rng.randint(5, 2000)
+                clock.now += tokens * 0.01 * rng.lognormvariate(0, 0.3) / 8
+                limiter.release(lease, work=tokens)
+    assert limiter.decreases <= 1
+    assert limiter.limit >= 8
+
+
+@pytest.mark.asyncio
+async def test_limit_recovers_when_not_saturated():
+    limiter = ProviderLimiter(initial_concurrency=8, max_concurrency=32)
+    limiter.limit = 2.0
+    for _ in range(40):
+        limiter.release(await limiter.acquire(0, timeout=1.0))
+    assert limiter.limit == 8.0
+    # Without saturation the limit does not grow past its initial value
+    for _ in range(40):
+        limiter.release(await limiter.acquire(0, timeout=1.0))
+    assert limiter.limit == 8.0
+
+
+@pytest.mark.asyncio
+async def test_run_uses_budgets_by_service_and_model():
+    limiter = RateLimiter(
+        limits={"openai": {"rpm": 100}, "openai/gpt-4o": {"tpm": 5000}},
+        max_concurrency=16,
+    )
+    assert limiter.budget("openai", "gpt-4o") == {
+        "rpm": 100,
+        "tpm": 5000,
+        "max_concurrency": 16,
+    }
+
+    async def call():
+        return {"usage": {"total_tokens": 42}}
+
+    result = await limiter.run("openai", "gpt-4o", "sk-1", call, estimate=lambda: 500)
+    assert result["usage"]["total_tokens"] == 42
+    by_key = limiter.stats()["by_key"]
+    (stats,) = by_key.values()
+    assert stats["admitted"] == 1
+    assert stats["tpm_available"] == pytest.approx(5000 - 42, abs=1)
+    # Keys get separate limiters
+    await limiter.run("openai", "gpt-4o", "sk-2", call)
+    assert limiter.stats()["limiters"] == 2
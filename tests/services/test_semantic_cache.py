@@ -0,0 +1,135 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.db.crud.crud_chat import TurnContext
+from app.services.agent_runner import run_agent
+from app.services.semantic_cache import (
+    SemanticCache,
+    semantic_cache,
+    semantic_cache_config,
+)
+
+
+@pytest.mark.asyncio
+async def test_lookup_returns_nearest_answer_above_threshold():
+    cache = SemanticCache(max_entries_per_agent=10, max_agents=10, ttl=60)
+    cache.add("a1", [1.0, 0.0], "We open at 9.")
+    cache.add("a1", [0.0, 1.0], "We are in Berlin.")
+
+    assert await cache.lookup("a1", [0.9, 0.1], threshold=0.9) == (
+        "We open at 9.",
+        pytest.approx(0.9939, abs=1e-3),
+    )
+    assert await cache.lookup("a1", [0.7, 0.7], threshold=0.9) is None
+    assert await cache.lookup("other-agent", [1.0, 0.0], threshold=0.9) is None
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_entries_are_evicted_per_agent_and_by_ttl():
+    cache = SemanticCache(max_entries_per_agent=1, max_agents=10, ttl=60)
+    cache.add("a1", [1.0, 0.0], "old")
+    cache.add("a1", [0.0, 1.0], "new")
+    assert await cache.lookup("a1", [1.0, 0.0], threshold=0.5) is None
+    assert cache.stats()["evictions"] == 1
+
+    expired = SemanticCache(max_entries_per_agent=10, max_agents=10, ttl=-1)
+    expired.add("a1", [1.0, 0.0], "stale")
+    assert await expired.lookup("a1", [1.0, 0.0], threshold=0.5) is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_scans_off_the_event_loop():
+    cache = SemanticCache(max_entries_per_agent=10, max_agents=10, ttl=60)
+    cache.add("a1", [1.0, 0.0], "We open at 9.")
+    with patch(
+        "app.services.semantic_cache.asyncio.to_thread", new_callable=AsyncMock
+    ) as mock_thread:
+        mock_thread.return_value = (None, 0.9)
+        assert await cache.lookup("a1", [1.0, 0.0], threshold=0.9) is None
+    mock_thread.assert_awaited_once()
+
+
+def test_add_after_invalidation_is_dropped():
+    cache = SemanticCache(max_entries_per_agent=10, max_agents=1, ttl=60)
+    version = cache.version("a1")
+    cache.invalidate("a1")
+    cache.add("a1", [1.0, 0.0], "old prompt's answer", version=version)
+    assert cache.stats()["entries"] == 0
+    cache.add("a1", [1.0, 0.0], "new", version=cache.version("a1"))
+    assert cache.stats()["entries"] == 1
+    # Stamps pushed out of the bounded map still reject older versions
+    version = cache.version("a2")
+    cache.invalidate("a2")
+    cache.invalidate("a3")
+    cache.add("a2", [1.0, 0.0], "stale", version=version)
+    assert cache.stats()["agents"] == 1
+
+
+def test_config_is_opt_in_with_overrides():
+    assert semantic_cache_config({}) is None
+    assert semantic_cache_config({"semantic_cache": {"threshold": 0.8}}).threshold == 0.8
+
+
+@pytest.mark.asyncio
+@patch("app.services.agent_runner.persist_message", new_callable=AsyncMock)
+@patch("app.services.agent_runner.call_litellm_completion", new_callable=AsyncMock)
+@patch("app.services.embedding_batcher.call_litellm_embedding", new_callable=AsyncMock)
+@patch("app.services.agent_runner.get_turn_context", new_callable=AsyncMock)
+async def test_run_agent_reuses_reply_for_similar_question(
+    mock_context, mock_embedding, mock_completion, mock_persist
+):
+    agent = {
+        "id": "faq-agent",
+        "user_id": "u1",
+        "name": "FAQ",
+        "provider": "openai",
+        "config": {"semantic_cache": True},
+        "created_at": None,
+        "updated_at": None,
+    }
+    mock_context.return_value = TurnContext(agent, [], None)
+    mock_completion.return_value = {"choices": [{"message": {"content": "9 to 5"}}]}
+    mock_embedding.side_effect = [
+        {"data": [{"embedding": [1.0, 0.0, 0.1]}]},
+        {"data": [{"embedding": [1.0, 0.05, 0.1]}]},
+    ]
+
+    first = await run_agent("u1", "faq-agent", "s1", "what are your hours")
+    second = await run_agent("u1", "faq-agent", "s1", "when are you open")
+
+    assert first.response == second.response == "9 to 5"
+    assert mock_completion.await_count == 1
+    assert mock_persist.await_count == 2
+
+
+@pytest.mark.asyncio
+@patch("app.services.agent_runner.persist_message", new_callable=AsyncMock)
+@patch("app.services.agent_runner.call_litellm_completion", new_callable=AsyncMock)
+@patch("app.services.embedding_batcher.call_litellm_embedding", new_callable=AsyncMock)
+@patch("app.services.agent_runner.get_turn_context", new_callable=AsyncMock)
+async def test_reply_racing_an_agent_update_is_not_cached(
+    mock_context, mock_embedding, mock_completion, mock_persist
+):
+    agent = {
+        "id": "updated-agent",
+        "user_id": "u1",
+        "name": "FAQ",
+        "provider": "openai",
+        "config": {"semantic_cache": True},
+        "created_at": None,
+        "updated_at": None,
+    }
+    mock_context.return_value = TurnContext(agent, [], None)
+    mock_embedding.return_value = {"data": [{"embedding": [1.0, 0.0, 0.1]}]}
+
+    async def complete_while_agent_is_updated(*args, **kwargs):
+        semantic_cache.invalidate("updated-agent")
+        return {"choices": [{"message": {"content": "old answer"}}]}
+
+    mock_completion.side_effect = complete_while_agent_is_updated
+    await run_agent("u1", "updated-agent", "s1", "what are your hours")
+    await run_agent("u1", "updated-agent", "s1", "what are your hours")
+
+    assert mock_completion.await_count == 2
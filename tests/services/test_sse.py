@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.sse import DONE, KEEPALIVE, format_sse, sse_completion_stream
+
+
+def _chunk(content=None, finish_reason=None, usage=None):
+    chunk = {"choices": [{"delta": {"content": content}, "finish_reason": finish_reason}]}
+    if usage is not None:
+        chunk = {"choices": [], "usage": usage}
+    return chunk
+
+
+async def _chunks(items, delay=0.0, log=None):
+    try:
+        for item in items:
+            await asyncio.sleep(delay)
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if log is not None:
+            log.append("closed")
+
+
+async def _connected():
+    return False
+
+
+def _events(frames):
+    events = []
+    for frame in frames:
+        if frame.startswith(":"):
+            events.append(("comment", frame))
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+        events.append((fields.get("event"), fields["data"]))
+    return events
+
+
+async def _collect(stream):
+    return [frame async for frame in stream]
+
+
+def test_format_sse_splits_multiline_data():
+    assert format_sse("a\nb", "delta", 3) == "id: 3\nevent: delta\ndata: a\ndata: b\n\n"
+    assert format_sse({"x": 1}) == 'data: {"x": 1}\n\n'
+
+
+@pytest.mark.asyncio
+async def test_stream_emits_deltas_usage_and_done():
+    chunks = _chunks(
+        [
+            _chunk("Hel"),
+            _chunk("lo"),
+            _chunk(finish_reason="stop"),
+            _chunk(usage={"prompt_tokens": 7, "completion_tokens": 2}),
+        ]
+    )
+    frames = await _collect(
+        sse_completion_stream(chunks, _connected, "gpt-4o", [], keepalive=1.0)
+    )
+    events = _events(frames)
+    assert [e for e, _ in events] == ["delta", "delta", "delta", "usage", None]
+    assert json.loads(events[0][1]) == {"content": "Hel", "finish_reason": None}
+    assert json.loads(events[2][1])["finish_reason"] == "stop"
+    usage = json.loads(events[3][1])
+    assert usage["prompt_tokens"] == 7
+    assert usage["completion_tokens"] == 2
+    assert usage["total_tokens"] == 9
+    assert usage["ttft_ms"] is not None
+    assert frames[-1] == DONE
+    assert frames[0].startswith("id: 1\n")
+
+
+@pytest.mark.asyncio
+async def test_usage_is_counted_locally_without_provider_usage():
+    chunks = _chunks([_chunk("hello world")])
+    messages = [{"role": "user", "content": "hi"}]
+    frames = await _collect(
+        sse_completion_stream(chunks, _connected, "gpt-4o", messages, keepalive=1.0)
+    )
+    usage = json.loads(_events(frames)[-2][1])
+    assert usage["completion_tokens"] == 2
+    assert usage["prompt_tokens"] > 0
+
+
+@pytest.mark.asyncio
+async def test_keepalive_sent_while_upstream_is_idle():
+    chunks = _chunks([_chunk("late")], delay=0.05)
+    frames = await _collect(
+        sse_completion_stream(chunks, _connected, "gpt-4o", [], keepalive=0.01)
+    )
+    assert KEEPALIVE in frames
+    assert frames[-1] == DONE
+
+
+@pytest.mark.asyncio
+async def test_upstream_error_becomes_error_event():
+    chunks = _chunks([_chunk("a"), RuntimeError("provider down")])
+    frames = await _collect(
+        sse_completion_stream(chunks, _connected, "gpt-4o", [], keepalive=1.0)
+    )
+    events = _events(frames)
+    assert events[-2] == ("error", json.dumps({"error": "provider down"}))
+    assert frames[-1] == DONE
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_upstream():
+    log = []
+
+    async def disconnected():
+        return True
+
+    chunks = _chunks([_chunk("never")], delay=10, log=log)
+    frames = await _collect(
+        sse_completion_stream(chunks, disconnected, "gpt-4o", [], keepalive=0.01)
+    )
+    await asyncio.sleep(0.01)
+    assert frames == []
+    assert log == ["closed"]
@@ -4,18 +4,22 @@ from app.services.workflow_service import WorkflowService, WorkflowServiceError
 from app.models.workflow import WorkflowRunRequest, WorkflowRunResult
 
 @pytest.mark.asyncio
+@patch("app.services.plugin_service.PluginService.get_plugin_configs", new_callable=AsyncMock)
 @patch("app.services.plugin_service.PluginService.execute", new_callable=AsyncMock)
 @patch("app.services.workflow_service.WorkflowService.get_workflow", new_callable=AsyncMock)
-async def test_run_workflow_plugin_step(mock_get_workflow, mock_plugin_execute):
+async def test_run_workflow_plugin_step(mock_get_workflow, mock_plugin_execute, mock_get_configs):
     mock_get_workflow.return_value = {
         "steps": [
             {"id": "s1", "type": "plugin", "config_id": "cfg1", "parameters": {"param1": "foo"}}
         ]
     }
+    mock_get_configs.return_value = {"cfg1": {"id": "cfg1", "plugin_type": "stub"}}
     mock_plugin_execute.return_value = {"result": "plugin success"}
     run_request = WorkflowRunRequest(inputs={"input1": "bar"})
     result: WorkflowRunResult = await WorkflowService.run_workflow("wf1", "user1", run_request)
     assert result.status == "success"
+    mock_get_configs.assert_awaited_once_with(["cfg1"], "user1")
+    assert mock_plugin_execute.call_args.kwargs["config"]["id"] == "cfg1"
     assert result.output["s1"]["result"] == "plugin success"
     assert any("plugin result" in log for log in result.logs)
 
@@ -37,9 +41,10 @@ async def test_run_workflow_agent_tool_stub(mock_get_workflow):
     assert any("tool execution is a stub" in log for log in result.logs)
 
 @pytest.mark.asyncio
+@patch("app.services.plugin_service.PluginService.get_plugin_configs", new_callable=AsyncMock)
 @patch("app.services.plugin_service.PluginService.execute", new_callable=AsyncMock)
 @patch("app.services.workflow_service.WorkflowService.get_workflow", new_callable=AsyncMock)
-async def test_run_workflow_plugin_error(mock_get_workflow, mock_plugin_execute):
+async def test_run_workflow_plugin_error(mock_get_workflow, mock_plugin_execute, mock_get_configs):
     mock_get_workflow.return_value = {
         "steps": [
             {"id": "s4", "type": "plugin", "config_id": "cfg2", "parameters": {}}
@@ -0,0 +1,48 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import lifecycle
+from app.main import app as package_app
+
+
+def test_shared_lifespan_starts_and_flushes_on_shutdown():
+    app = FastAPI(lifespan=lifecycle.lifespan)
+    lifecycle.install(app)
+    closers = {
+        name: AsyncMock()
+        for name in (
+            "message_write_buffer",
+            "api_key_usage",
+            "postgres_backend",
+            "provider_clients",
+            "gemini_clients",
+        )
+    }
+    patches = [
+        patch.object(lifecycle, name, MagicMock(close=closer))
+        for name, closer in closers.items()
+    ]
+    patches += [
+        patch.object(lifecycle, "init_supabase_client", AsyncMock()),
+        patch.object(lifecycle, "close_supabase_client", AsyncMock()),
+    ]
+    for p in patches:
+        p.start()
+    try:
+        with TestClient(app) as client:
+            assert client.get("/metrics").status_code == 200
+            lifecycle.init_supabase_client.assert_awaited_once()
+            for closer in closers.values():
+                closer.assert_not_awaited()
+        for closer in closers.values():
+            closer.assert_awaited_once()
+        lifecycle.close_supabase_client.assert_awaited_once()
+    finally:
+        for p in patches:
+            p.stop()
+
+
+def test_package_app_installs_shared_routes():
+    assert "/metrics" in package_app.openapi()["paths"]
@@ -0,0 +1,83 @@
+"""Fail if any CRUD query would need a sequential scan.
+
+Applies the migrations in supabase/migrations to the database at DATABASE_URL
+(a local/scratch Postgres), captures the SQL issued by the CRUD layer and
+EXPLAINs each statement with sequential scans disabled.
+
+Usage: DATABASE_URL=postgresql://... python -m tools.check_query_plans
+"""
+
+import asyncio
+import os
+import sys
+
+import asyncpg
+
+from app.db.crud import crud_agent, crud_chat
+from app.db.migrations import apply_migrations
+from app.db.query_plans import capture_queries, check_query_plans
+from app.models.agent import AgentBulkUpdate, AgentUpdate
+from app.services import key_service
+from app.services.plugin_service import PluginService
+from app.services.workflow_service import WorkflowService
+
+USER_ID = "plan-check-user"
+ROW_ID = "00000000-0000-0000-0000-000000000001"
+TIMESTAMP = "2025-01-01T00:00:00+00:00"
+
+
+def crud_probes():
+    """The data-access calls whose statements must be served by an index."""
+    cursor = crud_chat.encode_message_cursor({"timestamp": TIMESTAMP, "id": ROW_ID})
+    update = AgentUpdate(name="plan-check")
+    return [
+        ("get_agent_by_id", lambda: crud_agent.get_agent_by_id(ROW_ID, USER_ID)),
+        ("get_agents_by_user", lambda: crud_agent.get_agents_by_user(USER_ID)),
+        ("update_agent", lambda: crud_agent.update_agent(ROW_ID, USER_ID, update)),
+        ("archive_agent", lambda: crud_agent.archive_agent(ROW_ID, USER_ID)),
+        (
+            "update_agents_bulk",
+            lambda: crud_agent.update_agents_bulk(
+                USER_ID, [AgentBulkUpdate(id=ROW_ID, name="plan-check")]
+            ),
+        ),
+        ("list_sessions", lambda: crud_chat.list_sessions(USER_ID)),
+        ("get_messages", lambda: crud_chat.get_messages(ROW_ID)),
+        (
+            "get_messages(cursor)",
+            lambda: crud_chat.get_messages(ROW_ID, cursor=cursor),
+        ),
+        (
+            "get_messages(backward)",
+            lambda: crud_chat.get_messages(ROW_ID, cursor=cursor, direction="backward"),
+        ),
+        ("get_latest_messages", lambda: crud_chat.get_latest_messages(ROW_ID)),
+        ("get_plugin_config", lambda: PluginService.get_plugin_config(ROW_ID, USER_ID)),
+        ("list_plugin_configs", lambda: PluginService.list_plugin_configs(USER_ID)),
+        ("get_workflow", lambda: WorkflowService.get_workflow(ROW_ID, USER_ID)),
+        ("list_workflows", lambda: WorkflowService.list_workflows(USER_ID)),
+        ("list_api_keys", lambda: key_service.list_api_keys(USER_ID)),
+        ("delete_api_key", lambda: key_service.delete_api_key(USER_ID, ROW_ID)),
+    ]
+
+
+async def main() -> int:
+    dsn = os.environ.get("DATABASE_URL")
+    if not dsn:
+        print("DATABASE_URL is not set", file=sys.stderr)
+        return 2
+    queries = await capture_queries(crud_probes())
+    conn = await asyncpg.connect(dsn)
+    try:
+        await apply_migrations(conn)
+        failures = await check_query_plans(conn, queries)
+    finally:
+        await conn.close()
+    for query, relations in failures:
+        print(f"SEQ SCAN on {', '.join(relations)} in {query.label}: {query.sql}")
+    print(f"Checked {len(queries)} statements, {len(failures)} with sequential scans.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
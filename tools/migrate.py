@@ -0,0 +1,30 @@
+"""Apply pending schema migrations to the database at DATABASE_URL.
+
+Usage: DATABASE_URL=postgresql://... python -m tools.migrate
+"""
+
+import asyncio
+import os
+import sys
+
+import asyncpg
+
+from app.db.migrations import apply_migrations
+
+
+async def main() -> int:
+    dsn = os.environ.get("DATABASE_URL")
+    if not dsn:
+        print("DATABASE_URL is not set", file=sys.stderr)
+        return 2
+    conn = await asyncpg.connect(dsn)
+    try:
+        applied = await apply_migrations(conn)
+    finally:
+        await conn.close()
+    print(f"Applied {len(applied)} migration(s): {', '.join(applied) or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))